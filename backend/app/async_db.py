@@ -0,0 +1,75 @@
+"""
+Async access to the audio and profile databases for the FastAPI handlers.
+
+SQLite has no async driver worth using here, so the blocking calls run on
+dedicated bounded thread pools instead of the event loop. Database calls
+and audio work (saving uploads, probing durations, pydub decodes) get
+separate pools, so a burst of slow decodes can't hold up queries.
+"""
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+from . import audio_db, crud, profile_db
+
+load_dotenv()
+
+# SQLite serializes writes anyway (see db_writer), so a handful of threads is
+# enough for the database. Audio work is mostly I/O and ffmpeg subprocesses.
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '8'))
+AUDIO_POOL_SIZE = int(os.getenv('AUDIO_POOL_SIZE', '4'))
+
+db_pool = ThreadPoolExecutor(max_workers=DB_POOL_SIZE, thread_name_prefix="db")
+audio_pool = ThreadPoolExecutor(max_workers=AUDIO_POOL_SIZE, thread_name_prefix="audio")
+
+
+async def run_in_db_pool(fn, *args, **kwargs):
+    """Runs a blocking database call on the database pool and awaits it."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_pool, functools.partial(fn, *args, **kwargs))
+
+
+async def run_in_audio_pool(fn, *args, **kwargs):
+    """Runs blocking file or audio work on the audio pool and awaits it."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(audio_pool, functools.partial(fn, *args, **kwargs))
+
+
+async def add_audio_file(file_path: str, file_name: str, user_id: int, file_size: int = None, file_sha256: str = None) -> int:
+    return await run_in_db_pool(audio_db.add_audio_file, file_path, file_name, user_id, file_size, file_sha256)
+
+
+async def add_audio_metadata(audio_id: int, user_id: int, metadata: dict) -> bool:
+    return await run_in_db_pool(audio_db.add_audio_metadata, audio_id, user_id, metadata)
+
+
+async def find_audio_analysis_by_hash(file_sha256: str, user_id: int, exclude_id: int = None) -> dict:
+    return await run_in_db_pool(audio_db.find_audio_analysis_by_hash, file_sha256, user_id, exclude_id)
+
+
+async def fetch_audio_metadata_by_user(user_id: int, page_number: int = 1, items_per_page: int = 10, cursor: str = None) -> tuple:
+    return await run_in_db_pool(audio_db.fetch_audio_metadata_by_user, user_id, page_number, items_per_page, cursor)
+
+
+async def fetch_audio_statuses(user_id: int, audio_ids: list) -> list:
+    return await run_in_db_pool(audio_db.fetch_audio_statuses, user_id, audio_ids)
+
+
+async def fetch_audio_metadata_since(user_id: int, start_date: str) -> list:
+    return await run_in_db_pool(audio_db.fetch_audio_metadata_since, user_id, start_date)
+
+
+def _load_user_by_email(email: str):
+    # The session is closed before returning, so the user comes back
+    # detached and can be added to the request's own session
+    db = profile_db.SessionLocal()
+    try:
+        return crud.get_user_by_email(db, email)
+    finally:
+        db.close()
+
+
+async def get_user_by_email(email: str):
+    return await run_in_db_pool(_load_user_by_email, email)
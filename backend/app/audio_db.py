@@ -1,11 +1,17 @@
 import os
-from sqlalchemy import create_engine, select, func, MetaData, Table, Column, Integer, String, LargeBinary, DateTime
+from sqlalchemy import select, func, bindparam, Table, Column, Index, Integer, String, DateTime, and_, or_, type_coerce
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 from dotenv import load_dotenv
 import uuid
 import json
+from datetime import datetime
+import base64
+from .blob_store import get_blob_store
+from .sqlite_config import create_sqlite_engine
+from .db_writer import SerialWriter, run_write
 
 load_dotenv()
 
@@ -14,7 +20,11 @@ print("AUDIO_DB_PATH_LOCAL:", os.getenv("AUDIO_DB_PATH_LOCAL"))
 # Determine audio DB path
 AUDIO_DB_PATH = os.getenv('AUDIO_DB_PATH_DOCKER') if os.getenv('IS_DOCKER') == '1' else os.getenv('AUDIO_DB_PATH_LOCAL', './audio.db')
 DATABASE_URL = f"sqlite:///{AUDIO_DB_PATH}"
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+engine = create_sqlite_engine(AUDIO_DB_PATH)
+# Engine for ad-hoc write transactions outside the writer (migrations, tools)
+write_engine = engine.execution_options(sqlite_immediate=True)
+# All audio writes from this process go through one thread
+writer = SerialWriter(engine, name="audio-db-writer")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Create base for audio database
@@ -53,51 +63,214 @@ ANALYSIS_COLUMNS = [
     "overall_score"
 ]
 
-def get_user_audio_table(table_uuid: str) -> Table:
-    """Get or create a user-specific audio table."""
-    metadata = MetaData()
-    return Table(
-        table_uuid,  # Use table_uuid directly as the table name
-        metadata,
-        Column('id', Integer, primary_key=True, index=True),
-        Column('name', String, nullable=False),
-        Column('file', LargeBinary, nullable=False),
-        Column('created_at', DateTime(timezone=True), server_default=func.now()),
-        Column('transcription', String),
-        Column('pitch_followed_analysis', String),
-        Column('pitch_followed_positive_example', String),
-        Column('pitch_followed_negative_example', String),
-        Column('pitch_followed_suggestions', String),
-        Column('confidence_analysis', String),
-        Column('confidence_positive_example', String),
-        Column('confidence_negative_example', String),
-        Column('confidence_suggestions', String),
-        Column('tonality_analysis', String),
-        Column('tonality_positive_example', String),
-        Column('tonality_negative_example', String),
-        Column('tonality_suggestions', String),
-        Column('energy_analysis', String),
-        Column('energy_positive_example', String),
-        Column('energy_negative_example', String),
-        Column('energy_suggestions', String),
-        Column('objection_handling_analysis', String),
-        Column('objection_handling_positive_example', String),
-        Column('objection_handling_negative_example', String),
-        Column('objection_handling_suggestions', String),
-        Column('strengths', String),
-        Column('areas_for_improvement', String),
-        Column('pitch_followed_score', Integer),
-        Column('confidence_score', Integer),
-        Column('tonality_score', Integer),
-        Column('energy_score', Integer),
-        Column('objection_handling_score', Integer),
-        Column('overall_score', Integer)
-    )
-
-def init_user_audio_table(table_uuid: str):
-    """Initialize a new user's audio table."""
-    table = get_user_audio_table(table_uuid)
-    table.create(engine)
+# Columns returned by the transcriptions listing; the file columns are never needed there
+LISTING_COLUMNS = ["id", "name", "created_at"] + ANALYSIS_COLUMNS
+
+# All users' audio lives in one table, keyed by the profile DB's user id
+audios = Table(
+    "audios",
+    Base.metadata,
+    Column('id', Integer, primary_key=True, index=True),
+    Column('user_id', Integer, nullable=False),
+    Column('name', String, nullable=False),
+    Column('file_ref', String),
+    Column('file_size', Integer),
+    Column('file_sha256', String),
+    Column('created_at', DateTime(timezone=True), server_default=func.now()),
+    *[Column(col, Integer if col.endswith("_score") else String) for col in ANALYSIS_COLUMNS],
+    # Transcription job on the STT service, see send_audio_for_processing
+    Column('stt_job_id', String),
+    Column('stt_status', String),
+    Column('stt_submitted_at', DateTime),
+    # Newest-first listing and keyset pagination per user
+    Index("ix_audios_user_id_created_at_id", 'user_id', 'created_at', 'id'),
+    # Duplicate lookups per user
+    Index("ix_audios_user_id_file_sha256", 'user_id', 'file_sha256'),
+    # Webhook callbacks look rows up by job, the sweeper by status and age
+    Index("ix_audios_stt_job_id", 'stt_job_id'),
+    Index("ix_audios_stt_status_submitted_at", 'stt_status', 'stt_submitted_at')
+)
+
+# States of the STT job on an audio row
+STT_SUBMITTED = "submitted"
+STT_COMPLETE = "complete"
+STT_FAILED = "failed"
+
+# Per-user row counts, maintained on insert so listings don't run COUNT(*)
+user_audio_counts = Table(
+    "user_audio_counts",
+    Base.metadata,
+    Column('user_id', Integer, primary_key=True),
+    Column('count', Integer, nullable=False, default=0)
+)
+
+# Output of each pipeline stage per audio (words, corrected, translated,
+# analysis), tagged with the prompt/model version that made it and a hash of
+# its input, so re-analyses only rerun what changed. One row per version.
+audio_artifacts = Table(
+    "audio_artifacts",
+    Base.metadata,
+    Column('id', Integer, primary_key=True),
+    Column('audio_id', Integer, nullable=False),
+    Column('user_id', Integer, nullable=False),
+    Column('stage', String, nullable=False),
+    Column('version', String, nullable=False),
+    Column('input_sha256', String),
+    Column('data', String, nullable=False),
+    Column('created_at', DateTime(timezone=True), server_default=func.now()),
+    Index("ix_audio_artifacts_audio_id_stage_version", 'audio_id', 'stage', 'version', unique=True)
+)
+
+Base.metadata.create_all(engine)
+
+def _add_missing_columns(table: Table):
+    # create_all only creates missing tables; columns added to an existing
+    # table later are nullable, so a plain ADD COLUMN brings it up to date
+    with write_engine.begin() as conn:
+        existing = {row[1] for row in conn.exec_driver_sql(f'PRAGMA table_info("{table.name}")')}
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.exec_driver_sql(f'ALTER TABLE "{table.name}" ADD COLUMN {column.name} {column_type}')
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+_add_missing_columns(audios)
+
+# Statements are built once and executed with bound parameters, so SQLAlchemy
+# compiles each of them once and serves later calls from its compiled cache
+_created_at_key = type_coerce(audios.c.created_at, String)  # raw stored text of created_at
+
+INSERT_AUDIO = audios.insert()
+
+# Counts the user's rows in the writing transaction, so a count row created
+# here or by the backfill is exact whichever comes first
+_COUNT_USER_AUDIOS = (
+    select(func.count()).select_from(audios).where(audios.c.user_id == bindparam("owner_id")).scalar_subquery()
+)
+
+# Runs after the audio insert, in the same transaction. Users without a count
+# row yet get one holding all their rows, the new one included.
+_upsert_count = sqlite_insert(user_audio_counts).values(user_id=bindparam("owner_id"), count=_COUNT_USER_AUDIOS)
+INCREMENT_AUDIO_COUNT = _upsert_count.on_conflict_do_update(
+    index_elements=[user_audio_counts.c.user_id],
+    set_={"count": user_audio_counts.c.count + 1}
+)
+
+BACKFILL_AUDIO_COUNT = (
+    user_audio_counts.insert().prefix_with("OR IGNORE")
+    .from_select(["user_id", "count"], select(bindparam("owner_id"), _COUNT_USER_AUDIOS))
+)
+
+UPDATE_AUDIO = (
+    audios.update()
+    .where(audios.c.id == bindparam("audio_id"))
+    .where(audios.c.user_id == bindparam("owner_id"))
+)
+
+SELECT_AUDIO_FILE = (
+    select(audios.c.name, audios.c.file_ref, audios.c.file_size, audios.c.file_sha256)
+    .where(audios.c.id == bindparam("audio_id"))
+    .where(audios.c.user_id == bindparam("owner_id"))
+)
+
+SELECT_ANALYSIS_BY_HASH = (
+    select(*[audios.c[col] for col in ANALYSIS_COLUMNS])
+    .where(audios.c.user_id == bindparam("owner_id"))
+    .where(audios.c.file_sha256 == bindparam("file_sha256"))
+    .where(audios.c.overall_score.isnot(None))
+    .where(audios.c.id != bindparam("exclude_id"))
+    .order_by(audios.c.id.desc())
+    .limit(1)
+)
+
+SELECT_AUDIO_BY_STT_JOB = (
+    select(audios.c.id, audios.c.user_id, audios.c.stt_status)
+    .where(audios.c.stt_job_id == bindparam("stt_job_id"))
+)
+
+SELECT_STALE_STT_JOBS = (
+    select(audios.c.id, audios.c.user_id, audios.c.stt_job_id, audios.c.stt_submitted_at)
+    .where(audios.c.stt_status == STT_SUBMITTED)
+    .where(audios.c.stt_submitted_at < bindparam("submitted_before"))
+    .order_by(audios.c.stt_submitted_at)
+    .limit(bindparam("batch_size"))
+)
+
+SELECT_AUDIO_STATUSES = (
+    select(audios.c.id, audios.c.name, audios.c.stt_status, audios.c.overall_score.isnot(None).label("analysed"))
+    .where(audios.c.user_id == bindparam("owner_id"))
+    .where(audios.c.id.in_(bindparam("audio_ids", expanding=True)))
+)
+
+# A newer artifact of the same stage and version replaces the older one
+UPSERT_ARTIFACT = audio_artifacts.insert().prefix_with("OR REPLACE")
+
+SELECT_ARTIFACTS = (
+    select(audio_artifacts.c.stage, audio_artifacts.c.version, audio_artifacts.c.input_sha256, audio_artifacts.c.data)
+    .where(audio_artifacts.c.audio_id == bindparam("audio_id"))
+    .where(audio_artifacts.c.user_id == bindparam("owner_id"))
+    .order_by(audio_artifacts.c.id.desc())
+)
+
+SELECT_AUDIO_COUNT = select(user_audio_counts.c.count).where(user_audio_counts.c.user_id == bindparam("owner_id"))
+
+_LISTING_PAGE = (
+    select(*[audios.c[col] for col in LISTING_COLUMNS], _created_at_key.label("cursor_created_at"))
+    .where(audios.c.user_id == bindparam("owner_id"))
+    .order_by(audios.c.created_at.desc(), audios.c.id.desc())
+    .limit(bindparam("page_size"))
+)
+
+SELECT_LISTING_BY_OFFSET = _LISTING_PAGE.offset(bindparam("page_offset"))
+
+SELECT_LISTING_AFTER_CURSOR = _LISTING_PAGE.where(or_(
+    _created_at_key < bindparam("cursor_created_at"),
+    and_(_created_at_key == bindparam("cursor_created_at"), audios.c.id < bindparam("cursor_id"))
+))
+
+SELECT_LISTING_SINCE = (
+    select(*[audios.c[col] for col in LISTING_COLUMNS])
+    .where(audios.c.user_id == bindparam("owner_id"))
+    .where(_created_at_key >= bindparam("start_date"))
+    .order_by(audios.c.created_at.asc(), audios.c.id.asc())
+)
+
+def get_audio_count(conn, user_id: int) -> int:
+    """
+    Returns the maintained audio count for a user.
+
+    Users without a count row yet are counted through the user_id index. The
+    row is then stored by the writer, counted again inside the write
+    transaction, so an upload committed in between can't be missed; if an
+    upload created the row first, it is left alone. After that,
+    add_audio_file keeps it up to date.
+    """
+    count = conn.execute(SELECT_AUDIO_COUNT, {"owner_id": user_id}).scalar()
+    if count is None:
+        count = conn.execute(select(_COUNT_USER_AUDIOS), {"owner_id": user_id}).scalar()
+        # The listing doesn't need to wait for it
+        writer.submit(lambda write_conn: write_conn.execute(BACKFILL_AUDIO_COUNT, {"owner_id": user_id}))
+    return count
+
+def seed_audio_count(user_id: int):
+    """Creates a user's count row, e.g. at signup, so listings never need the backfill."""
+    try:
+        run_write(writer, engine, lambda conn: conn.execute(BACKFILL_AUDIO_COUNT, {"owner_id": user_id}))
+    except Exception as e:
+        print(f"Error seeding audio count: {str(e)}")
+
+def encode_cursor(created_at: str, audio_id: int) -> str:
+    """Encodes the position after a row as an opaque pagination cursor."""
+    return base64.urlsafe_b64encode(f"{created_at}|{audio_id}".encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple:
+    """Decodes a pagination cursor into (created_at, id). Raises ValueError if malformed."""
+    try:
+        created_at, audio_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        return created_at, int(audio_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
 
 def get_db():
     db = SessionLocal()
@@ -106,51 +279,57 @@ def get_db():
     finally:
         db.close()
 
-def add_audio_file(file_path: str, file_name: str, table_uuid: str) -> int:
+def add_audio_file(file_path: str, file_name: str, user_id: int, file_size: int = None, file_sha256: str = None) -> int:
     """
-    Add an audio file to the user's audio table.
+    Add an audio file for a user.
+
+    The content is written to the blob store and the row only keeps a
+    reference to it, together with its size and SHA-256.
     
     Args:
         file_path (str): Path to the audio file
         file_name (str): Name to store in the database
-        table_uuid (str): User's table UUID
+        user_id (int): ID of the owning user
+        file_size (int): Size of the file in bytes, if already known
+        file_sha256 (str): Hex SHA-256 of the file, if already known
         
     Returns:
         int: file_id is the ID of the new record if successful, else -1
     """
-    print(f"add_audio_file: Saving {file_name} from {file_path} to table {table_uuid}")
+    print(f"add_audio_file: Saving {file_name} from {file_path} for user {user_id}")
     try:
-        with open(file_path, 'rb') as f:
-            file_content = f.read()
-        print(f"Read {len(file_content)} bytes from {file_path}")
-        
-        # Create new audio record
-        db = SessionLocal()
-        table = get_user_audio_table(table_uuid)
-        
-        # Insert the record
-        result = db.execute(
-            table.insert().values(
-                name=file_name,
-                file=file_content
-            )
-        )
-        db.commit()
-        file_id = result.lastrowid
-        db.close()
-        return file_id
+        store = get_blob_store()
+        if file_sha256 is None or file_size is None:
+            with open(file_path, 'rb') as f:
+                file_ref, file_sha256, file_size = store.put_stream(f)
+        else:
+            file_ref = store.put_file(file_path, file_sha256)
+        print(f"Stored {file_size} bytes from {file_path} as {file_ref}")
+
+        def insert(conn):
+            result = conn.execute(INSERT_AUDIO, {
+                "user_id": user_id,
+                "name": file_name,
+                "file_ref": file_ref,
+                "file_size": file_size,
+                "file_sha256": file_sha256
+            })
+            conn.execute(INCREMENT_AUDIO_COUNT, {"owner_id": user_id})
+            return result.lastrowid
+
+        return run_write(writer, engine, insert)
         
     except Exception as e:
         print(f"Error adding audio file: {str(e)}")
         return -1
 
-def add_audio_metadata(audio_id: int, table_uuid: str, metadata: dict) -> bool:
+def add_audio_metadata(audio_id: int, user_id: int, metadata: dict) -> bool:
     """
     Add or update metadata for an existing audio record.
 
     Args:
         audio_id (int): The ID of the audio record to update
-        table_uuid (str): User's table UUID
+        user_id (int): ID of the owning user
         metadata (dict): Dictionary containing the metadata values.
                         Keys should match the column names in the Audio model.
 
@@ -158,9 +337,6 @@ def add_audio_metadata(audio_id: int, table_uuid: str, metadata: dict) -> bool:
         bool: True if successful, False otherwise
     """
     try:
-        db = SessionLocal()
-        table = get_user_audio_table(table_uuid)
-        
         # Update all metadata fields
         update_data = {}
         for key, value in metadata.items():
@@ -173,96 +349,261 @@ def add_audio_metadata(audio_id: int, table_uuid: str, metadata: dict) -> bool:
                 else:
                     update_data[key] = str(value)
         
-        db.execute(
-            table.update()
-            .where(table.c.id == audio_id)
-            .values(**update_data)
-        )
-        db.commit()
-        db.close()
+        if not update_data:
+            return True
+
+        params = {**update_data, "audio_id": audio_id, "owner_id": user_id}
+        run_write(writer, engine, lambda conn: conn.execute(UPDATE_AUDIO, params))
         return True
         
     except Exception as e:
         print(f"Error updating audio metadata: {str(e)}")
         return False
 
-def get_audio_by_id(audio_id: int, table_uuid: str) -> tuple:
+def get_audio_by_id(audio_id: int, user_id: int) -> tuple:
     """
-    Get audio file content and name by ID.
+    Get audio file name, blob store reference, content hash and size by ID.
+
+    The content itself is not loaded; open it with `open_audio_file`.
     
     Args:
         audio_id (int): The ID of the audio record
-        table_uuid (str): User's table UUID
+        user_id (int): ID of the owning user
         
     Returns:
-        tuple: (name, file_content) or (None, None) if not found
+        tuple: (name, file_ref, file_sha256, file_size) or (None, None, None, None) if not found
     """
-    print(f"get_audio_by_id: Fetching id={audio_id} from table {table_uuid}")
+    print(f"get_audio_by_id: Fetching id={audio_id} for user {user_id}")
     try:
-        db = SessionLocal()
-        table = get_user_audio_table(table_uuid)
-        
-        result = db.execute(
-            table.select().where(table.c.id == audio_id)
-        ).first()
+        with engine.connect() as conn:
+            result = conn.execute(SELECT_AUDIO_FILE, {"audio_id": audio_id, "owner_id": user_id}).first()
         
-        if not result:
+        if not result or not result.file_ref:
             print(f"get_audio_by_id: No result for id={audio_id}")
-            return None, None
+            return None, None, None, None
             
-        print(f"get_audio_by_id: Found file {result.name} (size: {len(result.file)} bytes)")
-        return result.name, result.file
+        print(f"get_audio_by_id: Found file {result.name} (size: {result.file_size} bytes)")
+        return result.name, result.file_ref, result.file_sha256, result.file_size
     except Exception as e:
         print(f"Error getting audio by ID: {str(e)}")
-        return None, None
-    finally:
-        db.close()
+        return None, None, None, None
+
+def find_audio_analysis_by_hash(file_sha256: str, user_id: int, exclude_id: int = None) -> dict:
+    """
+    Find a finished analysis of audio with the same content.
+
+    An analysis counts as finished once it has an overall score, so failed
+    or still-running jobs are never reused.
+
+    Args:
+        file_sha256 (str): Hex SHA-256 of the audio content
+        user_id (int): ID of the owning user
+        exclude_id (int): Audio ID to ignore, usually the row being processed
+
+    Returns:
+        dict: Analysis column values, or None if there is no finished analysis
+    """
+    if not file_sha256:
+        return None
+    try:
+        with engine.connect() as conn:
+            result = conn.execute(SELECT_ANALYSIS_BY_HASH, {
+                "owner_id": user_id,
+                "file_sha256": file_sha256,
+                # IDs start at 1, so 0 excludes nothing
+                "exclude_id": exclude_id if exclude_id is not None else 0
+            }).first()
+        return dict(result._mapping) if result else None
+    except Exception as e:
+        print(f"Error finding audio analysis by hash: {str(e)}")
+        return None
+
+def set_stt_job(audio_id: int, user_id: int, job_id: str = None, status: str = STT_SUBMITTED) -> bool:
+    """
+    Records the STT job an audio file was submitted as.
+
+    Args:
+        audio_id (int): The ID of the audio record
+        user_id (int): ID of the owning user
+        job_id (str): Job ID returned by the STT service, None if submission failed
+        status (str): One of STT_SUBMITTED, STT_COMPLETE, STT_FAILED
+
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    params = {
+        "stt_job_id": job_id,
+        "stt_status": status,
+        "stt_submitted_at": datetime.utcnow(),
+        "audio_id": audio_id,
+        "owner_id": user_id
+    }
+    try:
+        run_write(writer, engine, lambda conn: conn.execute(UPDATE_AUDIO, params))
+        return True
+    except Exception as e:
+        print(f"Error setting STT job: {str(e)}")
+        return False
+
+def set_stt_status(audio_id: int, user_id: int, status: str) -> bool:
+    """Updates the state of an audio file's STT job. Returns True if successful."""
+    params = {"stt_status": status, "audio_id": audio_id, "owner_id": user_id}
+    try:
+        run_write(writer, engine, lambda conn: conn.execute(UPDATE_AUDIO, params))
+        return True
+    except Exception as e:
+        print(f"Error setting STT status: {str(e)}")
+        return False
 
-def fetch_audio_metadata_by_user(table_uuid: str, page_number: int = 1, items_per_page: int = 10) -> tuple:
+def get_audio_by_stt_job(job_id: str) -> tuple:
     """
-    Fetch paginated audio metadata for a specific user.
+    Finds the audio file submitted as an STT job.
+
+    Returns:
+        tuple: (audio_id, user_id, stt_status) or None if no row has this job
+    """
+    try:
+        with engine.connect() as conn:
+            result = conn.execute(SELECT_AUDIO_BY_STT_JOB, {"stt_job_id": job_id}).first()
+        return tuple(result) if result else None
+    except Exception as e:
+        print(f"Error getting audio by STT job: {str(e)}")
+        return None
+
+def fetch_stale_stt_jobs(submitted_before: datetime, limit: int = 100) -> list:
+    """
+    Returns STT jobs still marked as submitted that were sent before the given time,
+    oldest first, as dicts with id, user_id, stt_job_id and stt_submitted_at.
+    """
+    with engine.connect() as conn:
+        result = conn.execute(SELECT_STALE_STT_JOBS, {"submitted_before": submitted_before, "batch_size": limit})
+        return [dict(row._mapping) for row in result]
+
+def fetch_audio_statuses(user_id: int, audio_ids: list) -> list:
+    """
+    Returns the processing state of a user's audio files, as dicts with id,
+    name and status: "complete" once analysed, "failed" (also when a result
+    was stored without an analysis), "processing" while the STT job runs, or
+    "queued" before it is submitted.
+    """
+    if not audio_ids:
+        return []
+    with engine.connect() as conn:
+        rows = conn.execute(SELECT_AUDIO_STATUSES, {"owner_id": user_id, "audio_ids": list(audio_ids)}).all()
+
+    statuses = []
+    for row in rows:
+        if row.analysed:
+            status = STT_COMPLETE
+        elif row.stt_status in (STT_FAILED, STT_COMPLETE):
+            # Complete without a score: the analysis failed, nothing more will come
+            status = STT_FAILED
+        elif row.stt_status == STT_SUBMITTED:
+            status = "processing"
+        else:
+            status = "queued"
+        statuses.append({"id": row.id, "name": row.name, "status": status})
+    return statuses
+
+def save_audio_artifacts(audio_id: int, user_id: int, artifacts: list) -> bool:
+    """
+    Stores pipeline artifacts returned by the STT service, each a dict with
+    stage, version, input_sha256 and data.
+
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    rows = [{
+        "audio_id": audio_id,
+        "user_id": user_id,
+        "stage": artifact["stage"],
+        "version": artifact["version"],
+        "input_sha256": artifact.get("input_sha256"),
+        "data": json.dumps(artifact["data"], ensure_ascii=False)
+    } for artifact in artifacts]
+    if not rows:
+        return True
+    try:
+        run_write(writer, engine, lambda conn: conn.execute(UPSERT_ARTIFACT, rows))
+        return True
+    except Exception as e:
+        print(f"Error saving audio artifacts: {str(e)}")
+        return False
+
+def fetch_audio_artifacts(audio_id: int, user_id: int) -> list:
+    """Returns an audio file's stored artifacts, newest first, in the form save_audio_artifacts takes."""
+    with engine.connect() as conn:
+        rows = conn.execute(SELECT_ARTIFACTS, {"audio_id": audio_id, "owner_id": user_id}).all()
+    return [{**row._mapping, "data": json.loads(row.data)} for row in rows]
+
+def open_audio_file(file_ref: str):
+    """Opens stored audio content for reading. The caller must close it."""
+    return get_blob_store().open(file_ref)
+
+def fetch_audio_metadata_by_user(user_id: int, page_number: int = 1, items_per_page: int = 10, cursor: str = None) -> tuple:
+    """
+    Fetch paginated audio metadata for a specific user, newest first.
+
+    Only the listing columns are selected. With a cursor the page is found
+    by seeking the (user_id, created_at, id) index, so deep pages cost the same as the
+    first one; without one, `page_number` is used as an offset.
     
     Args:
-        table_uuid (str): User's table UUID
-        page_number (int): The page number (1-based)
+        user_id (int): ID of the owning user
+        page_number (int): The page number (1-based), used when no cursor is given
         items_per_page (int): Number of items per page
+        cursor (str): Cursor returned with the previous page
         
     Returns:
-        tuple: (total_count, list of audio records)
+        tuple: (total_count, list of audio records, cursor for the next page or None)
     """
     try:
-        db = SessionLocal()
-        table = get_user_audio_table(table_uuid)
-        
-        # Get total count for pagination
-        total_count = db.execute(
-            select(func.count()).select_from(table)
-        ).scalar()
-        
-        # Calculate offset
-        offset = (page_number - 1) * items_per_page
-        
-        # Get paginated records
-        results = db.execute(
-            table.select()
-            .order_by(table.c.created_at.desc())
-            .offset(offset)
-            .limit(items_per_page)
-        ).fetchall()
-        
+        params = {"owner_id": user_id, "page_size": items_per_page}
+        if cursor:
+            params["cursor_created_at"], params["cursor_id"] = decode_cursor(cursor)
+            query = SELECT_LISTING_AFTER_CURSOR
+        else:
+            params["page_offset"] = (page_number - 1) * items_per_page
+            query = SELECT_LISTING_BY_OFFSET
+
+        with engine.connect() as conn:
+            total_count = get_audio_count(conn, user_id)
+            results = conn.execute(query, params).fetchall()
+
         # Convert to list of dictionaries
         records = []
         for row in results:
             record = dict(row._mapping)
+            del record["cursor_created_at"]
             records.append(record)
+
+        next_cursor = None
+        if len(results) == items_per_page:
+            last = results[-1]
+            next_cursor = encode_cursor(last.cursor_created_at, last.id)
+
+        return total_count, records, next_cursor
         
-        return total_count, records
-        
+    except ValueError:
+        raise
     except Exception as e:
         print(f"Error fetching audio metadata: {str(e)}")
-        return 0, []
-    finally:
-        db.close()
+        return 0, [], None
+
+def fetch_audio_metadata_since(user_id: int, start_date: str) -> list:
+    """
+    Fetch a user's audio metadata created on or after a date, oldest first.
+
+    Args:
+        user_id (int): ID of the owning user
+        start_date (str): Date in YYYY-MM-DD format
+
+    Returns:
+        list: Audio records as dictionaries
+    """
+    with engine.connect() as conn:
+        results = conn.execute(SELECT_LISTING_SINCE, {"owner_id": user_id, "start_date": start_date}).fetchall()
+    return [dict(row._mapping) for row in results]
 
 print("Resolved AUDIO_DB_PATH:", AUDIO_DB_PATH)
 print("CWD:", os.getcwd())
@@ -0,0 +1,346 @@
+"""
+Header-only audio duration probing.
+
+These parsers read container and frame headers to work out how long a
+recording is without decoding it. Each returns the duration in seconds, or
+None when the file isn't in its format or the headers aren't conclusive, in
+which case callers fall back to a full decode.
+"""
+import mmap
+import os
+import struct
+
+# ----------------------- MP3 -----------------------
+
+# Bitrates in kbps, indexed by [version is MPEG-1][layer][bitrate index]
+_MP3_BITRATES = {
+    (True, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (True, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (True, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (False, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (False, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (False, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+
+# Sample rates indexed by the version bits (0 = MPEG-2.5, 2 = MPEG-2, 3 = MPEG-1)
+_MP3_SAMPLE_RATES = {
+    0: (11025, 12000, 8000),
+    2: (22050, 24000, 16000),
+    3: (44100, 48000, 32000),
+}
+
+
+def _parse_mp3_header(data, pos: int):
+    """
+    Parses the 4-byte MPEG audio frame header at `pos`.
+
+    Returns:
+        tuple: (frame length in bytes, samples per frame, sample rate, version bits, is mono)
+        or None if there is no valid header at `pos`
+    """
+    if pos + 4 > len(data):
+        return None
+    b0, b1, b2, b3 = data[pos], data[pos + 1], data[pos + 2], data[pos + 3]
+    if b0 != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+
+    version = (b1 >> 3) & 0x03
+    layer_bits = (b1 >> 1) & 0x03
+    bitrate_index = b2 >> 4
+    rate_index = (b2 >> 2) & 0x03
+    if version == 1 or layer_bits == 0 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    layer = 4 - layer_bits
+    mpeg1 = version == 3
+    bitrate = _MP3_BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+    sample_rate = _MP3_SAMPLE_RATES[version][rate_index]
+    padding = (b2 >> 1) & 0x01
+    mono = (b3 >> 6) == 3
+
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 1152 if (layer == 2 or mpeg1) else 576
+        length = samples // 8 * bitrate // sample_rate + padding
+    return length, samples, sample_rate, version, mono
+
+
+def _is_frame_run(data, pos: int, header: tuple, count: int = 3) -> bool:
+    """Checks that `count` frames with the same version and sample rate follow `pos`."""
+    for _ in range(count):
+        pos += header[0]
+        following = _parse_mp3_header(data, pos)
+        if following is None:
+            # Running into the end of a short file is fine
+            return pos >= len(data) - 128
+        if following[2:4] != header[2:4]:
+            return False
+        header = following
+    return True
+
+
+def _id3v2_size(data) -> int:
+    """Returns the size of a leading ID3v2 tag, including its header."""
+    if len(data) < 10 or data[:3] != b"ID3":
+        return 0
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def probe_mp3(data):
+    pos = _id3v2_size(data)
+    end = len(data)
+
+    # ADTS (raw AAC) shares the frame sync bits, leave it to the decoder
+    if data[pos:pos + 2] and data[pos] == 0xFF and (data[pos + 1] & 0xF6) == 0xF0:
+        return None
+
+    # Find the first frame that is followed by a run of consistent frames
+    first = None
+    search_end = min(end, pos + 64 * 1024)
+    while pos < search_end:
+        header = _parse_mp3_header(data, pos)
+        if header and _is_frame_run(data, pos, header):
+            first = header
+            break
+        next_sync = data.find(b"\xff", pos + 1)
+        if next_sync == -1:
+            return None
+        pos = next_sync
+    if first is None:
+        return None
+
+    length, samples, sample_rate, version, mono = first
+
+    # Xing/Info header written by VBR (and many CBR) encoders
+    if version == 3:
+        side_info = 17 if mono else 32
+    else:
+        side_info = 9 if mono else 17
+    xing = pos + 4 + side_info
+    if data[xing:xing + 4] in (b"Xing", b"Info"):
+        flags = struct.unpack(">I", data[xing + 4:xing + 8])[0]
+        if flags & 0x01:
+            frames = struct.unpack(">I", data[xing + 8:xing + 12])[0]
+            if frames:
+                return frames * samples / sample_rate
+
+    # VBRI header written by the Fraunhofer encoder
+    vbri = pos + 4 + 32
+    if data[vbri:vbri + 4] == b"VBRI":
+        frames = struct.unpack(">I", data[vbri + 14:vbri + 18])[0]
+        if frames:
+            return frames * samples / sample_rate
+
+    # No summary header, walk the frame headers
+    if data[end - 128:end - 125] == b"TAG":
+        end -= 128
+    total_samples, skipped = 0, 0
+    while pos < end:
+        header = _parse_mp3_header(data, pos)
+        if header is None or header[2] != sample_rate:
+            next_sync = data.find(b"\xff", pos + 1, end)
+            if next_sync == -1:
+                break
+            skipped += next_sync - pos
+            pos = next_sync
+            continue
+        total_samples += header[1]
+        pos += header[0]
+
+    # Mostly garbage between frames means this isn't really an MP3 stream
+    if not total_samples or skipped > len(data) // 10:
+        return None
+    return total_samples / sample_rate
+
+
+# ----------------------- WAV / AIFF -----------------------
+
+def probe_wav(data):
+    if len(data) < 12 or data[:4] not in (b"RIFF", b"RIFX") or data[8:12] != b"WAVE":
+        return None
+    endian = "<" if data[:4] == b"RIFF" else ">"
+    pos, byte_rate, data_size = 12, None, None
+    while pos + 8 <= len(data):
+        chunk_id = data[pos:pos + 4]
+        chunk_size = struct.unpack(endian + "I", data[pos + 4:pos + 8])[0]
+        if chunk_id == b"fmt ":
+            byte_rate = struct.unpack(endian + "I", data[pos + 16:pos + 20])[0]
+        elif chunk_id == b"data":
+            data_size = chunk_size
+            if data_size == 0xFFFFFFFF or pos + 8 + data_size > len(data):
+                # Streamed or truncated file, the data runs to the end
+                data_size = len(data) - pos - 8
+            break
+        pos += 8 + chunk_size + (chunk_size & 1)
+    if not byte_rate or data_size is None:
+        return None
+    return data_size / byte_rate
+
+
+def _extended_to_float(raw: bytes) -> float:
+    """Decodes an 80-bit IEEE 754 extended float, as used for AIFF sample rates."""
+    exponent = struct.unpack(">H", raw[:2])[0]
+    mantissa = struct.unpack(">Q", raw[2:10])[0]
+    sign = -1 if exponent & 0x8000 else 1
+    exponent &= 0x7FFF
+    if exponent == 0 and mantissa == 0:
+        return 0.0
+    return sign * mantissa * 2.0 ** (exponent - 16383 - 63)
+
+
+def probe_aiff(data):
+    if len(data) < 12 or data[:4] != b"FORM" or data[8:12] not in (b"AIFF", b"AIFC"):
+        return None
+    pos = 12
+    while pos + 8 <= len(data):
+        chunk_id = data[pos:pos + 4]
+        chunk_size = struct.unpack(">I", data[pos + 4:pos + 8])[0]
+        if chunk_id == b"COMM":
+            frames = struct.unpack(">I", data[pos + 10:pos + 14])[0]
+            sample_rate = _extended_to_float(data[pos + 16:pos + 26])
+            return frames / sample_rate if sample_rate else None
+        pos += 8 + chunk_size + (chunk_size & 1)
+    return None
+
+
+# ----------------------- MP4 / M4A -----------------------
+
+def _iter_boxes(data, start: int, end: int):
+    """Yields (box type, payload start, box end) for ISO BMFF boxes in a range."""
+    pos = start
+    while pos + 8 <= end:
+        size = struct.unpack(">I", data[pos:pos + 4])[0]
+        box_type = data[pos + 4:pos + 8]
+        header = 8
+        if size == 1:
+            size = struct.unpack(">Q", data[pos + 8:pos + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            return
+        yield box_type, pos + header, min(pos + size, end)
+        pos += size
+
+
+def probe_mp4(data):
+    if len(data) < 12 or data[4:8] != b"ftyp":
+        return None
+    for box_type, start, end in _iter_boxes(data, 0, len(data)):
+        if box_type != b"moov":
+            continue
+        timescale, duration = None, 0
+        for child, child_start, child_end in _iter_boxes(data, start, end):
+            if child == b"mvhd":
+                if data[child_start] == 1:
+                    timescale, duration = struct.unpack(">IQ", data[child_start + 20:child_start + 32])
+                else:
+                    timescale, duration = struct.unpack(">II", data[child_start + 12:child_start + 20])
+                if duration in (0xFFFFFFFF, 0xFFFFFFFFFFFFFFFF):
+                    duration = 0
+            elif child == b"mvex" and timescale and not duration:
+                # Fragmented files keep the total in the movie extends header
+                for grandchild, gc_start, _ in _iter_boxes(data, child_start, child_end):
+                    if grandchild == b"mehd":
+                        fmt = ">Q" if data[gc_start] == 1 else ">I"
+                        duration = struct.unpack_from(fmt, data, gc_start + 4)[0]
+        if timescale and duration:
+            return duration / timescale
+        if timescale:
+            return _sidx_duration(data, end)
+        return None
+    return None
+
+
+def _sidx_duration(data, start: int):
+    """Sums the segment index of fragmented (e.g. DASH) files."""
+    total, timescale = 0, None
+    for box_type, box_start, _ in _iter_boxes(data, start, len(data)):
+        if box_type != b"sidx":
+            continue
+        version = data[box_start]
+        timescale = struct.unpack_from(">I", data, box_start + 8)[0]
+        offset = box_start + (20 if version == 0 else 28)
+        count = struct.unpack_from(">H", data, offset + 2)[0]
+        offset += 4
+        for _ in range(count):
+            total += struct.unpack_from(">I", data, offset + 4)[0]
+            offset += 12
+    return total / timescale if timescale and total else None
+
+
+# ----------------------- Ogg / Opus / FLAC -----------------------
+
+def probe_ogg(data):
+    if len(data) < 28 or data[:4] != b"OggS":
+        return None
+
+    # The first page carries the codec identification header
+    segments = data[26]
+    packet = data[27 + segments:27 + segments + 64]
+    if packet[:8] == b"OpusHead":
+        sample_rate = 48000  # Opus granule positions always count 48 kHz samples
+        pre_skip = struct.unpack("<H", packet[10:12])[0]
+    elif packet[:7] == b"\x01vorbis":
+        sample_rate = struct.unpack("<I", packet[12:16])[0]
+        pre_skip = 0
+    else:
+        return None
+
+    # The last page's granule position is the total sample count
+    last = data.rfind(b"OggS", max(0, len(data) - 256 * 1024))
+    if last == -1 or last + 14 > len(data):
+        return None
+    granule = struct.unpack("<q", data[last + 6:last + 14])[0]
+    if granule <= 0 or not sample_rate:
+        return None
+    return max(0, granule - pre_skip) / sample_rate
+
+
+def probe_flac(data):
+    start = _id3v2_size(data)
+    if data[start:start + 4] != b"fLaC":
+        return None
+    # STREAMINFO is always the first metadata block
+    info = data[start + 8:start + 8 + 34]
+    if len(info) < 18:
+        return None
+    packed = int.from_bytes(info[10:18], "big")
+    sample_rate = packed >> 44
+    total_samples = packed & 0xFFFFFFFFF
+    if not sample_rate or not total_samples:
+        return None
+    return total_samples / sample_rate
+
+
+# Parsers in the order they are tried; each checks its own magic bytes
+PROBES = [probe_wav, probe_aiff, probe_flac, probe_ogg, probe_mp4, probe_mp3]
+
+
+def probe_duration(audio_path: str):
+    """
+    Returns the duration (in seconds) of an audio file by reading its headers.
+
+    The file is memory-mapped, so only the pages the parsers touch are read.
+
+    Parameters:
+    audio_path (str): Path to the audio file.
+
+    Returns:
+    float: Duration in seconds, or None if no parser could determine it.
+    """
+    if os.path.getsize(audio_path) == 0:
+        return None
+    with open(audio_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        for probe in PROBES:
+            try:
+                duration = probe(data)
+            except (struct.error, IndexError, ValueError):
+                duration = None
+            if duration:
+                return duration
+    return None
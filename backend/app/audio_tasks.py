@@ -1,6 +1,76 @@
+import time
+from celery import group
 from .celery_app import celery
-from .send_audio_for_processing import process_audio_files
+from .send_audio_for_processing import process_audio_file, reanalyze_audio_file, store_stt_result, sweep_stt_jobs
+from .job_tracking import acquire_user_slot, USER_SLOT_RETRY_SEC
+from .metrics import observe
+from .migrate_audio_tables import resolve_legacy_ids
+
+# How long a batch queued before the shared audios table waits for its
+# user's table to be migrated
+LEGACY_BATCH_RETRY_SEC = 60
+LEGACY_BATCH_MAX_RETRIES = 60
+
+@celery.task(bind=True, max_retries=None)
+def process_audio_file_task(self, file_id, user_id, queued_at=None):
+    # Wait for one of the user's slots, so one big upload can't take every worker
+    if not acquire_user_slot(user_id, file_id):
+        raise self.retry(countdown=USER_SLOT_RETRY_SEC)
+    if queued_at:
+        # Includes retries spent waiting for a slot
+        observe("queue_wait", time.time() - queued_at)
+    return process_audio_file(file_id, user_id)
+
+def queue_audio_files(file_ids, user_id):
+    """Queues one task per file as a group and returns the GroupResult."""
+    queued_at = time.time()
+    return group(process_audio_file_task.s(file_id, user_id, queued_at) for file_id in file_ids).apply_async()
+
+@celery.task(bind=True, max_retries=None)
+def reanalyze_audio_file_task(self, file_id, user_id, queued_at=None):
+    # Shares the user's slots with new uploads
+    if not acquire_user_slot(user_id, file_id):
+        raise self.retry(countdown=USER_SLOT_RETRY_SEC)
+    if queued_at:
+        observe("queue_wait", time.time() - queued_at)
+    return reanalyze_audio_file(file_id, user_id)
+
+def queue_reanalysis(file_ids, user_id):
+    """Queues a re-analysis task per file as a group and returns the GroupResult."""
+    queued_at = time.time()
+    return group(reanalyze_audio_file_task.s(file_id, user_id, queued_at) for file_id in file_ids).apply_async()
+
+@celery.task(bind=True, max_retries=LEGACY_BATCH_MAX_RETRIES)
+def process_audio_files_task(self, file_ids, owner):
+    """
+    Kept for batches queued before the per-file tasks. Batches from before
+    the shared audios table carry the user's table_uuid and row IDs of that
+    table; they are mapped to the user and new IDs once the table has been
+    migrated (see migrate_audio_tables). Later batches carry the user ID.
+    """
+    if isinstance(owner, int):
+        queue_audio_files(file_ids, owner)
+        return
+
+    resolved = resolve_legacy_ids(owner, file_ids)
+    if resolved is None:
+        print(f"Batch for legacy table {owner} is waiting for its migration")
+        raise self.retry(countdown=LEGACY_BATCH_RETRY_SEC)
+    user_id, audio_ids = resolved
+    if len(audio_ids) < len(file_ids):
+        print(f"Batch for legacy table {owner}: {len(file_ids) - len(audio_ids)} rows were never migrated")
+    if audio_ids:
+        queue_audio_files(audio_ids, user_id)
+
+@celery.task(bind=True, max_retries=3, default_retry_delay=10)
+def store_stt_result_task(self, job_id, status, result=None, error=None):
+    # A fast job can call back before its job ID is saved; retry briefly,
+    # after that the sweeper picks it up
+    if not store_stt_result(job_id, status, result, error):
+        raise self.retry()
 
 @celery.task
-def process_audio_files_task(file_ids, table_uuid):
-    process_audio_files(file_ids, table_uuid)
+def sweep_stt_jobs_task():
+    resolved = sweep_stt_jobs()
+    if resolved:
+        print(f"Sweeper resolved {resolved} STT jobs")
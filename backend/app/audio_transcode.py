@@ -0,0 +1,162 @@
+"""
+Speech-optimised copies of uploads for the STT service.
+
+The speech model only needs mono 16 kHz audio, so large uploads (stereo
+48 kHz WAV/AIFF/FLAC, video containers) are re-encoded with ffmpeg to Opus
+before they are sent. Copies are cached on disk by the SHA-256 of the
+original and the encoding settings, so retries and re-analyses don't encode
+again. Which formats are transcoded, and at what bitrate, is set per
+extension; a copy that comes out no smaller than the original is not used.
+
+Encoding runs in the Celery task that sends the file, one ffmpeg at a time
+per task, so at most the worker's --concurrency encodes run at once.
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from dotenv import load_dotenv
+
+from .blob_store import get_blob_store
+
+load_dotenv()
+
+TRANSCODE_ENABLED = os.getenv('TRANSCODE_ENABLED', '1') == '1'
+# Extensions that are transcoded. Low-bitrate MP3s are usually smaller than
+# any re-encode, so MP3 is left out unless listed.
+TRANSCODE_FORMATS = {
+    ext.strip().lower() for ext in os.getenv('TRANSCODE_FORMATS', '.wav,.aiff,.flac,.m4a,.mp4,.webm').split(',')
+    if ext.strip()
+}
+# Opus bitrate; TRANSCODE_BITRATE_<EXT> (e.g. TRANSCODE_BITRATE_FLAC=32k) overrides it for one format
+TRANSCODE_BITRATE = os.getenv('TRANSCODE_BITRATE', '24k')
+TRANSCODE_SAMPLE_RATE = int(os.getenv('TRANSCODE_SAMPLE_RATE', '16000'))
+# Files smaller than this are sent as they are
+TRANSCODE_MIN_BYTES = int(os.getenv('TRANSCODE_MIN_BYTES', str(1024 * 1024)))
+TRANSCODE_TIMEOUT_SEC = int(os.getenv('TRANSCODE_TIMEOUT_SEC', '600'))
+TRANSCODE_CACHE_PATH = os.getenv('TRANSCODE_CACHE_PATH_DOCKER', '/app/db/transcoded') if os.getenv('IS_DOCKER') == '1' else os.getenv('TRANSCODE_CACHE_PATH_LOCAL', './transcoded')
+TRANSCODE_CACHE_MAX_BYTES = int(os.getenv('TRANSCODE_CACHE_MAX_BYTES', str(2 * 1024 * 1024 * 1024)))
+# Copies used more recently than this are never evicted, so one isn't
+# deleted between being made (or hit) and being opened for sending
+TRANSCODE_CACHE_MIN_AGE_SEC = int(os.getenv('TRANSCODE_CACHE_MIN_AGE_SEC', '600'))
+
+_evict_lock = threading.Lock()
+
+
+def transcode_settings(ext: str):
+    """Returns the Opus bitrate for an extension, or None if files of that format are sent as they are."""
+    ext = ext.lower()
+    if not TRANSCODE_ENABLED or ext not in TRANSCODE_FORMATS:
+        return None
+    return os.getenv(f'TRANSCODE_BITRATE_{ext.lstrip(".").upper()}', TRANSCODE_BITRATE)
+
+
+def cache_path(file_sha256: str, bitrate: str) -> str:
+    # The settings are part of the name, so changing them never serves a stale copy
+    return os.path.join(TRANSCODE_CACHE_PATH, f"{file_sha256}.{TRANSCODE_SAMPLE_RATE}.{bitrate}.ogg")
+
+
+def run_ffmpeg(source_path: str, destination_path: str, bitrate: str):
+    """Encodes the first audio stream to mono Opus at TRANSCODE_SAMPLE_RATE, written atomically."""
+    directory = os.path.dirname(destination_path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".ogg.tmp")
+    os.close(fd)
+    try:
+        subprocess.run(
+            ["ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error", "-y", "-threads", "1",
+             "-i", source_path, "-map", "0:a:0", "-vn", "-ac", "1", "-ar", str(TRANSCODE_SAMPLE_RATE),
+             "-c:a", "libopus", "-b:a", bitrate, "-application", "voip", "-f", "ogg", temp_path],
+            check=True, capture_output=True, timeout=TRANSCODE_TIMEOUT_SEC
+        )
+        os.replace(temp_path, destination_path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def evict_cache(max_bytes: int = TRANSCODE_CACHE_MAX_BYTES, min_age: int = TRANSCODE_CACHE_MIN_AGE_SEC):
+    """
+    Deletes the least recently used copies until the cache is under
+    `max_bytes`, sparing those used in the last `min_age` seconds.
+    """
+    min_mtime = time.time() - min_age
+    with _evict_lock:
+        entries = []
+        with os.scandir(TRANSCODE_CACHE_PATH) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith(".ogg"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, path in sorted(entries):
+            if total <= max_bytes or mtime > min_mtime:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+
+
+def _transcode(file_ref: str, filename: str, file_sha256: str, bitrate: str):
+    destination = cache_path(file_sha256, bitrate)
+    try:
+        # Cache hit; bump the mtime so eviction sees it as recently used
+        os.utime(destination)
+        return destination
+    except FileNotFoundError:
+        pass
+
+    store = get_blob_store()
+    source_path = store.local_path(file_ref)
+    if source_path:
+        run_ffmpeg(source_path, destination, bitrate)
+    else:
+        # ffmpeg needs a seekable file for containers like MP4
+        with tempfile.NamedTemporaryFile(suffix=os.path.splitext(filename)[1]) as temp, store.open(file_ref) as source:
+            shutil.copyfileobj(source, temp)
+            temp.flush()
+            run_ffmpeg(temp.name, destination, bitrate)
+    evict_cache()
+    return destination
+
+
+def transcode_for_stt(file_ref: str, filename: str, file_sha256: str, size: int) -> tuple:
+    """
+    Returns the speech-optimised copy to send instead of an upload.
+
+    Encodes in the calling task (see the module docstring). Files in
+    formats that aren't transcoded, small files, failed encodes and copies
+    no smaller than the original all come back as (None, filename),
+    meaning the original should be sent.
+
+    Returns:
+        tuple: (path of the copy or None, filename to send it under)
+    """
+    bitrate = transcode_settings(os.path.splitext(filename)[1])
+    if bitrate is None:
+        return None, filename
+    if size is None:
+        # Rows stored before sizes were recorded
+        source_path = get_blob_store().local_path(file_ref)
+        size = os.path.getsize(source_path) if source_path and os.path.exists(source_path) else 0
+    if size < TRANSCODE_MIN_BYTES:
+        return None, filename
+    try:
+        path = _transcode(file_ref, filename, file_sha256, bitrate)
+    except FileNotFoundError:
+        print(f"[{filename}] ⚠️ ffmpeg not found, sending the original")
+        return None, filename
+    except subprocess.CalledProcessError as e:
+        print(f"[{filename}] ⚠️ Transcode failed, sending the original: {e.stderr.decode(errors='replace').strip()}")
+        return None, filename
+    except subprocess.TimeoutExpired:
+        print(f"[{filename}] ⚠️ Transcode timed out, sending the original")
+        return None, filename
+
+    if os.path.getsize(path) >= size:
+        return None, filename
+    return path, os.path.splitext(filename)[0] + ".ogg"
@@ -1,18 +1,80 @@
 from pydub import AudioSegment
+from collections import OrderedDict
+import hashlib
 import io
 import os
+import threading
+from .audio_probe import probe_duration
+from .async_db import run_in_audio_pool
 
 SUPPORTED_AUDIO_EXTENSIONS = {
     ".aac", ".aiff", ".flac", ".m4a", ".mp3", ".mp4",
     ".ogg", ".opus", ".wav", ".webm"
 }
 
-def get_audio_duration(audio_path: str) -> float:
+# Size of each read/write when streaming uploads to disk
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+def copy_upload_file(source, destination_path: str, chunk_size: int = UPLOAD_CHUNK_SIZE) -> tuple:
+    """
+    Copies a file object to disk in fixed-size chunks.
+
+    The SHA-256 digest and byte count are computed while the data streams,
+    so at most one chunk of the upload is held in memory at a time.
+
+    Parameters:
+    source (file): Readable binary file object, e.g. UploadFile.file.
+    destination_path (str): Where to write the file.
+    chunk_size (int): Number of bytes per read/write.
+
+    Returns:
+    tuple: (sha256 hex digest, size in bytes)
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with open(destination_path, "wb") as buffer:
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            size += len(chunk)
+            buffer.write(chunk)
+    return digest.hexdigest(), size
+
+async def save_upload_file(upload_file, destination_path: str, chunk_size: int = UPLOAD_CHUNK_SIZE) -> tuple:
+    """
+    Streams an uploaded file to disk without blocking the event loop.
+
+    The copy runs on the audio thread pool, see copy_upload_file.
+
+    Parameters:
+    upload_file (UploadFile): The incoming upload.
+    destination_path (str): Where to write the file.
+    chunk_size (int): Number of bytes per read/write.
+
+    Returns:
+    tuple: (sha256 hex digest, size in bytes)
+    """
+    await upload_file.seek(0)
+    return await run_in_audio_pool(copy_upload_file, upload_file.file, destination_path, chunk_size)
+
+# Durations already worked out, keyed by the SHA-256 of the file content
+DURATION_CACHE_SIZE = 1024
+_duration_cache = OrderedDict()
+_duration_cache_lock = threading.Lock()
+
+def get_audio_duration(audio_path: str, file_sha256: str = None) -> float:
     """
     Returns the duration (in seconds) of an audio file.
 
+    Container and frame headers are read first; the file is only fully
+    decoded with pydub when the headers can't tell. Results are cached by
+    content hash when one is given.
+
     Parameters:
     audio_path (str): Path to the audio file (e.g., MP3, WAV).
+    file_sha256 (str): Hex SHA-256 of the file, used as the cache key.
 
     Returns:
     float: Duration of the audio in seconds.
@@ -22,14 +84,30 @@ def get_audio_duration(audio_path: str) -> float:
     if ext not in SUPPORTED_AUDIO_EXTENSIONS:
         return False
 
+    if file_sha256:
+        # Probes run on the audio pool, so several threads share the cache
+        with _duration_cache_lock:
+            if file_sha256 in _duration_cache:
+                _duration_cache.move_to_end(file_sha256)
+                return _duration_cache[file_sha256]
+
     try:
-        # Load the audio file using pydub
-        audio = AudioSegment.from_file(audio_path)
+        duration = probe_duration(audio_path)
+        if duration is None:
+            # Load the audio file using pydub
+            audio = AudioSegment.from_file(audio_path)
+            duration = audio.duration_seconds
 
         # Get duration in seconds
-        duration = round(audio.duration_seconds, 2)
-        return duration
+        duration = round(duration, 2)
 
     except Exception as e:
         print(f"Error processing audio file: {str(e)}")
         return False
+
+    if file_sha256 and duration:
+        with _duration_cache_lock:
+            _duration_cache[file_sha256] = duration
+            if len(_duration_cache) > DURATION_CACHE_SIZE:
+                _duration_cache.popitem(last=False)
+    return duration
@@ -2,8 +2,7 @@ from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from fastapi import HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from . import crud, models, profile_db
+from . import async_db
 from dotenv import load_dotenv
 import os
 
@@ -28,10 +27,7 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     return encoded_jwt
 
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(profile_db.get_db)
-):
+async def get_current_user(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -45,7 +41,8 @@ def get_current_user(
     except JWTError:
         raise credentials_exception
 
-    user = crud.get_user_by_email(db, email=email)
+    # Loaded on the database pool; the user comes back detached from its session
+    user = await async_db.get_user_by_email(email)
     if user is None:
         raise credentials_exception
     return user
@@ -0,0 +1,149 @@
+import os
+import hashlib
+import tempfile
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Determine blob store location. It lives next to the databases so the backend
+# and the Celery worker see the same files through the shared volume.
+BLOB_STORE_BACKEND = os.getenv('BLOB_STORE_BACKEND', 'local')
+BLOB_STORE_PATH = os.getenv('BLOB_STORE_PATH_DOCKER', '/app/db/blobs') if os.getenv('IS_DOCKER') == '1' else os.getenv('BLOB_STORE_PATH_LOCAL', './blobs')
+
+# Size of each read/write when copying content into the store
+BLOB_CHUNK_SIZE = 1024 * 1024
+
+
+class BlobStore:
+    """
+    Interface for storing audio content outside the database.
+
+    Content is addressed by its SHA-256 digest. `put_*` returns a reference
+    string that is stored on the audio row and later passed back to `open`.
+    """
+
+    def put_file(self, file_path: str, sha256: str = None) -> str:
+        raise NotImplementedError
+
+    def put_stream(self, stream) -> tuple:
+        raise NotImplementedError
+
+    def open(self, ref: str):
+        raise NotImplementedError
+
+    def local_path(self, ref: str):
+        """Returns a filesystem path for the content, or None if the store has none."""
+        return None
+
+    def exists(self, ref: str) -> bool:
+        raise NotImplementedError
+
+    def delete(self, ref: str) -> bool:
+        raise NotImplementedError
+
+
+class LocalBlobStore(BlobStore):
+    """
+    Stores blobs on the local filesystem, sharded into nested directories by
+    the leading characters of the hash (e.g. `ab/cd/abcd1234...`).
+    """
+
+    def __init__(self, root: str, shard_depth: int = 2, shard_width: int = 2):
+        self.root = root
+        self.shard_depth = shard_depth
+        self.shard_width = shard_width
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, ref: str) -> str:
+        shards = [ref[i * self.shard_width:(i + 1) * self.shard_width] for i in range(self.shard_depth)]
+        return os.path.join(self.root, *shards, ref)
+
+    def _commit(self, temp_path: str, ref: str) -> str:
+        """Atomically moves a fully written temp file into its final location."""
+        final_path = self._path(ref)
+        if os.path.exists(final_path):
+            # Same content is already stored
+            os.remove(temp_path)
+            return ref
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        os.replace(temp_path, final_path)
+        return ref
+
+    def _temp_file(self):
+        return tempfile.NamedTemporaryFile(dir=self.root, prefix=".incoming-", delete=False)
+
+    def put_file(self, file_path: str, sha256: str = None) -> str:
+        """
+        Copies a file into the store.
+
+        Args:
+            file_path (str): Path to the file
+            sha256 (str): Hex digest of the file, computed while copying if not given
+
+        Returns:
+            str: Reference of the stored blob
+        """
+        if sha256 and self.exists(sha256):
+            return sha256
+        with open(file_path, 'rb') as src:
+            ref, _, _ = self.put_stream(src)
+        return ref
+
+    def put_stream(self, stream) -> tuple:
+        """
+        Copies a readable binary stream into the store in chunks.
+
+        Returns:
+            tuple: (ref, sha256 hex digest, size in bytes)
+        """
+        digest = hashlib.sha256()
+        size = 0
+        with self._temp_file() as temp:
+            try:
+                while True:
+                    chunk = stream.read(BLOB_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    size += len(chunk)
+                    temp.write(chunk)
+            except Exception:
+                temp.close()
+                os.remove(temp.name)
+                raise
+        sha256 = digest.hexdigest()
+        return self._commit(temp.name, sha256), sha256, size
+
+    def open(self, ref: str):
+        return open(self._path(ref), 'rb')
+
+    def local_path(self, ref: str) -> str:
+        return self._path(ref)
+
+    def exists(self, ref: str) -> bool:
+        return os.path.exists(self._path(ref))
+
+    def delete(self, ref: str) -> bool:
+        try:
+            os.remove(self._path(ref))
+            return True
+        except FileNotFoundError:
+            return False
+
+
+# Available blob store implementations, selected with BLOB_STORE_BACKEND
+BLOB_STORES = {
+    'local': LocalBlobStore,
+}
+
+_blob_store = None
+
+def get_blob_store() -> BlobStore:
+    """Returns the configured blob store, creating it on first use."""
+    global _blob_store
+    if _blob_store is None:
+        store_cls = BLOB_STORES.get(BLOB_STORE_BACKEND)
+        if store_cls is None:
+            raise ValueError(f"Unknown blob store backend: {BLOB_STORE_BACKEND}")
+        _blob_store = store_cls(BLOB_STORE_PATH)
+    return _blob_store
@@ -1,13 +1,37 @@
 import os
 from celery import Celery
+from celery.signals import worker_process_shutdown
+from .metrics import mark_process_dead
 
 if os.getenv('IS_DOCKER') == '1':
     redis_host = 'redis'  # Docker service name
 else:
     redis_host = 'localhost'
 
+REDIS_URL = f'redis://{redis_host}:6379/0'
+
 celery = Celery(
     'audio_tasks',
-    broker=f'redis://{redis_host}:6379/0',
-    backend=f'redis://{redis_host}:6379/0'
+    broker=REDIS_URL,
+    backend=REDIS_URL
 )
+
+# Each file is its own short task; take one at a time so a big upload
+# doesn't get prefetched by a single worker process
+celery.conf.worker_prefetch_multiplier = 1
+
+# Fallback for STT jobs whose webhook callback never arrived
+STT_SWEEP_INTERVAL_SEC = int(os.getenv('STT_SWEEP_INTERVAL_SEC', '120'))
+
+celery.conf.beat_schedule = {
+    'sweep-stt-jobs': {
+        'task': 'app.audio_tasks.sweep_stt_jobs_task',
+        'schedule': STT_SWEEP_INTERVAL_SEC,
+    },
+}
+
+
+@worker_process_shutdown.connect
+def mark_worker_dead(pid=None, **kwargs):
+    # Pool processes come and go; their live gauge files go with them
+    mark_process_dead(pid)
@@ -2,7 +2,6 @@ from sqlalchemy.orm import Session
 from . import models, schemas
 from passlib.context import CryptContext
 import uuid
-from .audio_db import init_user_audio_table
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -33,9 +32,6 @@ def create_user(db: Session, user: schemas.UserCreate):
     db.commit()
     db.refresh(db_user)
     
-    # Create user's audio table
-    init_user_audio_table(table_uuid)
-    
     return db_user
 
 
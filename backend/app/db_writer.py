@@ -0,0 +1,131 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from sqlalchemy.exc import OperationalError
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Writes that queue up while a batch is committing go into the next batch
+# together. A non-zero wait holds each batch open a little longer to gather
+# more writes, at the cost of that much extra latency per write.
+DB_WRITER_MAX_BATCH = int(os.getenv('DB_WRITER_MAX_BATCH', '64'))
+DB_WRITER_MAX_WAIT_MS = float(os.getenv('DB_WRITER_MAX_WAIT_MS', '0'))
+DB_WRITER_RETRIES = int(os.getenv('DB_WRITER_RETRIES', '5'))
+DB_WRITER_ENABLED = os.getenv('DB_WRITER_ENABLED', '1') == '1'
+
+
+def is_lock_error(error: OperationalError) -> bool:
+    message = str(error.orig).lower()
+    return "locked" in message or "busy" in message
+
+
+class SerialWriter:
+    """
+    Funnels all writes to a SQLite database through one thread.
+
+    Callers submit functions that take a connection and perform their writes.
+    The writer thread takes whatever has queued up (up to `max_batch`) and
+    runs it in a single BEGIN IMMEDIATE transaction, with each job in its own
+    savepoint so one failing job doesn't roll back the others. Within a
+    process, writes never contend with each other, and a burst of writes
+    costs one commit instead of one per write. If another process holds the
+    lock for longer than the busy timeout, the batch is retried.
+    """
+
+    def __init__(self, engine, max_batch: int = DB_WRITER_MAX_BATCH, max_wait_ms: float = DB_WRITER_MAX_WAIT_MS,
+                 retries: int = DB_WRITER_RETRIES, name: str = "db-writer"):
+        self.engine = engine.execution_options(sqlite_immediate=True)
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.retries = retries
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        # Started lazily so a writer created at import time survives Celery's fork
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def submit(self, fn) -> Future:
+        """Queues `fn(conn)` and returns a Future for its result."""
+        future = Future()
+        self._ensure_started()
+        self._queue.put((fn, future))
+        return future
+
+    def write(self, fn, timeout: float = None):
+        """Runs `fn(conn)` on the writer thread and waits for its result."""
+        return self.submit(fn).result(timeout)
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            for attempt in range(self.retries + 1):
+                try:
+                    results = self._commit_batch(batch)
+                    break
+                except OperationalError as e:
+                    if attempt == self.retries or not is_lock_error(e):
+                        results = [e] * len(batch)
+                        break
+                    print(f"[{self.name}] ⚠️ Batch of {len(batch)} writes failed ({e.orig}), retrying")
+                    time.sleep(0.05 * 2 ** attempt)
+                except Exception as e:
+                    results = [e] * len(batch)
+                    break
+
+            for (_, future), result in zip(batch, results):
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def _commit_batch(self, batch: list) -> list:
+        results = []
+        with self.engine.begin() as conn:
+            for fn, _ in batch:
+                savepoint = conn.begin_nested()
+                try:
+                    results.append(fn(conn))
+                    savepoint.commit()
+                except OperationalError as e:
+                    savepoint.rollback()
+                    if is_lock_error(e):
+                        # Abort the whole batch so it can be retried
+                        raise
+                    results.append(e)
+                except Exception as e:
+                    savepoint.rollback()
+                    results.append(e)
+        return results
+
+
+def run_write(writer: SerialWriter, engine, fn):
+    """
+    Runs `fn(conn)` through the writer, or directly in an immediate
+    transaction when the writer is disabled with DB_WRITER_ENABLED=0.
+    """
+    if DB_WRITER_ENABLED:
+        return writer.write(fn)
+    with engine.execution_options(sqlite_immediate=True).begin() as conn:
+        return fn(conn)
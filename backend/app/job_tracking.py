@@ -0,0 +1,68 @@
+import os
+import json
+import time
+import redis
+from dotenv import load_dotenv
+from .celery_app import REDIS_URL
+
+load_dotenv()
+
+# Files a single user may have in transcription at once; the rest of their
+# files wait in the queue so other users' uploads get worker time too
+USER_MAX_CONCURRENT_FILES = int(os.getenv('USER_MAX_CONCURRENT_FILES', '4'))
+USER_SLOT_RETRY_SEC = int(os.getenv('USER_SLOT_RETRY_SEC', '30'))
+# Slots of jobs that never report back are reclaimed after this long
+USER_SLOT_STALE_SEC = int(os.getenv('STT_JOB_TIMEOUT_SEC', str(45 * 60)))
+# How long an upload's file list is kept for the status endpoint
+UPLOAD_RECORD_TTL_SEC = int(os.getenv('UPLOAD_RECORD_TTL_SEC', str(7 * 24 * 3600)))
+
+redis_client = redis.Redis.from_url(REDIS_URL)
+
+# Drops stale slots, then takes one if the user is under the limit.
+# Taking a slot the file already holds succeeds, so retries are safe.
+_ACQUIRE_SLOT = redis_client.register_script("""
+local key, now, stale, limit, member = KEYS[1], tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), ARGV[4]
+redis.call('ZREMRANGEBYSCORE', key, '-inf', now - stale)
+if redis.call('ZSCORE', key, member) then
+    return 1
+end
+if redis.call('ZCARD', key) < limit then
+    redis.call('ZADD', key, now, member)
+    redis.call('EXPIRE', key, stale)
+    return 1
+end
+return 0
+""")
+
+
+def _slots_key(user_id: int) -> str:
+    return f"user:{user_id}:stt_slots"
+
+
+def acquire_user_slot(user_id: int, file_id: int) -> bool:
+    """Reserves one of the user's transcription slots for a file."""
+    return bool(_ACQUIRE_SLOT(
+        keys=[_slots_key(user_id)],
+        args=[time.time(), USER_SLOT_STALE_SEC, USER_MAX_CONCURRENT_FILES, file_id]
+    ))
+
+
+def release_user_slot(user_id: int, file_id: int):
+    """Frees a file's slot once its job has finished, failed or was never sent."""
+    try:
+        redis_client.zrem(_slots_key(user_id), file_id)
+    except redis.RedisError as e:
+        print(f"[{file_id}] ⚠️ Failed to release slot for user {user_id}: {e}")
+
+
+def save_upload(upload_id: str, user_id: int, file_ids: list):
+    """Remembers which files belong to an upload, for the upload status endpoint."""
+    redis_client.set(
+        f"upload:{upload_id}", json.dumps({"user_id": user_id, "file_ids": file_ids}), ex=UPLOAD_RECORD_TTL_SEC
+    )
+
+
+def load_upload(upload_id: str):
+    """Returns {"user_id", "file_ids"} for an upload, or None if unknown or expired."""
+    data = redis_client.get(f"upload:{upload_id}")
+    return json.loads(data) if data else None
@@ -1,8 +1,9 @@
 from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Request, Query, Body
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, HTMLResponse, JSONResponse
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
 from typing import Optional, List
 import os
@@ -13,12 +14,19 @@ import hashlib
 import razorpay
 from datetime import datetime
 import base64
+import json
+import uuid
 from dotenv import load_dotenv
 
 from . import models, schemas, crud, auth, deps, profile_db
-from .audio_db import fetch_audio_metadata_by_user, ANALYSIS_COLUMNS, add_audio_file, init_user_audio_table
-from .audio_tasks import process_audio_files_task
-from .audio_utils import get_audio_duration, SUPPORTED_AUDIO_EXTENSIONS
+from .audio_db import ANALYSIS_COLUMNS, seed_audio_count, fetch_audio_statuses as fetch_audio_statuses_blocking
+from .async_db import fetch_audio_metadata_by_user, fetch_audio_metadata_since, add_audio_file, add_audio_metadata, find_audio_analysis_by_hash, fetch_audio_statuses, run_in_audio_pool
+from .audio_tasks import queue_audio_files, queue_reanalysis, store_stt_result_task
+from .job_tracking import save_upload, load_upload
+from .send_audio_for_processing import sign_payload, STT_WEBHOOK_SECRET
+from .audio_utils import get_audio_duration, save_upload_file, SUPPORTED_AUDIO_EXTENSIONS
+from .metrics import timed, render_metrics, mark_process_dead
+from .progress import publish_progress, publish_stt_progress, progress_events
 
 load_dotenv()
 
@@ -59,7 +67,9 @@ def signup(user: schemas.UserCreate, db: Session = Depends(deps.get_db)):
     db_user = crud.get_user_by_email(db, user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    return crud.create_user(db, user)
+    db_user = crud.create_user(db, user)
+    seed_audio_count(db_user.id)
+    return db_user
 
 @app.get("/login", response_class=FileResponse)
 def get_login():
@@ -137,6 +147,8 @@ async def upload_files(
     try:
         saved_files = []
         saved_file_ids = []  # Track the IDs of saved files
+        queued_file_ids = []  # Files that still need transcription
+        reused_file_ids = []  # Files whose analysis was copied from an identical upload
         temp_files = []  # Keep track of files to clean up
         # Create user-specific directory
         user_upload_dir = os.path.join(UPLOAD_DIR, str(current_user.id))
@@ -153,14 +165,14 @@ async def upload_files(
             destination_path = os.path.join(user_upload_dir, relative_path)
             os.makedirs(os.path.dirname(destination_path), exist_ok=True)
 
-            # Save the file
-            with open(destination_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            
+            # Stream the file to disk, hashing it as it goes
             temp_files.append(destination_path)  # Add to cleanup list
+            with timed("upload"):
+                file_sha256, file_size = await save_upload_file(file, destination_path)
 
             # Check audio duration
-            duration = get_audio_duration(destination_path)
+            with timed("duration_probe"):
+                duration = await run_in_audio_pool(get_audio_duration, destination_path, file_sha256)
             if not duration:
                 # Clean up the file if duration check fails
                 # it might be a malicious file
@@ -174,16 +186,24 @@ async def upload_files(
             print(f"Saving file: {relative_path} to {destination_path}")
             print(f"Checking duration for: {destination_path}")
             print(f"Duration: {duration}")
+            print(f"Size: {file_size} bytes, SHA-256: {file_sha256}")
+
+            # An identical recording that was already analysed doesn't need
+            # to go through transcription again
+            existing_analysis = await find_audio_analysis_by_hash(file_sha256, current_user.id)
 
             # Add file to database and get the ID
-            file_id = add_audio_file(
-                file_path=destination_path,
-                file_name=relative_path,
-                table_uuid=current_user.table_uuid
-            )
+            with timed("db_insert"):
+                file_id = await add_audio_file(
+                    file_path=destination_path,
+                    file_name=relative_path,
+                    user_id=current_user.id,
+                    file_size=file_size,
+                    file_sha256=file_sha256
+                )
             print(f"add_audio_file returned file_id: {file_id} for {relative_path}")
 
-            if not file_id:
+            if not file_id or file_id == -1:
                 # Clean up the file if database insertion fails
                 os.remove(destination_path)
                 temp_files.remove(destination_path)  # Remove from cleanup list
@@ -192,6 +212,12 @@ async def upload_files(
                     detail=f"Failed to save file metadata: {relative_path}"
                 )
 
+            if existing_analysis:
+                await add_audio_metadata(file_id, current_user.id, existing_analysis)
+                reused_file_ids.append(file_id)
+            else:
+                queued_file_ids.append(file_id)
+
             saved_files.append(relative_path)
             saved_file_ids.append(file_id)
 
@@ -203,17 +229,32 @@ async def upload_files(
             except Exception as e:
                 print(f"Warning: Failed to remove temporary file {temp_file}: {str(e)}")
 
-        # Queue the file IDs for processing
-        if saved_file_ids:
+        # Published before queueing, so a fast worker's first stage can't arrive ahead of it
+        for file_id in queued_file_ids:
+            publish_progress(current_user.id, file_id, "queued")
+        for file_id in reused_file_ids:
+            publish_progress(current_user.id, file_id, "done")
+
+        # Queue one task per file; the group's ID tracks the whole upload
+        if queued_file_ids:
             # TODO: deduct credits
-            process_audio_files_task.delay(saved_file_ids, current_user.table_uuid)
+            upload_id = queue_audio_files(queued_file_ids, current_user.id).id
+        else:
+            upload_id = str(uuid.uuid4())
+        save_upload(upload_id, current_user.id, saved_file_ids)
 
-        print(f"Saved file IDs: {saved_file_ids}")
+        print(f"Saved file IDs: {saved_file_ids}, reused analyses: {reused_file_ids}")
 
         return {
             "message": f"Successfully uploaded {len(saved_files)} files",
+            "upload_id": upload_id,
             "files": saved_files,
-            "file_ids": saved_file_ids
+            "file_ids": saved_file_ids,
+            "reused_file_ids": reused_file_ids,
+            "dedup": {
+                "hits": len(reused_file_ids),
+                "misses": len(queued_file_ids)
+            }
         }
     except HTTPException as he:
         # Clean up any remaining files if an error occurred
@@ -235,6 +276,106 @@ async def upload_files(
         print(f"Upload error: {str(e0)}")
         raise HTTPException(status_code=500, detail=str(e0))
 
+@app.get("/api/uploads/{upload_id}")
+def upload_status(
+    upload_id: str,
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """
+    Progress of an upload: the state of each of its files.
+
+    A plain def, so FastAPI runs it in its threadpool: both the Redis lookup
+    and the status query block.
+    """
+    upload = load_upload(upload_id)
+    if not upload or upload["user_id"] != current_user.id:
+        raise HTTPException(status_code=404, detail="Upload not found")
+
+    files = fetch_audio_statuses_blocking(current_user.id, upload["file_ids"])
+    counts = {status: 0 for status in ("queued", "processing", "complete", "failed")}
+    for file in files:
+        counts[file["status"]] += 1
+
+    return {
+        "upload_id": upload_id,
+        "total": len(files),
+        **counts,
+        "done": counts["complete"] + counts["failed"] == len(files),
+        "files": files
+    }
+
+@app.post("/api/reanalyze", status_code=202)
+async def reanalyze_files(
+    file_ids: List[int] = Body(..., embed=True),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """
+    Re-runs the analysis of some of the user's files, e.g. after a prompt
+    change. Stored stage outputs are reused where their prompt, model and
+    input are unchanged (see send_audio_for_processing.reanalyze_audio_file).
+    Progress is tracked like an upload, under the returned upload_id.
+    """
+    files = await fetch_audio_statuses(current_user.id, file_ids)
+    owned_ids = [file["id"] for file in files]
+    if not owned_ids:
+        raise HTTPException(status_code=404, detail="No such files")
+
+    for file_id in owned_ids:
+        publish_progress(current_user.id, file_id, "queued")
+    upload_id = queue_reanalysis(owned_ids, current_user.id).id
+    save_upload(upload_id, current_user.id, owned_ids)
+    return {"upload_id": upload_id, "file_ids": owned_ids}
+
+@app.post("/api/stt-callback", status_code=202)
+async def stt_callback(request: Request):
+    """
+    Receives finished jobs from the STT service. The body is signed with the
+    shared webhook secret; the result is stored by a Celery task.
+    """
+    body = await request.body()
+    signature = request.headers.get("X-Signature", "")
+    if not STT_WEBHOOK_SECRET or not hmac.compare_digest(sign_payload(body), signature):
+        raise HTTPException(status_code=401, detail="Invalid signature")
+
+    try:
+        payload = json.loads(body)
+        job_id = payload["job_id"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid callback payload")
+
+    if payload.get("status") == "progress":
+        # Stage changes only go to open dashboards, nothing is stored
+        published = publish_stt_progress(job_id, payload)
+        return {"job_id": job_id, "status": "published" if published else "ignored"}
+
+    store_stt_result_task.delay(job_id, payload.get("status"), payload.get("result"), payload.get("error"))
+    return {"job_id": job_id, "status": "accepted"}
+
+@app.get("/api/progress")
+async def progress_stream(request: Request, token: str = Query(...)):
+    """
+    Server-sent events with the pipeline stage of each of the user's files
+    (see progress). EventSource can't set headers, so the access token comes
+    in the query string.
+    """
+    current_user = await auth.get_current_user(token)
+    return StreamingResponse(
+        progress_events(current_user.id, request.is_disconnected),
+        media_type="text/event-stream",
+        # Stop proxies buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.on_event("shutdown")
+def on_shutdown():
+    mark_process_dead()
+
+@app.get("/metrics")
+def metrics():
+    """Per-stage latency histograms in the Prometheus text format."""
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
+
 @app.get("/upload", response_class=HTMLResponse)
 async def upload_form():
     return FileResponse("static/upload.html")
@@ -246,21 +387,17 @@ async def transcriptions(request: Request, page: int = 1):
 @app.get("/api/transcriptions")
 async def api_transcriptions(
     page: int = 1,
+    cursor: Optional[str] = None,
     current_user: models.User = Depends(auth.get_current_user)
 ):
-    total_count, audios_data = fetch_audio_metadata_by_user(
-        table_uuid=current_user.table_uuid,
-        page_number=page
-    )
-
-    # # Drop column at index 2 (3rd column)
-    # audios_data = [[item for i, item in enumerate(row) if i != 2] for row in audios_data]
-
-
-    # print(len(audios_data), type(audios_data))
-    # print(len(audios_data[0]), type(audios_data[0]))
-
-
+    try:
+        total_count, audios_data, next_cursor = await fetch_audio_metadata_by_user(
+            user_id=current_user.id,
+            page_number=page,
+            cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     # Define the columns to include (basic + analysis)
     basic_columns = ["ID", "Name", "Time", "Transcription"]
@@ -278,33 +415,25 @@ async def api_transcriptions(
                 return base64.b64encode(val).decode("utf-8")
         return val
 
-    # table_data = []
-    # for row in audios_data:
-    #     safe_row = [safe_value(val) for val in row]
-    #     table_data.append(safe_row)
-
+    # Records only hold the listing columns, in header order
     table_data = []
     for row in audios_data:
-        values = list(row.values())
-        if len(values) > 2:
-            del values[2]  # Drop the 3rd column
-        safe_row = [safe_value(val) for val in values]
+        safe_row = [safe_value(val) for val in row.values()]
         table_data.append(safe_row)
-    
 
     return {
         "headers": headers,
         "table_data": table_data,
         "total_count": total_count,
         "current_page": page,
-        "total_pages": (total_count + 9) // 10  # Ceiling division
+        "total_pages": (total_count + 9) // 10,  # Ceiling division
+        "next_cursor": next_cursor
     }
 
 @app.get("/transcriptions/by-date")
 async def get_transcriptions_by_date(
     start_date: str = Query(..., description="Start date in YYYY-MM-DD format"),
-    current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(deps.get_db)
+    current_user: models.User = Depends(auth.get_current_user)
 ):
     try:
         # Validate date format
@@ -313,27 +442,16 @@ async def get_transcriptions_by_date(
         return JSONResponse(content={"error": "Invalid date format. Use YYYY-MM-DD."}, status_code=400)
 
     try:
-        # Get the user's audio table
-        audio_table = models.Audio.get_table(current_user.table_uuid)
-        
-        # Query using SQLAlchemy
-        query = (
-            db.query(audio_table)
-            .filter(audio_table.created_at >= start_date)
-            .order_by(audio_table.created_at.asc())
-        )
-        
-        # Execute query and get results
-        results = query.all()
-        
+        results = await fetch_audio_metadata_since(current_user.id, start_date)
+
         # Convert results to list of dictionaries
-        return JSONResponse(content=[{
-            "id": row.id,
-            "name": row.name,
-            "transcription": row.transcription,
-            "created_at": row.created_at,
-            **{col: getattr(row, col) for col in ANALYSIS_COLUMNS}
-        } for row in results])
+        return JSONResponse(content=jsonable_encoder([{
+            "id": row["id"],
+            "name": row["name"],
+            "transcription": row["transcription"],
+            "created_at": row["created_at"],
+            **{col: row[col] for col in ANALYSIS_COLUMNS}
+        } for row in results]))
         
     except Exception as e:
         return JSONResponse(
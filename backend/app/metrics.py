@@ -0,0 +1,81 @@
+import glob
+import os
+import time
+from contextlib import contextmanager
+from prometheus_client import Counter, Histogram, CollectorRegistry, generate_latest, CONTENT_TYPE_LATEST, REGISTRY, multiprocess
+
+# Upload handling takes milliseconds, queue waits and STT hand-offs can take minutes
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+STAGE_SECONDS = Histogram(
+    "backend_stage_seconds",
+    "Time spent in each stage of the upload and processing pipeline",
+    ["stage"],
+    buckets=STAGE_BUCKETS
+)
+
+TRANSCODE_BYTES_SAVED = Counter(
+    "backend_transcode_bytes_saved",
+    "Bytes not sent to the STT service thanks to transcoding"
+)
+TRANSCODE_UPLOAD_SECONDS_SAVED = Counter(
+    "backend_transcode_upload_seconds_saved",
+    "Estimated time not spent sending to the STT service thanks to transcoding"
+)
+
+
+@contextmanager
+def timed(stage: str):
+    """Records how long the block takes under `stage`, whether or not it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - start)
+
+
+def observe(stage: str, seconds: float):
+    """Records a duration measured elsewhere, e.g. time spent waiting in the queue."""
+    STAGE_SECONDS.labels(stage).observe(seconds)
+
+
+# Multi-process mode: each process writes its samples to files in
+# PROMETHEUS_MULTIPROC_DIR, which must be set before prometheus_client is
+# imported and emptied before the service's processes start. Services in
+# separate containers (the backend and the Celery worker) each get their own
+# subdirectory of METRICS_SHARED_DIR, since their PIDs can collide, and the
+# backend's /metrics merges all of them.
+METRICS_SHARED_DIR = os.getenv("METRICS_SHARED_DIR")
+
+
+class _SharedDirCollector:
+    """Merges the multi-process files of every service under METRICS_SHARED_DIR."""
+
+    def __init__(self, shared_dir: str):
+        self.shared_dir = shared_dir
+
+    def collect(self):
+        files = glob.glob(os.path.join(self.shared_dir, "*", "*.db"))
+        return multiprocess.MultiProcessCollector.merge(files, accumulate=True)
+
+
+def render_metrics() -> tuple:
+    """
+    Returns (body, content type) for the /metrics endpoint, aggregated over
+    all processes when multi-process mode is on (see METRICS_SHARED_DIR).
+    """
+    if METRICS_SHARED_DIR:
+        registry = CollectorRegistry()
+        registry.register(_SharedDirCollector(METRICS_SHARED_DIR))
+    elif os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid: int = None):
+    """Drops an exiting process's live gauge files; a no-op outside multi-process mode."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid or os.getpid())
@@ -0,0 +1,112 @@
+"""
+One-shot migration that moves audio BLOBs out of audio.db into the blob store.
+
+For every per-user audio table that still has a `file` column, each row's
+content is streamed into the blob store, the row gets its `file_ref`,
+`file_size` and `file_sha256`, and finally the `file` column is dropped.
+The migration is resumable: rows that already have a `file_ref` are skipped.
+
+Run it once before starting the new backend:
+
+    python -m app.migrate_audio_blobs
+"""
+from .audio_db import engine, write_engine
+from .blob_store import get_blob_store, BLOB_CHUNK_SIZE
+
+NEW_COLUMNS = [
+    ("file_ref", "VARCHAR"),
+    ("file_size", "INTEGER"),
+    ("file_sha256", "VARCHAR"),
+]
+
+
+class _BlobReader:
+    """File-like reader over an open sqlite3 Blob."""
+
+    def __init__(self, blob):
+        self.blob = blob
+
+    def read(self, size=BLOB_CHUNK_SIZE):
+        return self.blob.read(size)
+
+
+def _table_columns(conn, table_name: str) -> set:
+    rows = conn.exec_driver_sql(f'PRAGMA table_info("{table_name}")').fetchall()
+    return {row[1] for row in rows}
+
+
+def legacy_blob_tables() -> list:
+    """Returns the names of audio tables that still store a `file` BLOB column."""
+    with engine.connect() as conn:
+        names = [row[0] for row in conn.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+        )]
+        return [name for name in names if "file" in _table_columns(conn, name)]
+
+
+def migrate_table(table_name: str, batch_size: int = 50) -> int:
+    """
+    Moves the BLOBs of one table into the blob store.
+
+    Args:
+        table_name (str): Name of the per-user audio table
+        batch_size (int): Rows committed per transaction
+
+    Returns:
+        int: Number of rows migrated
+    """
+    store = get_blob_store()
+    migrated = 0
+
+    with write_engine.begin() as conn:
+        columns = _table_columns(conn, table_name)
+        for column, column_type in NEW_COLUMNS:
+            if column not in columns:
+                conn.exec_driver_sql(f'ALTER TABLE "{table_name}" ADD COLUMN {column} {column_type}')
+        conn.exec_driver_sql(
+            f'CREATE INDEX IF NOT EXISTS "ix_{table_name}_file_sha256" ON "{table_name}" (file_sha256)'
+        )
+
+    while True:
+        with write_engine.begin() as conn:
+            ids = [row[0] for row in conn.exec_driver_sql(
+                f'SELECT id FROM "{table_name}" WHERE file_ref IS NULL AND length(file) > 0 ORDER BY id LIMIT ?',
+                (batch_size,)
+            )]
+            if not ids:
+                break
+
+            sqlite_conn = conn.connection.driver_connection
+            for row_id in ids:
+                # Stream the BLOB out in chunks rather than loading it whole
+                with sqlite_conn.blobopen(table_name, "file", row_id, readonly=True) as blob:
+                    ref, sha256, size = store.put_stream(_BlobReader(blob))
+                conn.exec_driver_sql(
+                    f'UPDATE "{table_name}" SET file_ref = ?, file_size = ?, file_sha256 = ?, file = x\'\' WHERE id = ?',
+                    (ref, size, sha256, row_id)
+                )
+                migrated += 1
+        print(f"{table_name}: migrated {migrated} rows")
+
+    # New code no longer writes the column, and it is NOT NULL, so drop it
+    with write_engine.begin() as conn:
+        conn.exec_driver_sql(f'ALTER TABLE "{table_name}" DROP COLUMN file')
+
+    return migrated
+
+
+def migrate_all(vacuum: bool = True) -> int:
+    """Migrates every legacy table and reclaims the freed space."""
+    total = 0
+    for table_name in legacy_blob_tables():
+        total += migrate_table(table_name)
+
+    if vacuum:
+        with engine.connect() as conn:
+            conn.execution_options(isolation_level="AUTOCOMMIT").exec_driver_sql("VACUUM")
+    return total
+
+
+if __name__ == "__main__":
+    count = migrate_all()
+    print(f"Moved {count} audio files into the blob store")
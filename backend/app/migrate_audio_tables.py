@@ -0,0 +1,208 @@
+"""
+Moves the old per-user audio tables into the shared `audios` table.
+
+Rows are copied in small batches, each in its own short transaction, so the
+backend and the Celery worker keep running while the migration goes on.
+Progress is recorded per table, so an interrupted run resumes where it left
+off. Once a table is fully copied, analyses that landed on its rows after
+they were copied are carried over, the user's count is recomputed and the
+old table is dropped.
+
+Legacy tables must have gone through app.migrate_audio_blobs first. Run:
+
+    python -m app.migrate_audio_tables [--batch-size N] [--keep-legacy]
+"""
+import argparse
+from sqlalchemy import Table, Column, Integer, String, select
+from sqlalchemy.exc import OperationalError
+from .audio_db import engine, write_engine, Base, ANALYSIS_COLUMNS, user_audio_counts
+from .profile_db import SessionLocal as ProfileSessionLocal
+from . import models
+
+# Columns carried over from the legacy tables, besides the id
+COPY_COLUMNS = ["name", "file_ref", "file_size", "file_sha256", "created_at"] + ANALYSIS_COLUMNS
+
+# Migration progress per legacy table
+audio_table_migrations = Table(
+    "audio_table_migrations",
+    Base.metadata,
+    Column('table_uuid', String, primary_key=True),
+    Column('user_id', Integer, nullable=False),
+    Column('last_legacy_id', Integer, nullable=False, default=0),
+    Column('done', Integer, nullable=False, default=0)
+)
+
+# Maps legacy row IDs to their new IDs in `audios`
+audio_legacy_ids = Table(
+    "audio_legacy_ids",
+    Base.metadata,
+    Column('table_uuid', String, primary_key=True),
+    Column('legacy_id', Integer, primary_key=True),
+    Column('audio_id', Integer, nullable=False)
+)
+
+
+def _table_columns(conn, table_name: str) -> set:
+    rows = conn.exec_driver_sql(f'PRAGMA table_info("{table_name}")').fetchall()
+    return {row[1] for row in rows}
+
+
+def _existing_tables(conn) -> set:
+    return {row[0] for row in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def migrate_table(table_uuid: str, user_id: int, batch_size: int = 500, keep_legacy: bool = False) -> int:
+    """
+    Copies one legacy table into `audios`.
+
+    Args:
+        table_uuid (str): Name of the legacy per-user table
+        user_id (int): ID of the user owning it
+        batch_size (int): Rows copied per transaction
+        keep_legacy (bool): Keep the legacy table after copying
+
+    Returns:
+        int: Number of rows copied in this run
+    """
+    columns_sql = ", ".join(COPY_COLUMNS)
+    placeholders = ", ".join("?" for _ in COPY_COLUMNS)
+
+    with write_engine.begin() as conn:
+        missing = set(COPY_COLUMNS) - _table_columns(conn, table_uuid)
+        if "file" in _table_columns(conn, table_uuid) or missing:
+            raise RuntimeError(f"{table_uuid} still stores BLOBs, run app.migrate_audio_blobs first")
+        conn.execute(
+            audio_table_migrations.insert().prefix_with("OR IGNORE").values(table_uuid=table_uuid, user_id=user_id)
+        )
+
+    copied = 0
+    while True:
+        with write_engine.begin() as conn:
+            last_id = conn.execute(
+                select(audio_table_migrations.c.last_legacy_id)
+                .where(audio_table_migrations.c.table_uuid == table_uuid)
+            ).scalar()
+            rows = conn.exec_driver_sql(
+                f'SELECT id, {columns_sql} FROM "{table_uuid}" WHERE id > ? ORDER BY id LIMIT ?',
+                (last_id, batch_size)
+            ).fetchall()
+            if not rows:
+                break
+
+            for row in rows:
+                # Raw SQL keeps created_at exactly as stored
+                audio_id = conn.exec_driver_sql(
+                    f"INSERT INTO audios (user_id, {columns_sql}) VALUES (?, {placeholders})",
+                    (user_id, *row[1:])
+                ).lastrowid
+                conn.execute(audio_legacy_ids.insert().values(
+                    table_uuid=table_uuid, legacy_id=row[0], audio_id=audio_id
+                ))
+
+            conn.execute(
+                audio_table_migrations.update()
+                .where(audio_table_migrations.c.table_uuid == table_uuid)
+                .values(last_legacy_id=rows[-1][0])
+            )
+        copied += len(rows)
+        print(f"{table_uuid}: copied {copied} rows")
+
+    with write_engine.begin() as conn:
+        # Analyses written to legacy rows after they were copied
+        analysis_sql = ", ".join(ANALYSIS_COLUMNS)
+        legacy_analysis_sql = ", ".join(f"l.{col}" for col in ANALYSIS_COLUMNS)
+        conn.exec_driver_sql(
+            f'''UPDATE audios SET ({analysis_sql}) = (
+                    SELECT {legacy_analysis_sql} FROM "{table_uuid}" l
+                    JOIN audio_legacy_ids m ON m.legacy_id = l.id AND m.table_uuid = ?
+                    WHERE m.audio_id = audios.id
+                )
+                WHERE audios.overall_score IS NULL AND audios.id IN (
+                    SELECT m.audio_id FROM audio_legacy_ids m
+                    JOIN "{table_uuid}" l ON l.id = m.legacy_id
+                    WHERE m.table_uuid = ? AND l.overall_score IS NOT NULL
+                )''',
+            (table_uuid, table_uuid)
+        )
+
+        # Recount, new uploads may have been counted before the old rows arrived
+        conn.exec_driver_sql(
+            f"INSERT OR REPLACE INTO {user_audio_counts.name} (user_id, count) "
+            "SELECT ?, count(*) FROM audios WHERE user_id = ?",
+            (user_id, user_id)
+        )
+        conn.execute(
+            audio_table_migrations.update()
+            .where(audio_table_migrations.c.table_uuid == table_uuid)
+            .values(done=1)
+        )
+        if not keep_legacy:
+            conn.exec_driver_sql(f'DROP TABLE "{table_uuid}"')
+
+    return copied
+
+
+def resolve_legacy_ids(table_uuid: str, legacy_ids: list):
+    """
+    Maps row IDs of a legacy table to their owner and new IDs in `audios`,
+    for tasks queued before the migration.
+
+    Returns:
+        tuple: (user_id, audio IDs), leaving out IDs that were never copied,
+            or None while the table hasn't been fully migrated
+    """
+    try:
+        with engine.connect() as conn:
+            user_id = conn.execute(
+                select(audio_table_migrations.c.user_id)
+                .where(audio_table_migrations.c.table_uuid == table_uuid)
+                .where(audio_table_migrations.c.done == 1)
+            ).scalar()
+            if user_id is None:
+                return None
+            mapped = dict(conn.execute(
+                select(audio_legacy_ids.c.legacy_id, audio_legacy_ids.c.audio_id)
+                .where(audio_legacy_ids.c.table_uuid == table_uuid)
+                .where(audio_legacy_ids.c.legacy_id.in_(list(legacy_ids)))
+            ).all())
+    except OperationalError:
+        # The migration has never run, so its tables don't exist yet
+        return None
+    return user_id, [mapped[legacy_id] for legacy_id in legacy_ids if legacy_id in mapped]
+
+
+def migrate_all(batch_size: int = 500, keep_legacy: bool = False) -> int:
+    """Migrates the legacy table of every user that still has one."""
+    Base.metadata.create_all(engine)
+
+    db = ProfileSessionLocal()
+    try:
+        users = db.query(models.User.id, models.User.table_uuid).all()
+    finally:
+        db.close()
+
+    with engine.connect() as conn:
+        tables = _existing_tables(conn)
+        done = {row[0] for row in conn.execute(
+            select(audio_table_migrations.c.table_uuid).where(audio_table_migrations.c.done == 1)
+        )}
+
+    total = 0
+    for user_id, table_uuid in users:
+        if table_uuid in tables and table_uuid not in done:
+            total += migrate_table(table_uuid, user_id, batch_size, keep_legacy)
+
+    # Per-table counts from before the shared table
+    with write_engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE IF EXISTS audio_counts")
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move per-user audio tables into the shared audios table.")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--keep-legacy", action="store_true", help="Don't drop legacy tables after copying")
+    args = parser.parse_args()
+
+    count = migrate_all(args.batch_size, args.keep_legacy)
+    print(f"Moved {count} audio rows into the audios table")
@@ -0,0 +1,122 @@
+"""
+Per-file pipeline progress, pushed to open dashboards.
+
+Each stage change is published on a Redis channel per user and the latest
+stage of each file is kept in a hash, so a client that connects (or
+reconnects) gets the current state without touching the audio database.
+The STT service reports its own stages through the webhook (see
+stt_callback); its job IDs are mapped back to files here for that.
+
+Stages, in order: queued, transcribing, correcting, translating, analysing,
+then done or failed. Events may also carry a partial transcript: the raw
+transcript with "correcting", and each translated chunk, in order, with
+"translating".
+"""
+import json
+import os
+import time
+import redis
+import redis.asyncio
+from dotenv import load_dotenv
+
+from .celery_app import REDIS_URL
+from .job_tracking import redis_client
+
+load_dotenv()
+
+PROGRESS_STAGES = ("queued", "transcribing", "correcting", "translating", "analysing", "done", "failed")
+# Extra event fields the STT service may send; transcript text isn't kept in the state hash
+PROGRESS_FIELDS = ("chunk", "chunks", "transcript", "text", "segments", "error")
+PROGRESS_TEXT_FIELDS = ("transcript", "text")
+# A comment line is sent this often so proxies don't drop idle streams
+PROGRESS_HEARTBEAT_SEC = int(os.getenv('PROGRESS_HEARTBEAT_SEC', '15'))
+# How long a user's file states are kept after their last change
+PROGRESS_STATE_TTL_SEC = int(os.getenv('PROGRESS_STATE_TTL_SEC', str(24 * 3600)))
+STT_JOB_MAP_TTL_SEC = int(os.getenv('STT_JOB_TIMEOUT_SEC', str(45 * 60)))
+
+async_redis_client = redis.asyncio.Redis.from_url(REDIS_URL)
+
+
+def _channel(user_id: int) -> str:
+    return f"user:{user_id}:progress"
+
+
+def _state_key(user_id: int) -> str:
+    return f"user:{user_id}:progress_state"
+
+
+def publish_progress(user_id: int, file_id: int, stage: str, **extra):
+    """Publishes a stage change for a file. Failures are logged, never raised."""
+    event = {"file_id": file_id, "stage": stage, "at": time.time(), **extra}
+    state = {k: v for k, v in event.items() if k not in PROGRESS_TEXT_FIELDS}
+    try:
+        pipe = redis_client.pipeline()
+        pipe.hset(_state_key(user_id), file_id, json.dumps(state))
+        pipe.expire(_state_key(user_id), PROGRESS_STATE_TTL_SEC)
+        pipe.publish(_channel(user_id), json.dumps(event, ensure_ascii=False))
+        pipe.execute()
+    except redis.RedisError as e:
+        print(f"[{file_id}] ⚠️ Failed to publish progress ({stage}): {e}")
+
+
+def remember_stt_job(job_id: str, user_id: int, file_id: int):
+    """Maps an STT job to its file, so the service's progress callbacks can be published."""
+    try:
+        redis_client.set(f"stt_job:{job_id}", json.dumps([user_id, file_id]), ex=STT_JOB_MAP_TTL_SEC)
+    except redis.RedisError as e:
+        print(f"[{file_id}] ⚠️ Failed to map STT job {job_id}: {e}")
+
+
+def publish_stt_progress(job_id: str, payload: dict) -> bool:
+    """
+    Publishes a progress callback from the STT service.
+
+    Returns:
+        bool: False if the stage is unknown or the job isn't mapped to a file
+    """
+    stage = payload.get("stage")
+    if stage not in PROGRESS_STAGES:
+        return False
+    try:
+        data = redis_client.get(f"stt_job:{job_id}")
+    except redis.RedisError as e:
+        print(f"[{job_id}] ⚠️ Failed to look up STT job: {e}")
+        return False
+    if not data:
+        return False
+    user_id, file_id = json.loads(data)
+    publish_progress(user_id, file_id, stage, **{k: payload[k] for k in PROGRESS_FIELDS if k in payload})
+    return True
+
+
+def _sse(data: str, event: str = "progress") -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+async def progress_events(user_id: int, is_disconnected):
+    """
+    Server-sent events for a user: the current state of each of their files,
+    a "ready" event, then every stage change as it happens. Clients tell the
+    replayed state from new changes by that order, not by timestamps. Ends
+    when `is_disconnected()` returns True.
+    """
+    pubsub = async_redis_client.pubsub()
+    # Subscribed before the state is read, so no change falls in between
+    await pubsub.subscribe(_channel(user_id))
+    try:
+        states = await async_redis_client.hgetall(_state_key(user_id))
+        for state in sorted(states.values(), key=lambda s: json.loads(s)["at"]):
+            yield _sse(state.decode())
+        yield _sse("{}", event="ready")
+        last_sent = time.monotonic()
+        while not await is_disconnected():
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            if message:
+                yield _sse(message["data"].decode())
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= PROGRESS_HEARTBEAT_SEC:
+                yield ": keepalive\n\n"
+                last_sent = time.monotonic()
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.aclose()
@@ -6,73 +6,141 @@ import msgpack
 import pickle
 import json
 import os
+import hmac
+import hashlib
+import uuid
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
  
-from .audio_db import add_audio_file, add_audio_metadata, get_audio_by_id
+from .audio_db import (
+    add_audio_file, add_audio_metadata, get_audio_by_id, open_audio_file, find_audio_analysis_by_hash,
+    set_stt_job, set_stt_status, get_audio_by_stt_job, fetch_stale_stt_jobs, save_audio_artifacts,
+    fetch_audio_artifacts, STT_COMPLETE, STT_FAILED
+)
+from .job_tracking import release_user_slot
+from .progress import publish_progress, remember_stt_job
+from .audio_transcode import transcode_for_stt
+from .metrics import timed, TRANSCODE_BYTES_SAVED, TRANSCODE_UPLOAD_SECONDS_SAVED
+
+load_dotenv()
 
 #STT_TRANSCRIPTION_URL = "http://13.202.147.27:8001/transcribe"
 #STT_STATUS_URL = "http://13.202.147.27:8001/status"
 STT_TRANSCRIPTION_URL = "http://stt:8002/transcribe"
 STT_STATUS_URL = "http://stt:8002/status"
+STT_REANALYZE_URL = "http://stt:8002/reanalyze"
 DOWNLOADED_FOLDER = "uploads"
 SUPPORTED_AUDIO_EXTENSIONS = {
     ".aac", ".aiff", ".flac", ".m4a", ".mp3", ".mp4", ".ogg", ".opus", ".wav", ".webm"
 }
 
-# Upload audio file and return job_id
-def send_file_to_stt_api(file_path: str):
-    with open(file_path, 'rb') as audio:
-        files = {'audio': (os.path.basename(file_path), audio)}
-        try:
-            response = requests.post(STT_TRANSCRIPTION_URL, files=files)
-            if response.status_code == 202:
-                job_id = response.json().get("job_id")
-                print(f"[{file_path}] 🚀 Job submitted. ID: {job_id}")
-                return job_id
-            else:
-                print(f"[{file_path}] ❌ Submission failed: {response.status_code}, {response.text}")
-        except Exception as e:
-            print(f"[{file_path}] ❌ Request error: {e}")
-    return None
+# The STT service posts finished jobs here, signed with the shared secret.
+# Without a secret no callback is requested and only the sweeper picks results up.
+STT_WEBHOOK_URL = os.getenv('STT_WEBHOOK_URL', 'http://backend:8001/api/stt-callback')
+STT_WEBHOOK_SECRET = os.getenv('STT_WEBHOOK_SECRET')
+# Jobs with no callback after this long are checked by the sweeper, and
+# given up on after the timeout
+STT_SWEEP_AFTER_SEC = int(os.getenv('STT_SWEEP_AFTER_SEC', '600'))
+STT_JOB_TIMEOUT_SEC = int(os.getenv('STT_JOB_TIMEOUT_SEC', str(45 * 60)))
 
-def poll_job_status(job_id: str, max_attempts: int = 45, delay_sec: int = 60):
-    print(f"[{job_id}] ⏳ Starting polling for up to {max_attempts} minutes...")
-    for attempt in range(1, max_attempts + 1):
-        try:
-            response = requests.get(f"{STT_STATUS_URL}/{job_id}", headers={"Accept": "application/x-msgpack"})
-            if response.status_code == 200:
-                decoded = msgpack.unpackb(response.content, raw=False)
+def sign_payload(body: bytes) -> str:
+    """HMAC-SHA256 of a callback body with the shared webhook secret."""
+    return hmac.new(bytes(STT_WEBHOOK_SECRET, 'utf-8'), msg=body, digestmod=hashlib.sha256).hexdigest()
 
-                # Log type and content
-                print(f"[{job_id}] ✅ Transcription complete on attempt {attempt}")
+# Size of each read from the blob store while streaming to the STT service
+STT_UPLOAD_CHUNK_SIZE = 1024 * 1024
 
-                '''
-                # Save the decoded response as a binary pickle file
-                with open(f"{job_id}_response.pkl", "wb") as f:
-                    pickle.dump(decoded, f)
+class MultipartStream:
+    """
+    multipart/form-data body that streams one file from an open file object.
 
-                # Save the decoded response as a human-readable JSON file
-                with open(f"{job_id}_response.json", "w", encoding="utf-8") as f:
-                    json.dump(decoded, f, ensure_ascii=False, indent=4)
-                '''
+    requests would otherwise build the whole body in memory. The total length
+    is known up front, so the request goes out with a Content-Length rather
+    than chunked. `bytes_sent` counts the file bytes actually read.
+    """
 
-                return decoded
+    def __init__(self, fields: dict, file_field: str, filename: str, fileobj, chunk_size: int = STT_UPLOAD_CHUNK_SIZE):
+        self.boundary = uuid.uuid4().hex
+        self.fileobj = fileobj
+        self.chunk_size = chunk_size
+        self.bytes_sent = 0
 
-            elif response.status_code == 202:
-                print(f"[{job_id}] 🕐 Attempt {attempt}: Still processing...")
+        head = b"".join(
+            f'--{self.boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+            for name, value in fields.items() if value is not None
+        )
+        quoted_filename = filename.replace('"', '%22')
+        head += (
+            f'--{self.boundary}\r\nContent-Disposition: form-data; name="{file_field}"; filename="{quoted_filename}"\r\n'
+            f'Content-Type: application/octet-stream\r\n\r\n'
+        ).encode()
+        self.head = head
+        self.tail = f"\r\n--{self.boundary}--\r\n".encode()
 
-            else:
-                print(f"[{job_id}] ❌ Unexpected status: {response.status_code}")
-                return None
+        fileobj.seek(0, os.SEEK_END)
+        self.file_size = fileobj.tell()
+        fileobj.seek(0)
 
-        except Exception as e:
-            print(f"[{job_id}] ❌ Polling error on attempt {attempt}: {e}")
-            return None
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
 
-        time.sleep(delay_sec)
+    def __len__(self) -> int:
+        return len(self.head) + self.file_size + len(self.tail)
 
-    print(f"[{job_id}] ⏳ Max polling attempts reached. Job may still be processing.")
+    def __iter__(self):
+        yield self.head
+        while True:
+            chunk = self.fileobj.read(self.chunk_size)
+            if not chunk:
+                break
+            self.bytes_sent += len(chunk)
+            yield chunk
+        yield self.tail
+
+# Upload audio file and return job_id
+def send_file_to_stt_api(audio, filename: str, webhook_url: str = None):
+    body = MultipartStream({'webhook_url': webhook_url}, 'audio', filename, audio)
+    try:
+        start = time.perf_counter()
+        response = requests.post(STT_TRANSCRIPTION_URL, data=body, headers={'Content-Type': body.content_type})
+        print(f"[{filename}] 📤 Streamed {body.bytes_sent} bytes in {time.perf_counter() - start:.2f}s")
+        if response.status_code == 202:
+            job_id = response.json().get("job_id")
+            print(f"[{filename}] 🚀 Job submitted. ID: {job_id}")
+            return job_id
+        else:
+            print(f"[{filename}] ❌ Submission failed: {response.status_code}, {response.text}")
+    except Exception as e:
+        print(f"[{filename}] ❌ Request error: {e}")
     return None
 
+def check_job_status(job_id: str) -> tuple:
+    """
+    Checks a job on the STT service once.
+
+    Returns:
+        tuple: (state, result) where state is "complete" (result holds the
+        decoded response), "processing", "failed", "missing" or "error"
+    """
+    try:
+        response = requests.get(f"{STT_STATUS_URL}/{job_id}", headers={"Accept": "application/x-msgpack"})
+        if response.status_code == 200:
+            return "complete", msgpack.unpackb(response.content, raw=False)
+        elif response.status_code == 202:
+            decoded = msgpack.unpackb(response.content, raw=False)
+            if decoded.get("status") == "failed":
+                print(f"[{job_id}] ❌ Job failed on the STT service: {decoded.get('error')}")
+                return "failed", None
+            return "processing", None
+        elif response.status_code == 404:
+            return "missing", None
+        else:
+            print(f"[{job_id}] ❌ Unexpected status: {response.status_code}")
+    except Exception as e:
+        print(f"[{job_id}] ❌ Status check error: {e}")
+    return "error", None
+
 # Parses response into transcription and analysis parts
 def parse_transcription_response(response: dict) -> dict:
     try:
@@ -83,6 +151,8 @@ def parse_transcription_response(response: dict) -> dict:
             except json.JSONDecodeError:
                 raise ValueError("Response is a string but not valid JSON")
         
+        if not isinstance(response, dict):
+            raise ValueError("Response is not an object")
         # The response is already flat, just return it directly
         return response
 
@@ -92,44 +162,222 @@ def parse_transcription_response(response: dict) -> dict:
         print(f"Response content: {response}")
         raise ValueError(f"Failed to parse response: {e}")
 
-def process_audio_files(file_ids, table_uuid):
-    for file_id in file_ids:
-        print(f"Processing file_id: {file_id}")
-        result = get_audio_by_id(file_id, table_uuid)
-        print(f"get_audio_by_id({file_id}, {table_uuid})")
-
-        if not result:
-            print(f"[{file_id}] ❌ File not found in database")
-            continue
-            
-        filename, file_content = result
-        
-        # Create a temporary file
-        temp_path = os.path.join(DOWNLOADED_FOLDER, f"temp_{file_id}_{filename}")
-        print(f"Writing temp file: {temp_path} (size: {len(file_content) if file_content else 0} bytes)")
-        try:
-            with open(temp_path, 'wb') as f:
-                f.write(file_content)
-
-            # Process the file
-            job_id = send_file_to_stt_api(temp_path)
-            if job_id:
-                result = poll_job_status(job_id)
-                if result:
-                    # Parse the response (which is already flat)
-                    parsed = parse_transcription_response(result)
-                    if parsed:
-                        # The parsed result is already flat, use it directly
-                        add_audio_metadata(file_id, table_uuid, parsed)
-                    else:
-                        print(f"[{file_id}] ❌ Failed to parse response")
-
-        except Exception as e:
-            print(f"[{file_id}] ❌ Processing error: {e}")
-        finally:
-            # Clean up temporary file
-            try:
-                print(f"Attempting to remove temp file: {temp_path}")
-                os.remove(temp_path)
-            except Exception as e:
-                print(f"[{file_id}] ⚠️ Failed to remove temporary file: {e}")
+def store_stt_result(job_id: str, status: str, result=None, error: str = None) -> bool:
+    """
+    Writes the outcome of an STT job to its audio row.
+
+    Called for webhook callbacks and by the sweeper; a job that was already
+    stored is left alone, so a late duplicate is harmless.
+
+    Returns:
+        bool: True if the job's row was found and updated
+    """
+    audio = get_audio_by_stt_job(job_id)
+    if not audio:
+        print(f"[{job_id}] ❌ No audio file for this job")
+        return False
+    file_id, user_id, stt_status = audio
+    if stt_status == STT_COMPLETE:
+        print(f"[{job_id}] Result already stored for file_id {file_id}")
+        return True
+
+    if status != "complete":
+        print(f"[{job_id}] ❌ Job failed for file_id {file_id}: {error}")
+        release_user_slot(user_id, file_id)
+        publish_progress(user_id, file_id, "failed", error=error)
+        return set_stt_status(file_id, user_id, STT_FAILED)
+
+    try:
+        # Parse the response (which is already flat)
+        parsed = parse_transcription_response(result)
+    except ValueError as e:
+        release_user_slot(user_id, file_id)
+        publish_progress(user_id, file_id, "failed", error=str(e))
+        return set_stt_status(file_id, user_id, STT_FAILED)
+
+    # The analysis call can fail after the transcript was made; the
+    # transcript and artifacts are still stored, for a re-analysis
+    analysis_error = parsed.get("error")
+    if not analysis_error and parsed.get("overall_score") is None:
+        analysis_error = "No analysis in the result"
+
+    # Stage outputs for later re-analyses; a result without them is stored all the same
+    artifacts = parsed.pop("artifacts", None)
+    with timed("metadata_write"):
+        stored = add_audio_metadata(file_id, user_id, parsed)
+        if stored and artifacts:
+            save_audio_artifacts(file_id, user_id, artifacts)
+    if not stored:
+        return False
+    release_user_slot(user_id, file_id)
+    if analysis_error:
+        print(f"[{job_id}] ❌ Stored transcript without analysis for file_id {file_id}: {analysis_error}")
+        publish_progress(user_id, file_id, "failed", error=analysis_error)
+        return set_stt_status(file_id, user_id, STT_FAILED)
+    print(f"[{job_id}] ✅ Stored result for file_id {file_id}")
+    publish_progress(user_id, file_id, "done")
+    return set_stt_status(file_id, user_id, STT_COMPLETE)
+
+def sweep_stt_jobs(limit: int = 100) -> int:
+    """
+    Fallback for callbacks that never arrived: checks jobs that have been
+    submitted for longer than STT_SWEEP_AFTER_SEC, stores finished ones and
+    fails those that are gone or past STT_JOB_TIMEOUT_SEC.
+
+    Returns:
+        int: Number of jobs resolved
+    """
+    now = datetime.utcnow()
+    resolved = 0
+    for job in fetch_stale_stt_jobs(now - timedelta(seconds=STT_SWEEP_AFTER_SEC), limit):
+        job_id = job["stt_job_id"]
+        state, result = check_job_status(job_id)
+        if state == "complete":
+            resolved += store_stt_result(job_id, "complete", result)
+        elif state in ("failed", "missing") or job["stt_submitted_at"] < now - timedelta(seconds=STT_JOB_TIMEOUT_SEC):
+            print(f"[{job_id}] ⏳ Giving up on job ({state})")
+            release_user_slot(job["user_id"], job["id"])
+            publish_progress(job["user_id"], job["id"], "failed", error=f"STT job {state}")
+            resolved += set_stt_status(job["id"], job["user_id"], STT_FAILED)
+    return resolved
+
+def report_transcode_savings(file_id: int, original_size: int, sent_size: int, send_seconds: float):
+    """Logs and counts the bytes and upload time a transcoded copy saved, at the rate the copy was sent."""
+    if not original_size or not sent_size:
+        return
+    saved = original_size - sent_size
+    seconds_saved = send_seconds * saved / sent_size
+    TRANSCODE_BYTES_SAVED.inc(saved)
+    TRANSCODE_UPLOAD_SECONDS_SAVED.inc(seconds_saved)
+    print(f"[{file_id}] 🗜️ Sent {sent_size} of {original_size} bytes ({saved / original_size:.0%} saved), "
+          f"about {seconds_saved:.1f}s less upload")
+
+def open_transcoded_copy(path: str):
+    """
+    Opens a cached transcoded copy, or returns None if it has been evicted
+    since; once open, the copy stays readable even if it is deleted.
+    """
+    try:
+        return open(path, 'rb')
+    except FileNotFoundError:
+        print(f"⚠️ Transcoded copy {path} was evicted, sending the original")
+        return None
+
+def process_audio_file(file_id: int, user_id: int, reuse_existing: bool = True) -> str:
+    """
+    Submits one audio file to the STT service and returns straight away.
+
+    Results come back through the webhook (see store_stt_result), or are
+    picked up by sweep_stt_jobs if the callback never arrives. The caller
+    holds one of the user's slots (see job_tracking); it is released here
+    unless the file was actually submitted. With `reuse_existing`, the
+    analysis of an identical upload is copied instead when there is one.
+
+    Returns:
+        str: "submitted", "reused", "missing" or "failed"
+    """
+    webhook_url = STT_WEBHOOK_URL if STT_WEBHOOK_SECRET else None
+    if not webhook_url:
+        print("⚠️ STT_WEBHOOK_SECRET is not set, results will only be picked up by the sweeper")
+
+    print(f"Processing file_id: {file_id}")
+    filename, file_ref, file_sha256, file_size = get_audio_by_id(file_id, user_id)
+    print(f"get_audio_by_id({file_id}, {user_id})")
+
+    if not file_ref:
+        print(f"[{file_id}] ❌ File not found in database")
+        release_user_slot(user_id, file_id)
+        publish_progress(user_id, file_id, "failed", error="File not found")
+        return "missing"
+
+    # The same recording may have been analysed since it was queued,
+    # e.g. an earlier copy in the same batch
+    existing = find_audio_analysis_by_hash(file_sha256, user_id, exclude_id=file_id) if reuse_existing else None
+    if existing:
+        print(f"[{file_id}] ♻️ Reusing analysis of identical upload")
+        add_audio_metadata(file_id, user_id, existing)
+        release_user_slot(user_id, file_id)
+        publish_progress(user_id, file_id, "done")
+        return "reused"
+
+    try:
+        # Large recordings are sent as a mono 16 kHz copy, anything else as stored
+        with timed("transcode"):
+            transcoded_path, stt_filename = transcode_for_stt(file_ref, filename, file_sha256, file_size)
+        audio = open_transcoded_copy(transcoded_path) if transcoded_path else None
+        if audio is None:
+            transcoded_path, stt_filename = None, filename
+            audio = open_audio_file(file_ref)
+        with audio:
+            start = time.perf_counter()
+            with timed("stt_submit"):
+                job_id = send_file_to_stt_api(audio, stt_filename, webhook_url)
+            if transcoded_path and job_id:
+                report_transcode_savings(file_id, file_size, os.fstat(audio.fileno()).st_size, time.perf_counter() - start)
+        if job_id:
+            remember_stt_job(job_id, user_id, file_id)
+            publish_progress(user_id, file_id, "transcribing")
+            set_stt_job(file_id, user_id, job_id)
+            return "submitted"
+        set_stt_job(file_id, user_id, None, STT_FAILED)
+
+    except Exception as e:
+        print(f"[{file_id}] ❌ Processing error: {e}")
+
+    release_user_slot(user_id, file_id)
+    publish_progress(user_id, file_id, "failed", error="Could not submit to the STT service")
+    return "failed"
+
+def send_artifacts_to_stt_api(file_id: int, artifacts: list, webhook_url: str = None) -> tuple:
+    """
+    Asks the STT service to re-analyse a file from its stored artifacts.
+
+    Returns:
+        tuple: (job_id or None, True if the service needs the audio instead)
+    """
+    try:
+        response = requests.post(STT_REANALYZE_URL, json={'artifacts': artifacts, 'webhook_url': webhook_url})
+        if response.status_code == 202:
+            job_id = response.json().get("job_id")
+            print(f"[{file_id}] 🔁 Re-analysis submitted. ID: {job_id}")
+            return job_id, False
+        if response.status_code == 409:
+            return None, True
+        print(f"[{file_id}] ❌ Re-analysis submission failed: {response.status_code}, {response.text}")
+    except Exception as e:
+        print(f"[{file_id}] ❌ Request error: {e}")
+    return None, False
+
+def reanalyze_audio_file(file_id: int, user_id: int) -> str:
+    """
+    Re-runs the analysis of a file, e.g. after a prompt changed.
+
+    The STT service resumes from the file's stored artifacts and only runs
+    the stages whose prompt, model or input changed. Files with no usable
+    word list (analysed before artifacts were kept, or by an older STT
+    model) go through process_audio_file from the audio instead. Slots are
+    handled as in process_audio_file.
+
+    Returns:
+        str: "submitted" or "failed", or what process_audio_file returned
+    """
+    webhook_url = STT_WEBHOOK_URL if STT_WEBHOOK_SECRET else None
+    try:
+        artifacts = fetch_audio_artifacts(file_id, user_id)
+    except Exception as e:
+        print(f"[{file_id}] ❌ Failed to load artifacts: {e}")
+        artifacts = None
+
+    if artifacts:
+        job_id, needs_audio = send_artifacts_to_stt_api(file_id, artifacts, webhook_url)
+        if job_id:
+            remember_stt_job(job_id, user_id, file_id)
+            set_stt_job(file_id, user_id, job_id)
+            return "submitted"
+        if not needs_audio:
+            release_user_slot(user_id, file_id)
+            publish_progress(user_id, file_id, "failed", error="Could not submit the re-analysis")
+            return "failed"
+
+    print(f"[{file_id}] 🔁 No usable artifacts, transcribing again")
+    return process_audio_file(file_id, user_id, reuse_existing=False)
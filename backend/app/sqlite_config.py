@@ -0,0 +1,57 @@
+import os
+from sqlalchemy import create_engine, event
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Connection pragmas applied to every SQLite connection. WAL lets readers run
+# alongside the single writer, and the busy timeout makes writers from other
+# processes (the second uvicorn worker, Celery) wait instead of failing.
+SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '30000'))
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE = int(os.getenv('SQLITE_CACHE_SIZE', '-65536'))  # negative means KiB, so 64 MiB
+
+
+def _apply_pragmas(dbapi_connection, connection_record):
+    # Let SQLAlchemy issue BEGIN itself (see _begin) instead of pysqlite
+    dbapi_connection.isolation_level = None
+
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA cache_size={SQLITE_CACHE_SIZE}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
+def _begin(conn):
+    # Writers take the write lock up front. A deferred transaction that
+    # upgrades from read to write can't wait on the busy handler and fails
+    # straight away with "database is locked".
+    options = conn.get_execution_options()
+    if options.get("isolation_level") == "AUTOCOMMIT":
+        return
+    if options.get("sqlite_immediate"):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+    else:
+        conn.exec_driver_sql("BEGIN")
+
+
+def create_sqlite_engine(db_path: str):
+    """
+    Creates an engine for a SQLite file with the tuned connection settings.
+
+    Pass `execution_options(sqlite_immediate=True)` on connections that are
+    going to write, so they start with BEGIN IMMEDIATE.
+    """
+    engine = create_engine(
+        f"sqlite:///{db_path}",
+        connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}
+    )
+    event.listen(engine, "connect", _apply_pragmas)
+    event.listen(engine, "begin", _begin)
+    return engine
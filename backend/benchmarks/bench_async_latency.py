@@ -0,0 +1,113 @@
+"""
+Measures how much a large upload slows down other requests on a running
+backend. `/me` is polled while idle and then while a big WAV upload is in
+flight, and the latency percentiles of both phases are compared.
+
+Start the backend with a single worker so both requests share one event
+loop, e.g.
+
+    uvicorn app.main:app --port 8001 --workers 1
+
+Usage (from the backend directory):
+
+    python -m benchmarks.bench_async_latency [--base-url http://localhost:8001] [--upload-mb 200]
+"""
+import argparse
+import os
+import statistics
+import struct
+import tempfile
+import threading
+import time
+
+import requests
+
+
+def write_wav(path: str, size_mb: int):
+    """Writes a silent 16 kHz mono 16-bit WAV of about `size_mb` MiB."""
+    data_size = size_mb * 1024 * 1024
+    header = b"RIFF" + struct.pack("<I", 36 + data_size) + b"WAVE"
+    header += b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, 16000, 32000, 2, 16)
+    header += b"data" + struct.pack("<I", data_size)
+    chunk = b"\0" * (1024 * 1024)
+    with open(path, "wb") as f:
+        f.write(header)
+        for _ in range(size_mb):
+            f.write(chunk)
+
+
+def login(base_url: str, email: str, password: str) -> dict:
+    requests.post(f"{base_url}/signup", json={"email": email, "name": "bench", "password": password})
+    response = requests.post(f"{base_url}/token", data={"username": email, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def poll_me(base_url: str, headers: dict, until, interval: float) -> list:
+    latencies = []
+    session = requests.Session()
+    while not until():
+        start = time.perf_counter()
+        session.get(f"{base_url}/me", headers=headers).raise_for_status()
+        latencies.append(time.perf_counter() - start)
+        time.sleep(interval)
+    return latencies
+
+
+def report(label: str, latencies: list):
+    if not latencies:
+        print(f"{label:<14} no samples")
+        return
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(
+        f"{label:<14} samples {len(ordered):>5}  p50 {statistics.median(ordered) * 1000:>8.1f} ms  "
+        f"p95 {p95 * 1000:>8.1f} ms  max {ordered[-1] * 1000:>8.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--email", default="bench@example.com")
+    parser.add_argument("--password", default="bench-password")
+    parser.add_argument("--upload-mb", type=int, default=200)
+    parser.add_argument("--idle-seconds", type=float, default=3)
+    parser.add_argument("--interval", type=float, default=0.02, help="Pause between /me requests")
+    args = parser.parse_args()
+
+    headers = login(args.base_url, args.email, args.password)
+
+    deadline = time.monotonic() + args.idle_seconds
+    idle = poll_me(args.base_url, headers, lambda: time.monotonic() > deadline, args.interval)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, f"bench_{os.getpid()}.wav")
+        write_wav(path, args.upload_mb)
+
+        done = threading.Event()
+        upload = {}
+
+        def run_upload():
+            start = time.perf_counter()
+            with open(path, "rb") as f:
+                response = requests.post(
+                    f"{args.base_url}/upload", headers=headers,
+                    files={"files": (os.path.basename(path), f, "audio/wav")}
+                )
+            upload["seconds"] = time.perf_counter() - start
+            upload["status"] = response.status_code
+            done.set()
+
+        thread = threading.Thread(target=run_upload)
+        thread.start()
+        busy = poll_me(args.base_url, headers, done.is_set, args.interval)
+        thread.join()
+
+    report("idle", idle)
+    report("during upload", busy)
+    print(f"upload of {args.upload_mb} MiB took {upload['seconds']:.1f} s (HTTP {upload['status']})")
+
+
+if __name__ == "__main__":
+    main()
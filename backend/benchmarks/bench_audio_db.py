@@ -0,0 +1,132 @@
+"""
+Measures per-call overhead of the audio_db access functions.
+
+"before" reproduces the previous pattern: a fresh MetaData and 34-column
+Table plus a new ORM session for every call, with statements built inline.
+"after" calls the current audio_db functions, which reuse module-level
+statements and pooled connections.
+
+Usage (from the backend directory):
+
+    AUDIO_DB_PATH_LOCAL=/tmp/bench_audio.db python -m benchmarks.bench_audio_db [--calls N]
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import MetaData, Table, Column, Integer, String, DateTime, select, func
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from app import audio_db
+    from app.audio_db import ANALYSIS_COLUMNS, SessionLocal
+
+USER_ID = 1
+
+
+def legacy_table() -> Table:
+    """The shape of the table the old code rebuilt on every call."""
+    return Table(
+        "audios",
+        MetaData(),
+        Column('id', Integer, primary_key=True, index=True),
+        Column('user_id', Integer, nullable=False),
+        Column('name', String, nullable=False),
+        Column('file_ref', String),
+        Column('file_size', Integer),
+        Column('file_sha256', String),
+        Column('created_at', DateTime(timezone=True), server_default=func.now()),
+        *[Column(col, Integer if col.endswith("_score") else String) for col in ANALYSIS_COLUMNS],
+    )
+
+
+def before_get_audio_by_id(audio_id: int):
+    db = SessionLocal()
+    try:
+        table = legacy_table()
+        return db.execute(
+            select(table.c.name, table.c.file_ref, table.c.file_size, table.c.file_sha256)
+            .where(table.c.id == audio_id)
+            .where(table.c.user_id == USER_ID)
+        ).first()
+    finally:
+        db.close()
+
+
+def before_add_audio_metadata(audio_id: int, metadata: dict):
+    db = SessionLocal()
+    table = legacy_table()
+    db.execute(table.update().where(table.c.id == audio_id).where(table.c.user_id == USER_ID).values(**metadata))
+    db.commit()
+    db.close()
+
+
+def before_fetch_page(page: int):
+    db = SessionLocal()
+    try:
+        table = legacy_table()
+        total = db.execute(select(func.count()).select_from(table).where(table.c.user_id == USER_ID)).scalar()
+        rows = db.execute(
+            table.select().where(table.c.user_id == USER_ID)
+            .order_by(table.c.created_at.desc()).offset((page - 1) * 10).limit(10)
+        ).fetchall()
+        return total, rows
+    finally:
+        db.close()
+
+
+def after_get_audio_by_id(audio_id: int):
+    return audio_db.get_audio_by_id(audio_id, USER_ID)
+
+
+def after_add_audio_metadata(audio_id: int, metadata: dict):
+    return audio_db.add_audio_metadata(audio_id, USER_ID, metadata)
+
+
+def after_fetch_page(page: int):
+    return audio_db.fetch_audio_metadata_by_user(USER_ID, page_number=page)
+
+
+def measure(fn, args_for_call, calls: int) -> float:
+    """Returns the median per-call time in microseconds."""
+    timings = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(calls):
+            args = args_for_call(i)
+            start = time.perf_counter()
+            fn(*args)
+            timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--rows", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.NamedTemporaryFile(suffix=".mp3") as sample, contextlib.redirect_stdout(io.StringIO()):
+        sample.write(os.urandom(1024))
+        sample.flush()
+        ids = [audio_db.add_audio_file(sample.name, f"call_{i}.mp3", USER_ID) for i in range(args.rows)]
+
+    metadata = {"transcription": "Speaker 1: hello", "overall_score": 7}
+    cases = [
+        ("get_audio_by_id", before_get_audio_by_id, after_get_audio_by_id, lambda i: (ids[i % len(ids)],)),
+        ("add_audio_metadata", before_add_audio_metadata, after_add_audio_metadata,
+         lambda i: (ids[i % len(ids)], metadata)),
+        ("fetch page", before_fetch_page, after_fetch_page, lambda i: (i % 5 + 1,)),
+    ]
+
+    print(f"{'call':<22} {'before us':>10} {'after us':>10} {'speedup':>8}")
+    for name, before, after, args_for_call in cases:
+        before_us = measure(before, args_for_call, args.calls)
+        after_us = measure(after, args_for_call, args.calls)
+        print(f"{name:<22} {before_us:>10.1f} {after_us:>10.1f} {before_us / after_us:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Compares header-only duration probing with a full pydub decode.
+
+Usage (from the backend directory):
+
+    python -m benchmarks.bench_audio_duration [AUDIO_DIR] [--repeat N]
+
+AUDIO_DIR defaults to the repository's data/ folder.
+"""
+import argparse
+import glob
+import os
+import statistics
+import time
+
+from pydub import AudioSegment
+
+from app.audio_probe import probe_duration
+
+DEFAULT_AUDIO_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+
+
+def decode_duration(audio_path: str) -> float:
+    """The previous implementation: decode the whole file to PCM."""
+    return AudioSegment.from_file(audio_path).duration_seconds
+
+
+def time_call(fn, audio_path: str, repeat: int) -> tuple:
+    timings, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(audio_path)
+        timings.append(time.perf_counter() - start)
+    return result, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("audio_dir", nargs="?", default=DEFAULT_AUDIO_DIR)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    paths = sorted(p for p in glob.glob(os.path.join(args.audio_dir, "*")) if os.path.isfile(p))
+    print(f"{'file':<40} {'size':>10} {'probe s':>10} {'decode s':>10} {'probe ms':>10} {'decode ms':>10} {'speedup':>8}")
+
+    total_probe, total_decode = 0.0, 0.0
+    for path in paths:
+        probed, probe_time = time_call(probe_duration, path, args.repeat)
+        decoded, decode_time = time_call(decode_duration, path, args.repeat)
+        total_probe += probe_time
+        total_decode += decode_time
+        print(
+            f"{os.path.basename(path)[:40]:<40} {os.path.getsize(path):>10} "
+            f"{probed if probed is not None else float('nan'):>10.2f} {decoded:>10.2f} "
+            f"{probe_time * 1000:>10.2f} {decode_time * 1000:>10.2f} {decode_time / probe_time:>7.0f}x"
+        )
+
+    if total_probe:
+        print(f"\nTotal: probe {total_probe * 1000:.1f} ms, decode {total_decode * 1000:.1f} ms "
+              f"({total_decode / total_probe:.0f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""
+Load test for the upload-to-analysis path: /upload -> Celery -> STT service
+-> add_audio_metadata.
+
+Signs up `--users` synthetic users, uploads recordings from `data/` at
+`--rate` uploads per second for `--duration` seconds, round-robin across the
+users, and has each user poll `/api/transcriptions` like the transcriptions
+page does, plus `/api/uploads/{id}` for files that have dropped off its
+first page or failed. The Celery queue length in Redis is sampled
+throughout.
+
+The report covers upload throughput and latency, analyses completed per
+second, error rates (failed uploads, failed analyses, timeouts, failed
+polls), the queue depth over time, and time-to-analysis percentiles, from
+the start of the upload to the first poll that sees the analysis.
+
+Each MP3 gets a unique ID3v1 tag appended, so the upload dedup doesn't
+answer repeats from earlier analyses; pass `--allow-dedup` to send the
+files unchanged. Files with unsupported extensions are skipped.
+
+Run the stack with the stubbed providers (see docker-compose.loadtest.yml):
+
+    docker compose -f docker-compose.yml -f docker-compose.loadtest.yml up --build \\
+        redis backend celery celery-beat stt
+
+Usage (from the backend directory):
+
+    python -m benchmarks.bench_load [--users 10] [--rate 0.5] [--duration 120] [--json out.json]
+"""
+import argparse
+import glob
+import itertools
+import json
+import os
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import redis
+import requests
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# app.audio_utils.SUPPORTED_AUDIO_EXTENSIONS, copied so the load generator
+# doesn't open the app's databases on import
+SUPPORTED_AUDIO_EXTENSIONS = {
+    ".aac", ".aiff", ".flac", ".m4a", ".mp3", ".mp4",
+    ".ogg", ".opus", ".wav", ".webm"
+}
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, round(pct / 100 * (len(values) - 1))))]
+
+
+def load_recordings(data_dir: str) -> list:
+    recordings = []
+    for path in sorted(glob.glob(os.path.join(data_dir, "*"))):
+        ext = os.path.splitext(path)[1].lower()
+        if os.path.isfile(path) and ext in SUPPORTED_AUDIO_EXTENSIONS:
+            with open(path, "rb") as f:
+                recordings.append((os.path.basename(path), f.read()))
+    return recordings
+
+
+def unique_copy(name: str, data: bytes, tag: str) -> bytes:
+    """Appends an ID3v1 tag carrying `tag` to an MP3, so its hash is new; other formats are unchanged."""
+    if not name.lower().endswith(".mp3"):
+        return data
+    title = tag.encode("ascii")[:30].ljust(30, b"\0")
+    # Artist, album, year and comment left empty, genre 255 (none): 128 bytes in all
+    return data + b"TAG" + title + b"\0" * 94 + b"\xff"
+
+
+class User:
+    def __init__(self, base_url: str, email: str, password: str):
+        self.email = email
+        self.session = requests.Session()
+        self.session.post(f"{base_url}/signup", json={"email": email, "name": "loadtest", "password": password})
+        response = self.session.post(f"{base_url}/token", data={"username": email, "password": password})
+        response.raise_for_status()
+        self.session.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+        self.lock = threading.Lock()
+        # file_id -> (upload_id, upload start time)
+        self.pending = {}
+
+
+class LoadTest:
+    def __init__(self, args):
+        self.args = args
+        self.lock = threading.Lock()
+        self.upload_latencies = []
+        self.upload_errors = 0
+        self.uploads_done = 0
+        self.poll_requests = 0
+        self.poll_errors = 0
+        self.time_to_analysis = []
+        self.failed_analyses = 0
+        self.queue_depth = []  # (seconds since start, LLEN)
+        self.finished_at = []
+        self.start = None
+
+    def count(self, name: str, amount: int = 1):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def upload(self, user: User, name: str, data: bytes):
+        started = time.time()
+        try:
+            response = user.session.post(
+                f"{self.args.base_url}/upload",
+                files=[("files", (name, data, "application/octet-stream"))],
+                timeout=self.args.request_timeout
+            )
+            response.raise_for_status()
+            body = response.json()
+        except (requests.RequestException, ValueError) as e:
+            print(f"❌ Upload of {name} for {user.email} failed: {e}")
+            self.count("upload_errors")
+            return
+        with self.lock:
+            self.upload_latencies.append(time.time() - started)
+            self.uploads_done += 1
+        reused = set(body.get("reused_file_ids", []))
+        with user.lock:
+            for file_id in body["file_ids"]:
+                if file_id in reused:
+                    self.record_done(started, time.time())
+                else:
+                    user.pending[file_id] = (body["upload_id"], started)
+
+    def record_done(self, started: float, now: float):
+        with self.lock:
+            self.time_to_analysis.append(now - started)
+            self.finished_at.append(now)
+
+    def get(self, user: User, path: str):
+        self.count("poll_requests")
+        try:
+            response = user.session.get(f"{self.args.base_url}{path}", timeout=self.args.request_timeout)
+            response.raise_for_status()
+            return response.json()
+        except (requests.RequestException, ValueError):
+            self.count("poll_errors")
+            return None
+
+    def poll(self, user: User, stop: threading.Event):
+        """Polls the first transcriptions page, then the upload status of whatever is still missing."""
+        while not stop.wait(self.args.poll_interval):
+            with user.lock:
+                if not user.pending:
+                    continue
+            page = self.get(user, "/api/transcriptions?page=1")
+            now = time.time()
+            if page:
+                for row in page["table_data"]:
+                    # Rows start ID, Name, Time, Transcription
+                    with user.lock:
+                        entry = user.pending.pop(row[0], None) if row[3] else None
+                    if entry:
+                        self.record_done(entry[1], now)
+
+            with user.lock:
+                uploads = {upload_id for upload_id, _ in user.pending.values()}
+            for upload_id in uploads:
+                status = self.get(user, f"/api/uploads/{upload_id}")
+                now = time.time()
+                for file in (status or {}).get("files", []):
+                    if file["status"] not in ("complete", "failed"):
+                        continue
+                    with user.lock:
+                        entry = user.pending.pop(file["id"], None)
+                    if not entry:
+                        continue
+                    if file["status"] == "complete":
+                        self.record_done(entry[1], now)
+                    else:
+                        self.count("failed_analyses")
+
+    def sample_queue(self, stop: threading.Event):
+        client = redis.Redis.from_url(self.args.redis_url)
+        while True:
+            try:
+                depth = client.llen(self.args.queue)
+            except redis.RedisError:
+                depth = None
+            self.queue_depth.append((time.time() - self.start, depth))
+            if stop.wait(self.args.sample_interval):
+                return
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--redis-url", default="redis://localhost:6379/0")
+    parser.add_argument("--queue", default="celery", help="Celery queue (Redis list) to sample")
+    parser.add_argument("--data-dir", default=os.path.join(REPO_DIR, "data"))
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--rate", type=float, default=0.5, help="uploads per second, across all users")
+    parser.add_argument("--duration", type=float, default=120, help="seconds to keep uploading")
+    parser.add_argument("--poll-interval", type=float, default=5)
+    parser.add_argument("--sample-interval", type=float, default=2, help="seconds between queue depth samples")
+    parser.add_argument("--drain-timeout", type=float, default=1800,
+                        help="seconds to wait for analyses after the last upload")
+    parser.add_argument("--request-timeout", type=float, default=300)
+    parser.add_argument("--max-inflight", type=int, default=32, help="uploads in flight at once")
+    parser.add_argument("--allow-dedup", action="store_true", help="upload the recordings unchanged")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    recordings = load_recordings(args.data_dir)
+    if not recordings:
+        raise SystemExit(f"No supported recordings in {args.data_dir}")
+
+    run_id = uuid.uuid4().hex[:8]
+    # Signups are setup rather than load, so they go one at a time
+    users = [User(args.base_url, f"loadtest-{run_id}-{i}@example.com", f"loadtest-{run_id}") for i in range(args.users)]
+    print(f"Signed up {len(users)} users, run {run_id}")
+
+    test = LoadTest(args)
+    test.start = time.time()
+    stop_polling, stop_sampling = threading.Event(), threading.Event()
+    threads = [threading.Thread(target=test.poll, args=(user, stop_polling), daemon=True) for user in users]
+    threads.append(threading.Thread(target=test.sample_queue, args=(stop_sampling,), daemon=True))
+    for thread in threads:
+        thread.start()
+
+    # Uploads go out on a fixed schedule whether or not earlier ones have finished
+    sent = 0
+    files = itertools.cycle(recordings)
+    user_cycle = itertools.cycle(users)
+    with ThreadPoolExecutor(max_workers=args.max_inflight) as pool:
+        while time.time() - test.start < args.duration:
+            name, data = next(files)
+            if not args.allow_dedup:
+                data = unique_copy(name, data, f"{run_id}-{sent}")
+            pool.submit(test.upload, next(user_cycle), f"loadtest_{sent}_{name}", data)
+            sent += 1
+            time.sleep(max(0.0, test.start + sent / args.rate - time.time()))
+    uploads_finished = time.time()
+
+    deadline = uploads_finished + args.drain_timeout
+    while time.time() < deadline and any(user.pending for user in users):
+        time.sleep(1)
+    stop_polling.set()
+    stop_sampling.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - test.start
+
+    timed_out = sum(len(user.pending) for user in users)
+    analysed = len(test.time_to_analysis)
+    depths = [depth for _, depth in test.queue_depth if depth is not None]
+    results = {
+        "run_id": run_id,
+        "settings": {k: v for k, v in vars(args).items() if k != "json"},
+        "uploads_sent": sent,
+        "uploads_ok": test.uploads_done,
+        "upload_errors": test.upload_errors,
+        "upload_error_rate": test.upload_errors / sent if sent else 0.0,
+        "upload_p50": percentile(test.upload_latencies, 50),
+        "upload_p95": percentile(test.upload_latencies, 95),
+        "analysed": analysed,
+        "failed_analyses": test.failed_analyses,
+        "timed_out": timed_out,
+        "analysis_error_rate": (test.failed_analyses + timed_out) / max(1, analysed + test.failed_analyses + timed_out),
+        "poll_requests": test.poll_requests,
+        "poll_errors": test.poll_errors,
+        "elapsed_sec": elapsed,
+        "uploads_per_sec": test.uploads_done / (uploads_finished - test.start),
+        "analyses_per_sec": analysed / (max(test.finished_at) - test.start) if test.finished_at else 0.0,
+        "time_to_analysis": {
+            f"p{pct}": percentile(test.time_to_analysis, pct) for pct in (50, 90, 95, 99, 100)
+        },
+        "queue_depth_max": max(depths, default=0),
+        "queue_depth_mean": statistics.mean(depths) if depths else 0.0,
+        "queue_depth": test.queue_depth,
+    }
+
+    print(f"\n{sent} uploads from {args.users} users at {args.rate}/s over {args.duration:.0f}s, "
+          f"finished in {elapsed:.0f}s")
+    print(f"uploads   {test.uploads_done} ok, {test.upload_errors} failed "
+          f"({results['upload_error_rate']:.1%}), {results['uploads_per_sec']:.2f}/s, "
+          f"p50 {results['upload_p50']:.2f}s, p95 {results['upload_p95']:.2f}s")
+    print(f"analyses  {analysed} done, {test.failed_analyses} failed, {timed_out} timed out "
+          f"({results['analysis_error_rate']:.1%}), {results['analyses_per_sec']:.2f}/s")
+    print(f"polls     {test.poll_requests} requests, {test.poll_errors} failed")
+    print("time to analysis  " + ", ".join(f"{k} {v:.1f}s" for k, v in results["time_to_analysis"].items()))
+    print(f"queue depth  max {results['queue_depth_max']}, mean {results['queue_depth_mean']:.1f}")
+    step = max(1, len(test.queue_depth) // 20)
+    for offset, depth in test.queue_depth[::step]:
+        print(f"  {offset:7.0f}s  {'?' if depth is None else depth:>5}  {'#' * min(depth or 0, 60)}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Runs N writer threads against M reader threads on audio.db, spread over
+several processes like the two uvicorn workers and the Celery worker, and
+reports throughput, latency and lock errors.
+
+"baseline" uses SQLite's defaults (rollback journal, synchronous=FULL, the
+5 s pysqlite timeout) with every write in its own transaction. "tuned" uses
+the settings from app.sqlite_config and the batching writer.
+
+Usage (from the backend directory):
+
+    python -m benchmarks.bench_sqlite_contention [--processes 3] [--writers 4] [--readers 4] [--seconds 10]
+"""
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+MODES = {
+    "baseline": {
+        "SQLITE_JOURNAL_MODE": "DELETE",
+        "SQLITE_SYNCHRONOUS": "FULL",
+        "SQLITE_BUSY_TIMEOUT_MS": "5000",
+        "SQLITE_MMAP_SIZE": "0",
+        "SQLITE_CACHE_SIZE": "-2000",
+        "DB_WRITER_ENABLED": "0",
+    },
+    "tuned": {},
+}
+
+
+def worker_process(mode: str, db_path: str, writers: int, readers: int, seconds: float, results):
+    os.environ.update(MODES[mode])
+    os.environ["AUDIO_DB_PATH_LOCAL"] = db_path
+    os.environ["BLOB_STORE_PATH_LOCAL"] = os.path.join(os.path.dirname(db_path), "blobs")
+    os.environ.pop("IS_DOCKER", None)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        from app import audio_db
+
+    user_ids = list(range(1, 9))
+    stop = time.monotonic() + seconds
+    write_latencies, read_latencies, errors = [], [], []
+
+    def write_loop(index: int):
+        i = 0
+        while time.monotonic() < stop:
+            user_id = user_ids[(index + i) % len(user_ids)]
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                try:
+                    audio_id = audio_db.run_write(audio_db.writer, audio_db.engine, lambda conn: conn.execute(
+                        audio_db.INSERT_AUDIO, {"user_id": user_id, "name": f"bench_{index}_{i}.mp3"}
+                    ).lastrowid)
+                    ok = audio_db.add_audio_metadata(
+                        audio_id, user_id, {"transcription": "x" * 2000, "overall_score": 7}
+                    )
+                except Exception:
+                    ok = False
+            write_latencies.append(time.perf_counter() - start)
+            if not ok:
+                errors.append("write")
+            i += 1
+
+    def read_loop(index: int):
+        i = 0
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                _, records, _ = audio_db.fetch_audio_metadata_by_user(user_ids[(index + i) % len(user_ids)])
+            read_latencies.append(time.perf_counter() - start)
+            i += 1
+
+    threads = [threading.Thread(target=write_loop, args=(i,)) for i in range(writers)]
+    threads += [threading.Thread(target=read_loop, args=(i,)) for i in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    results.put((write_latencies, read_latencies, len(errors)))
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def run(mode: str, processes: int, writers: int, readers: int, seconds: float):
+    ctx = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "audio.db")
+
+        # Create the schema once before the workers race for it
+        results = ctx.Queue()
+        init = ctx.Process(target=worker_process, args=(mode, db_path, 0, 0, 0, results))
+        init.start()
+        results.get()
+        init.join()
+
+        procs = [ctx.Process(target=worker_process, args=(mode, db_path, writers, readers, seconds, results))
+                 for _ in range(processes)]
+        for proc in procs:
+            proc.start()
+        collected = [results.get() for _ in procs]
+        for proc in procs:
+            proc.join()
+
+    writes = [t for w, _, _ in collected for t in w]
+    reads = [t for _, r, _ in collected for t in r]
+    errors = sum(e for _, _, e in collected)
+    print(
+        f"{mode:<9} writes/s {len(writes) / seconds:>8.1f}  reads/s {len(reads) / seconds:>8.1f}  "
+        f"write p50/p95 ms {statistics.median(writes) * 1000 if writes else float('nan'):>7.1f}/"
+        f"{percentile(writes, 95) * 1000:<7.1f} read p50/p95 ms "
+        f"{statistics.median(reads) * 1000 if reads else float('nan'):>6.1f}/{percentile(reads, 95) * 1000:<6.1f} "
+        f"failed writes {errors}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=3)
+    parser.add_argument("--writers", type=int, default=4, help="Writer threads per process")
+    parser.add_argument("--readers", type=int, default=4, help="Reader threads per process")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--mode", choices=sorted(MODES), action="append")
+    args = parser.parse_args()
+
+    for mode in args.mode or ["baseline", "tuned"]:
+        run(mode, args.processes, args.writers, args.readers, args.seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Version tags for the output of each pipeline stage, so stored outputs can
+be reused when a call is analysed again.
+
+The stages are the diarized word list from STT, the corrected Hindi
+transcript, the English translation and the analysis. Each artifact
+records the stage's version (its model, plus a hash of its prompt
+template) and a hash of the input it was made from. An artifact is reused
+only while both still match, so changing a prompt or model reruns that
+stage, and a stage whose input changed is rerun as well.
+"""
+import hashlib
+import json
+from types import SimpleNamespace
+
+from prompts import hindi_correction_prompt, translation_prompt, sales_call_analysis_prompt
+
+STT_MODEL = "scribe_v1"
+CORRECTION_MODEL = "gpt-4"
+TRANSLATION_MODEL = "gpt-4o"
+ANALYSIS_MODEL = "gpt-4o"
+
+ARTIFACT_STAGES = ("words", "corrected", "translated", "analysis")
+# Word attributes kept in the "words" artifact
+WORD_FIELDS = ("type", "text", "start", "end", "speaker_id")
+
+# Rendered into a prompt in place of the transcript to get its template
+PROMPT_PLACEHOLDER = "\x00"
+
+
+def prompt_version(prompt_fn) -> str:
+    """Short hash of a prompt's text without its transcript; changes whenever the template does."""
+    return hashlib.sha256(prompt_fn(PROMPT_PLACEHOLDER).encode("utf-8")).hexdigest()[:12]
+
+
+STAGE_VERSIONS = {
+    "words": STT_MODEL,
+    "corrected": f"{CORRECTION_MODEL}:{prompt_version(hindi_correction_prompt)}",
+    "translated": f"{TRANSLATION_MODEL}:{prompt_version(translation_prompt)}",
+    "analysis": f"{ANALYSIS_MODEL}:{prompt_version(sales_call_analysis_prompt)}",
+}
+
+
+def content_sha256(data) -> str:
+    """SHA-256 of text, or of other data as canonical JSON."""
+    if not isinstance(data, str):
+        data = json.dumps(data, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def words_to_data(words: list) -> list:
+    """The fields of STT words that the pipeline reads, as plain dicts."""
+    return [{field: getattr(word, field, None) for field in WORD_FIELDS} for word in words]
+
+
+def words_from_data(data: list) -> list:
+    return [SimpleNamespace(**word) for word in data]
+
+
+def make_artifact(stage: str, data, input_data=None) -> dict:
+    return {
+        "stage": stage,
+        "version": STAGE_VERSIONS[stage],
+        "input_sha256": content_sha256(input_data) if input_data is not None else None,
+        "data": data
+    }
+
+
+def current_artifacts(artifacts: list) -> dict:
+    """
+    Picks, per stage, the newest artifact made with the stage's current
+    version. `artifacts` are newest first.
+    """
+    current = {}
+    for artifact in artifacts or []:
+        stage = artifact.get("stage")
+        if stage in STAGE_VERSIONS and stage not in current and artifact.get("version") == STAGE_VERSIONS[stage]:
+            current[stage] = artifact
+    return current
+
+
+def reusable(artifact: dict, input_data) -> bool:
+    """True if the artifact exists and was made from exactly this input."""
+    return artifact is not None and artifact.get("input_sha256") == content_sha256(input_data)
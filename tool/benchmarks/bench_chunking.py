@@ -0,0 +1,118 @@
+"""
+Compares the old character-based chunking with the token-budget packer on
+synthetic multi-hour Hindi call transcripts.
+
+For each length it reports the number of OpenAI calls per stage, the input
+tokens sent per stage (prompt included), the time spent chunking, and a
+modelled wall-clock time for the correction and
+translation stages: every call costs a fixed overhead plus a per-token
+generation time, and `--concurrency` calls run at once.
+
+Usage (from the tool directory):
+
+    python -m benchmarks.bench_chunking [--hours 1 2 4] [--max-tokens 3000]
+"""
+import argparse
+import random
+import re
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from transcript_chunks import pack_transcript, count_tokens, _encoding  # noqa: E402
+from prompts import hindi_correction_prompt  # noqa: E402
+
+WORDS = (
+    "नमस्ते जी मैं क्लिनिक से बोल रहा हूँ आपने हमारे बारे में पूछा था क्या आपके पास दो मिनट हैं "
+    "हमारे यहाँ ट्रांसप्लांट की प्रक्रिया बहुत आसान है डॉक्टर साहब खुद देखते हैं आपको कोई दर्द नहीं होगा "
+    "पैसे की चिंता मत कीजिए हम किस्तों में भी ले सकते हैं आप कब आ सकते हैं कल सुबह ठीक रहेगा "
+    "हाँ बिल्कुल मुझे थोड़ा सोचना पड़ेगा घर पर बात करके बताता हूँ ठीक है धन्यवाद"
+).split()
+WORDS_PER_MINUTE = 130
+
+
+def make_transcript(hours: float, seed: int = 1) -> str:
+    """Two speakers alternating turns of 1-6 sentences, at a typical speaking rate."""
+    rng = random.Random(seed)
+    remaining = int(hours * 60 * WORDS_PER_MINUTE)
+    lines, speaker = [], 1
+    while remaining > 0:
+        sentences = []
+        for _ in range(rng.randint(1, 6)):
+            length = rng.randint(4, 14)
+            sentences.append(" ".join(rng.choice(WORDS) for _ in range(length)) + rng.choice(["।", "?", "!"]))
+            remaining -= length
+        lines.append(f"Speaker {speaker}: " + " ".join(sentences))
+        speaker = 3 - speaker
+    return "\n".join(lines)
+
+
+def legacy_chunks(text: str, max_chars: int = 2500) -> list:
+    """The previous split_by_speaker_sentences + group_chunks_by_size."""
+    blocks = re.split(r'(Speaker\s+\d+:)', text)
+    chunks, current_speaker = [], ""
+    for part in blocks:
+        if re.match(r'Speaker\s+\d+:', part):
+            current_speaker = part.strip()
+        elif part.strip():
+            sentences = re.split(r'(?<=[।!?])\s+', part.strip())
+            chunks.extend(f"{current_speaker} {s.strip()}" for s in sentences if s)
+
+    grouped, buffer = [], ""
+    for chunk in chunks:
+        if len(buffer) + len(chunk) < max_chars:
+            buffer += chunk + " "
+        else:
+            grouped.append(buffer.strip())
+            buffer = chunk + " "
+    if buffer:
+        grouped.append(buffer.strip())
+    return grouped
+
+
+def modelled_seconds(chunks: list, concurrency: int, overhead: float, ms_per_token: float) -> float:
+    """Wall-clock for one stage when `concurrency` calls run at once, longest chunks first."""
+    costs = sorted((overhead + count_tokens(chunk) * ms_per_token / 1000 for chunk in chunks), reverse=True)
+    waves = [costs[i:i + concurrency] for i in range(0, len(costs), concurrency)]
+    return sum(max(wave) for wave in waves)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=float, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--max-tokens", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--overhead", type=float, default=1.5, help="Seconds of fixed latency per call")
+    parser.add_argument("--ms-per-token", type=float, default=20, help="Generation time per output token")
+    args = parser.parse_args()
+
+    print(f"token counts from {'tiktoken' if _encoding('gpt-4') else 'the built-in estimate'}")
+    for hours in args.hours:
+        text = make_transcript(hours)
+        tokens = count_tokens(text)
+
+        start = time.perf_counter()
+        old = legacy_chunks(text)
+        old_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        new = pack_transcript(text, args.max_tokens)
+        new_time = time.perf_counter() - start
+
+        # Correction-stage input, prompt included
+        prompt_tokens = count_tokens(hindi_correction_prompt(""))
+        old_sent = sum(count_tokens(chunk) + prompt_tokens for chunk in old)
+        new_sent = sum(count_tokens(chunk) + prompt_tokens for chunk in new)
+        old_wall = modelled_seconds(old, args.concurrency, args.overhead, args.ms_per_token)
+        new_wall = modelled_seconds(new, args.concurrency, args.overhead, args.ms_per_token)
+        print(
+            f"{hours:>4g} h {tokens:>7} tokens | "
+            f"calls/stage {len(old):>4} -> {len(new):>4} | tokens sent {old_sent:>7} -> {new_sent:>7} | "
+            f"chunking {old_time * 1000:>7.1f} -> {new_time * 1000:>7.1f} ms | "
+            f"modelled stage time {old_wall:>7.1f} -> {new_wall:>7.1f} s"
+        )
+
+
+if __name__ == "__main__":
+    main()
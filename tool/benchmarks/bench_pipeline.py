@@ -0,0 +1,185 @@
+"""
+Runs the STT service's job pipeline end to end, offline, against the fake
+ElevenLabs and OpenAI clients in fake_providers.
+
+Each recording in `data/` is submitted `--repeat` times through
+process_audio_job, with up to `--concurrency` jobs running at once, as the
+service's background tasks would. The report has jobs per second, the
+OpenAI calls made, failures, p50/p95 latency per stage (the same stages
+as the /metrics histograms, plus the whole job), and peak RSS. The commit
+and settings are printed with the results, and `--json` writes them to a
+file, so runs on different commits can be compared.
+
+Provider latencies are in real seconds before `--time-scale` is applied;
+the defaults are rough figures for Scribe and gpt-4o. The LLM cache is
+disabled so every chunk reaches the fake OpenAI client.
+
+Usage (from the tool directory):
+
+    python -m benchmarks.bench_pipeline [--repeat 2] [--concurrency 4] [--time-scale 0.05] [--json out.json]
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+TOOL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(TOOL_DIR)
+sys.path.insert(0, TOOL_DIR)
+
+# stt_api reads these at import time
+os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+os.environ.setdefault('ELEVENLABS_API_KEY', 'benchmark')
+os.environ['LLM_CACHE_ENABLED'] = '0'
+os.environ['JOB_STORE_BACKEND'] = 'memory'
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def git_commit() -> str:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+class StageRecorder:
+    """Replaces stt_api.timed, keeping every duration instead of only histogram buckets."""
+
+    def __init__(self, timed):
+        self._timed = timed
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            self.samples[stage].append(seconds)
+
+    @contextmanager
+    def __call__(self, stage: str):
+        start = time.perf_counter()
+        try:
+            with self._timed(stage):
+                yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", default=os.path.join(REPO_DIR, "data"))
+    parser.add_argument("--repeat", type=int, default=2, help="times each recording is submitted")
+    parser.add_argument("--concurrency", type=int, default=4, help="jobs running at once")
+    parser.add_argument("--time-scale", type=float, default=0.05, help="multiplier on every fake latency")
+    parser.add_argument("--stt-latency", type=float, default=2.0)
+    parser.add_argument("--stt-latency-per-minute", type=float, default=1.0)
+    parser.add_argument("--openai-latency", type=float, default=0.5)
+    parser.add_argument("--openai-latency-per-token", type=float, default=0.01)
+    parser.add_argument("--jitter", type=float, default=0.2, help="+/- fraction applied to each latency")
+    parser.add_argument("--stt-error-rate", type=float, default=0.0)
+    parser.add_argument("--openai-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    import stt_api
+    from fake_providers import FakeElevenLabs, FakeOpenAI
+
+    stt_api.elevenlabs_client = FakeElevenLabs(
+        args.stt_latency, args.stt_latency_per_minute, args.jitter, args.stt_error_rate,
+        seed=args.seed, time_scale=args.time_scale
+    )
+    fake_openai = FakeOpenAI(
+        args.openai_latency, args.openai_latency_per_token, args.jitter, args.openai_error_rate,
+        seed=args.seed, time_scale=args.time_scale
+    )
+    stt_api.openai_client = fake_openai
+    recorder = StageRecorder(stt_api.timed)
+    stt_api.timed = recorder
+
+    openai_calls = 0
+    count_lock = threading.Lock()
+    create = fake_openai.chat.completions.create
+
+    def counting_create(*a, **kw):
+        nonlocal openai_calls
+        with count_lock:
+            openai_calls += 1
+        return create(*a, **kw)
+    fake_openai.chat.completions.create = counting_create
+
+    recordings = sorted(p for p in glob.glob(os.path.join(args.data_dir, "*")) if os.path.isfile(p))
+    if not recordings:
+        sys.exit(f"No recordings in {args.data_dir}")
+
+    def run_job(path: str) -> str:
+        job_id = str(uuid.uuid4())
+        stt_api.job_store.set(job_id, {'status': 'queued', 'webhook_url': None})
+        start = time.perf_counter()
+        with open(path, 'rb') as audio_file:
+            stt_api.process_audio_job(job_id, audio_file, os.path.basename(path))
+        recorder.record("job", time.perf_counter() - start)
+        return stt_api.job_store.get(job_id)['status']
+
+    jobs = recordings * args.repeat
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        statuses = list(pool.map(run_job, jobs))
+    elapsed = time.perf_counter() - start
+
+    results = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "settings": {k: v for k, v in vars(args).items() if k not in ("json", "data_dir")},
+        "recordings": [os.path.basename(p) for p in recordings],
+        "jobs": len(jobs),
+        "failed": sum(status != 'complete' for status in statuses),
+        "openai_calls": openai_calls,
+        "elapsed_sec": elapsed,
+        "jobs_per_sec": len(jobs) / elapsed,
+        "openai_calls_per_sec": openai_calls / elapsed,
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "stages": {
+            stage: {"count": len(samples), "p50": percentile(samples, 50), "p95": percentile(samples, 95)}
+            for stage, samples in sorted(recorder.samples.items())
+        },
+    }
+
+    print(f"commit {results['commit']}, python {results['python']}, {len(recordings)} recordings x {args.repeat}, "
+          f"concurrency {args.concurrency}, time scale {args.time_scale}")
+    print(f"{results['jobs']} jobs ({results['failed']} failed) in {elapsed:.2f}s: "
+          f"{results['jobs_per_sec']:.2f} jobs/s, {openai_calls} OpenAI calls "
+          f"({results['openai_calls_per_sec']:.2f}/s), peak RSS {results['peak_rss_mib']:.1f} MiB")
+    print(f"{'stage':<12} {'count':>6} {'p50 s':>9} {'p95 s':>9}")
+    for stage, row in results["stages"].items():
+        print(f"{stage:<12} {row['count']:>6} {row['p50']:>9.3f} {row['p95']:>9.3f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
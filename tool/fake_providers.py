@@ -0,0 +1,208 @@
+"""
+Local stand-ins for the ElevenLabs and OpenAI clients, for benchmarking the
+pipeline without paying for API calls.
+
+They expose only the calls stt_api makes (`speech_to_text.convert` and
+`chat.completions.create`), sleep for a configurable latency with jitter,
+fail at a configurable rate, and answer with made-up but realistically
+shaped data: a diarized word list sized to the audio's duration, the chunk
+echoed back for correction and translation, and the analysis JSON from the
+sample result in the repository's `temp` file.
+"""
+import json
+import os
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+import msgpack
+from dotenv import load_dotenv
+
+from transcript_chunks import estimate_tokens
+
+load_dotenv()
+
+# Defaults for the stand-ins, e.g. when stt_api runs with FAKE_PROVIDERS=1.
+# Latencies are seconds; all sleeps are multiplied by FAKE_TIME_SCALE, so a
+# benchmark can run faster than real time.
+FAKE_STT_LATENCY = float(os.getenv('FAKE_STT_LATENCY', '2.0'))
+FAKE_STT_LATENCY_PER_MINUTE = float(os.getenv('FAKE_STT_LATENCY_PER_MINUTE', '1.0'))
+FAKE_STT_ERROR_RATE = float(os.getenv('FAKE_STT_ERROR_RATE', '0'))
+FAKE_OPENAI_LATENCY = float(os.getenv('FAKE_OPENAI_LATENCY', '0.5'))
+FAKE_OPENAI_LATENCY_PER_TOKEN = float(os.getenv('FAKE_OPENAI_LATENCY_PER_TOKEN', '0.01'))
+FAKE_OPENAI_ERROR_RATE = float(os.getenv('FAKE_OPENAI_ERROR_RATE', '0'))
+FAKE_JITTER = float(os.getenv('FAKE_JITTER', '0.2'))
+FAKE_TIME_SCALE = float(os.getenv('FAKE_TIME_SCALE', '1.0'))
+FAKE_SAMPLE_PATH = os.getenv(
+    'FAKE_SAMPLE_PATH', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'temp')
+)
+
+WORDS = (
+    "नमस्ते जी मैं क्लिनिक से बोल रहा हूँ आपने हमारे बारे में पूछा था क्या आपके पास दो मिनट हैं "
+    "हमारे यहाँ ट्रांसप्लांट की प्रक्रिया बहुत आसान है डॉक्टर साहब खुद देखते हैं आपको कोई दर्द नहीं होगा "
+    "पैसे की चिंता मत कीजिए हम किस्तों में भी ले सकते हैं आप कब आ सकते हैं कल सुबह ठीक रहेगा "
+    "हाँ बिल्कुल मुझे थोड़ा सोचना पड़ेगा घर पर बात करके बताता हूँ ठीक है धन्यवाद"
+).split()
+WORDS_PER_MINUTE = 130
+
+# Layer III bitrates in kbps by header index, for MPEG-1 and for MPEG-2/2.5
+MP3_BITRATES = {
+    1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+DEFAULT_KBPS = 128
+
+# The prompt text the analysis stub returns JSON for; everything else is echoed
+ANALYSIS_MARKER = "analyzing sales call transcripts"
+QUOTED = re.compile(r'"""(.*?)"""', re.S)
+
+
+class FakeProviderError(Exception):
+    """Raised for injected failures."""
+
+
+class FakeLatency:
+    """
+    Sleeps `base` seconds plus `per_unit` seconds per unit of work, varied
+    uniformly by up to +/- `jitter` of the total, and fails at `error_rate`.
+    """
+
+    def __init__(self, base: float, per_unit: float = 0.0, jitter: float = FAKE_JITTER, error_rate: float = 0.0,
+                 seed: int = None, time_scale: float = FAKE_TIME_SCALE):
+        self.base = base
+        self.per_unit = per_unit
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.time_scale = time_scale
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def wait(self, units: float = 0, what: str = "request"):
+        with self._lock:
+            factor = 1 + self._rng.uniform(-self.jitter, self.jitter)
+            fail = self._rng.random() < self.error_rate
+        time.sleep(max(0.0, (self.base + self.per_unit * units) * factor * self.time_scale))
+        if fail:
+            raise FakeProviderError(f"Injected {what} failure")
+
+
+def load_sample_result(path: str = FAKE_SAMPLE_PATH) -> dict:
+    """Reads the msgpack sample result; returns an empty dict if it's missing."""
+    try:
+        with open(path, 'rb') as f:
+            return msgpack.unpackb(f.read(), raw=False)
+    except (OSError, ValueError):
+        return {}
+
+
+def estimate_duration(data: bytes) -> float:
+    """
+    Audio duration in seconds. Ogg Opus is timed by the granule position of
+    its last page; otherwise it's the size over the bitrate in the first MP3
+    frame header, assuming a constant bitrate, or DEFAULT_KBPS if not MP3.
+    """
+    if data[:4] == b"OggS":
+        last_page = data.rfind(b"OggS")
+        # Opus granule positions count 48 kHz samples
+        return int.from_bytes(data[last_page + 6:last_page + 14], "little") / 48000
+    kbps = DEFAULT_KBPS
+    start = 0
+    if data[:3] == b"ID3" and len(data) >= 10:
+        # Skip the ID3v2 tag; its size is stored as four 7-bit bytes
+        start = 10 + ((data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9])
+    for i in range(start, min(len(data) - 3, start + 65536)):
+        if data[i] == 0xFF and data[i + 1] & 0xE0 == 0xE0:
+            version_bits = (data[i + 1] >> 3) & 0x03
+            layer_bits = (data[i + 1] >> 1) & 0x03
+            bitrate_index = data[i + 2] >> 4
+            if version_bits != 1 and layer_bits == 1 and 0 < bitrate_index < 15:
+                kbps = MP3_BITRATES[1 if version_bits == 3 else 2][bitrate_index]
+                break
+    return len(data) * 8 / (kbps * 1000)
+
+
+class _SpeechToText:
+    def __init__(self, latency: FakeLatency, words_per_minute: int, seed: int):
+        self.latency = latency
+        self.words_per_minute = words_per_minute
+        self._seed = seed
+
+    def convert(self, file, **kwargs):
+        """Reads the whole upload like the real client, then returns a word list for its duration."""
+        _, fileobj = file
+        data = fileobj.read()
+        minutes = estimate_duration(data) / 60
+        self.latency.wait(minutes, "speech_to_text")
+        return SimpleNamespace(words=make_words(int(minutes * self.words_per_minute), self._seed))
+
+
+class FakeElevenLabs:
+    """
+    Stand-in for the ElevenLabs client. Latency is `latency` seconds plus
+    `latency_per_minute` per minute of audio.
+    """
+
+    def __init__(self, latency: float = FAKE_STT_LATENCY, latency_per_minute: float = FAKE_STT_LATENCY_PER_MINUTE,
+                 jitter: float = FAKE_JITTER, error_rate: float = FAKE_STT_ERROR_RATE,
+                 words_per_minute: int = WORDS_PER_MINUTE, seed: int = None,
+                 time_scale: float = FAKE_TIME_SCALE):
+        self.speech_to_text = _SpeechToText(
+            FakeLatency(latency, latency_per_minute, jitter, error_rate, seed, time_scale), words_per_minute, seed
+        )
+
+
+def make_words(count: int, seed: int = None) -> list:
+    """Two speakers alternating turns of 5-40 words, with spacing entries between words."""
+    rng = random.Random(seed)
+    words, speaker, turn_left = [], "speaker_0", rng.randint(5, 40)
+    t, duration = 0.0, 60 / WORDS_PER_MINUTE
+    for _ in range(count):
+        if turn_left == 0:
+            speaker = "speaker_1" if speaker == "speaker_0" else "speaker_0"
+            turn_left = rng.randint(5, 40)
+        turn_left -= 1
+        text = rng.choice(WORDS)
+        if turn_left == 0 or rng.random() < 0.1:
+            text += "।"
+        words.append(SimpleNamespace(type="word", text=text, start=t, end=t + duration * 0.8, speaker_id=speaker))
+        words.append(SimpleNamespace(type="spacing", text=" ", start=t + duration * 0.8, end=t + duration,
+                                     speaker_id=speaker))
+        t += duration
+    return words
+
+
+class _Completions:
+    def __init__(self, latency: FakeLatency, analysis: dict):
+        self.latency = latency
+        self.analysis = analysis
+
+    def create(self, model: str, messages: list, temperature: float = None, **kwargs):
+        """Echoes the quoted chunk back, or returns the sample analysis for the analysis prompt."""
+        prompt = messages[-1]["content"]
+        if ANALYSIS_MARKER in prompt:
+            # analyze_sales_call strips the ```json fence
+            content = "```json\n" + json.dumps(self.analysis, ensure_ascii=False, indent=2) + "\n```"
+        else:
+            match = QUOTED.search(prompt)
+            content = match.group(1).strip() if match else prompt
+        self.latency.wait(estimate_tokens(content), f"{model} completion")
+        message = SimpleNamespace(role="assistant", content=content)
+        return SimpleNamespace(model=model, choices=[SimpleNamespace(index=0, message=message)])
+
+
+class FakeOpenAI:
+    """
+    Stand-in for the OpenAI client. Latency is `latency` seconds plus
+    `latency_per_token` per generated token, as estimated for the reply.
+    """
+
+    def __init__(self, latency: float = FAKE_OPENAI_LATENCY, latency_per_token: float = FAKE_OPENAI_LATENCY_PER_TOKEN,
+                 jitter: float = FAKE_JITTER, error_rate: float = FAKE_OPENAI_ERROR_RATE, analysis: dict = None,
+                 seed: int = None, time_scale: float = FAKE_TIME_SCALE):
+        if analysis is None:
+            analysis = {k: v for k, v in load_sample_result().items() if k != "transcription"}
+        completions = _Completions(
+            FakeLatency(latency, latency_per_token, jitter, error_rate, seed, time_scale), analysis
+        )
+        self.chat = SimpleNamespace(completions=completions)
@@ -0,0 +1,234 @@
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+import msgpack
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Where job state lives. "memory" is per process; "sqlite" survives restarts
+# on one host; "redis" is shared, so several STT replicas can serve one address.
+JOB_STORE_BACKEND = os.getenv('JOB_STORE_BACKEND', 'memory')
+JOB_STORE_PATH = os.getenv('JOB_STORE_PATH', '/tmp/stt_jobs.db')
+JOB_STORE_REDIS_URL = os.getenv('JOB_STORE_REDIS_URL', 'redis://localhost:6379/1')
+JOB_STORE_MAX_JOBS = int(os.getenv('JOB_STORE_MAX_JOBS', '1000'))
+# Jobs expire this long after their last update, and shortly after their
+# result is first fetched (the grace period covers a retried fetch)
+JOB_TTL_SEC = int(os.getenv('JOB_TTL_SEC', str(24 * 3600)))
+JOB_RETRIEVED_TTL_SEC = int(os.getenv('JOB_RETRIEVED_TTL_SEC', '300'))
+# Expired SQLite rows are deleted once every this many writes
+JOB_STORE_PURGE_EVERY = int(os.getenv('JOB_STORE_PURGE_EVERY', '100'))
+
+# Jobs in these states are done with; only they may be evicted early
+FINISHED_STATUSES = ('complete', 'failed')
+
+# Encoded jobs above this size are zlib-compressed
+COMPRESS_MIN_BYTES = 1024
+_RAW, _ZLIB = b"\x00", b"\x01"
+
+
+def encode_job(job: dict) -> bytes:
+    packed = msgpack.packb(job, use_bin_type=True)
+    if len(packed) >= COMPRESS_MIN_BYTES:
+        return _ZLIB + zlib.compress(packed)
+    return _RAW + packed
+
+
+def decode_job(data: bytes) -> dict:
+    packed = zlib.decompress(data[1:]) if data[:1] == _ZLIB else data[1:]
+    return msgpack.unpackb(packed, raw=False)
+
+
+class JobNotFound(KeyError):
+    """Raised when updating a job that doesn't exist or has expired."""
+
+
+class JobStore:
+    """
+    Interface for STT job state: status, webhook URL and the result.
+
+    Jobs are stored msgpack-encoded and expire `ttl` seconds after their
+    last write, or `retrieved_ttl` seconds after `expire_soon` is called.
+    """
+
+    def __init__(self, ttl: int = JOB_TTL_SEC, retrieved_ttl: int = JOB_RETRIEVED_TTL_SEC):
+        self.ttl = ttl
+        self.retrieved_ttl = retrieved_ttl
+
+    def get(self, job_id: str):
+        """Returns the job dict, or None if it doesn't exist or has expired."""
+        raise NotImplementedError
+
+    def set(self, job_id: str, job: dict, ttl: int = None):
+        raise NotImplementedError
+
+    def delete(self, job_id: str):
+        raise NotImplementedError
+
+    def update(self, job_id: str, **fields) -> dict:
+        """
+        Merges fields into a job. Only the job's own worker writes to it, so no locking.
+
+        Raises:
+            JobNotFound: if the job is gone; it isn't recreated, as that would
+                lose its webhook URL
+        """
+        job = self.get(job_id)
+        if job is None:
+            raise JobNotFound(job_id)
+        job.update(fields)
+        self.set(job_id, job)
+        return job
+
+    def expire_soon(self, job_id: str):
+        """Shortens a job's life once its result has been handed out."""
+        job = self.get(job_id)
+        if job is not None:
+            self.set(job_id, job, self.retrieved_ttl)
+
+
+class MemoryJobStore(JobStore):
+    """
+    Per-process store, bounded to `max_jobs`: past that, finished jobs are
+    evicted least recently used first. Queued and processing jobs are never
+    evicted, so the store can briefly hold more while they are in flight.
+    """
+
+    def __init__(self, max_jobs: int = JOB_STORE_MAX_JOBS, **kwargs):
+        super().__init__(**kwargs)
+        self.max_jobs = max_jobs
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, job_id: str):
+        with self._lock:
+            entry = self._jobs.get(job_id)
+            if entry is None:
+                return None
+            expires_at, _, data = entry
+            if expires_at <= time.time():
+                del self._jobs[job_id]
+                return None
+            self._jobs.move_to_end(job_id)
+        return decode_job(data)
+
+    def set(self, job_id: str, job: dict, ttl: int = None):
+        data = encode_job(job)
+        finished = job.get('status') in FINISHED_STATUSES
+        with self._lock:
+            self._jobs[job_id] = (time.time() + (ttl or self.ttl), finished, data)
+            self._jobs.move_to_end(job_id)
+            if len(self._jobs) > self.max_jobs:
+                self._evict()
+
+    def _evict(self):
+        """Drops expired and finished jobs, least recently used first, until back within `max_jobs`."""
+        now = time.time()
+        for job_id, (expires_at, finished, _) in list(self._jobs.items()):
+            if len(self._jobs) <= self.max_jobs:
+                break
+            if finished or expires_at <= now:
+                del self._jobs[job_id]
+
+    def delete(self, job_id: str):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+
+class SQLiteJobStore(JobStore):
+    """
+    Store in a local SQLite file, so jobs survive restarts of the service.
+    Expired rows are deleted at startup and then every `purge_every` writes.
+    """
+
+    def __init__(self, path: str = JOB_STORE_PATH, purge_every: int = JOB_STORE_PURGE_EVERY, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.purge_every = purge_every
+        self._writes = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, data BLOB NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self.purge()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, job_id: str):
+        row = self._connect().execute(
+            "SELECT data FROM jobs WHERE job_id = ? AND expires_at > ?", (job_id, time.time())
+        ).fetchone()
+        return decode_job(row[0]) if row else None
+
+    def set(self, job_id: str, job: dict, ttl: int = None):
+        self._connect().execute(
+            "INSERT OR REPLACE INTO jobs (job_id, data, expires_at) VALUES (?, ?, ?)",
+            (job_id, encode_job(job), time.time() + (ttl or self.ttl))
+        )
+        with self._lock:
+            self._writes += 1
+            purge = self._writes % self.purge_every == 0
+        if purge:
+            self.purge()
+
+    def delete(self, job_id: str):
+        self._connect().execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+
+    def purge(self):
+        """Deletes expired jobs; expired ones are already invisible to `get`."""
+        self._connect().execute("DELETE FROM jobs WHERE expires_at <= ?", (time.time(),))
+
+
+class RedisJobStore(JobStore):
+    """Store in Redis, shared by every STT replica. Expiry is left to Redis."""
+
+    def __init__(self, url: str = JOB_STORE_REDIS_URL, **kwargs):
+        super().__init__(**kwargs)
+        import redis
+        self.redis = redis.Redis.from_url(url)
+
+    def _key(self, job_id: str) -> str:
+        return f"stt:job:{job_id}"
+
+    def get(self, job_id: str):
+        data = self.redis.get(self._key(job_id))
+        return decode_job(data) if data is not None else None
+
+    def set(self, job_id: str, job: dict, ttl: int = None):
+        self.redis.set(self._key(job_id), encode_job(job), ex=ttl or self.ttl)
+
+    def delete(self, job_id: str):
+        self.redis.delete(self._key(job_id))
+
+
+JOB_STORES = {
+    'memory': lambda: MemoryJobStore(),
+    'sqlite': lambda: SQLiteJobStore(JOB_STORE_PATH),
+    'redis': lambda: RedisJobStore(JOB_STORE_REDIS_URL),
+}
+
+_job_store = None
+
+def get_job_store() -> JobStore:
+    """Returns the configured job store, creating it on first use."""
+    global _job_store
+    if _job_store is None:
+        factory = JOB_STORES.get(JOB_STORE_BACKEND)
+        if factory is None:
+            raise ValueError(f"Unknown job store backend: {JOB_STORE_BACKEND}")
+        _job_store = factory()
+    return _job_store
@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', '1') == '1'
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', '/tmp/llm_cache.db')
+LLM_CACHE_MAX_BYTES = int(os.getenv('LLM_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+LLM_CACHE_MAX_AGE_DAYS = float(os.getenv('LLM_CACHE_MAX_AGE_DAYS', '30'))
+# Eviction runs once every this many writes rather than on each one
+LLM_CACHE_EVICT_EVERY = int(os.getenv('LLM_CACHE_EVICT_EVERY', '100'))
+
+
+def cache_key(prompt: str, model: str, temperature: float) -> str:
+    payload = json.dumps([prompt, model, temperature], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    Disk-backed cache of chat completion responses, keyed by a hash of the
+    prompt, model and temperature.
+
+    Entries older than `max_age_days` are dropped, and when the stored
+    responses exceed `max_bytes` the least recently used ones go first.
+    Each thread gets its own SQLite connection, so the OpenAI pool threads
+    can share one cache.
+    """
+
+    def __init__(self, path: str = LLM_CACHE_PATH, max_bytes: int = LLM_CACHE_MAX_BYTES,
+                 max_age_days: float = LLM_CACHE_MAX_AGE_DAYS, evict_every: int = LLM_CACHE_EVICT_EVERY):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 24 * 3600
+        self.evict_every = evict_every
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                used_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_used_at ON llm_cache (used_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, prompt: str, model: str, temperature: float):
+        """Returns the cached response, or None on a miss or expired entry."""
+        key = cache_key(prompt, model, temperature)
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute(
+            "SELECT response FROM llm_cache WHERE key = ? AND created_at > ?", (key, now - self.max_age)
+        ).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        conn.execute("UPDATE llm_cache SET used_at = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def put(self, prompt: str, model: str, temperature: float, response: str):
+        """Stores a response. Error responses are never cached."""
+        if response.startswith("Error:"):
+            return
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, model, response, size, created_at, used_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (cache_key(prompt, model, temperature), model, response, len(response.encode("utf-8")), now, now)
+        )
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % self.evict_every == 0
+        if evict:
+            self.evict()
+
+    def evict(self):
+        """Drops expired entries, then least recently used ones until under the size limit."""
+        conn = self._connect()
+        conn.execute("DELETE FROM llm_cache WHERE created_at <= ?", (time.time() - self.max_age,))
+        total = conn.execute("SELECT coalesce(sum(size), 0) FROM llm_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed = 0
+        keys = []
+        for key, size in conn.execute("SELECT key, size FROM llm_cache ORDER BY used_at"):
+            keys.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM llm_cache WHERE key = ?", keys)
+
+    def stats(self) -> dict:
+        conn = self._connect()
+        entries, size = conn.execute("SELECT count(*), coalesce(sum(size), 0) FROM llm_cache").fetchone()
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": size
+        }
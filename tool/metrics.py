@@ -0,0 +1,40 @@
+import os
+import time
+from contextlib import contextmanager
+from prometheus_client import Histogram, CollectorRegistry, generate_latest, CONTENT_TYPE_LATEST, REGISTRY, multiprocess
+
+# Single OpenAI calls take seconds, a whole job on a long call can take many minutes
+STAGE_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600, 1200, 2400)
+
+STAGE_SECONDS = Histogram(
+    "stt_stage_seconds",
+    "Time spent in each stage of an STT job; correction and translation are per chunk",
+    ["stage"],
+    buckets=STAGE_BUCKETS
+)
+
+
+@contextmanager
+def timed(stage: str):
+    """Records how long the block takes under `stage`, whether or not it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - start)
+
+
+def render_metrics() -> tuple:
+    """Returns (body, content type) for /metrics, aggregated over processes if PROMETHEUS_MULTIPROC_DIR is set."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid: int = None):
+    """Drops an exiting process's live gauge files; a no-op outside multi-process mode."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid or os.getpid())
@@ -0,0 +1,243 @@
+"""
+Splitting long recordings into segments that are transcribed in parallel,
+and stitching their word lists back together.
+
+One pass of voice activity detection (see vad) decides what to trim and
+where to cut. Segments hold at most SEGMENT_MAX_SEC of kept audio. Each cut
+falls between two kept spans (a trimmed silence) when there is one in the
+last quarter of the segment, or else at the quietest moment there.
+Consecutive segments overlap by SEGMENT_OVERLAP_SEC. Words heard in both
+copies of an overlap tie each segment's speaker labels to the ones before
+it, and the stitched transcript switches segments halfway through the
+overlap.
+"""
+import bisect
+import itertools
+import os
+import re
+import subprocess
+from collections import Counter
+from types import SimpleNamespace
+from dotenv import load_dotenv
+
+from vad import (
+    OffsetMap, ffmpeg_source, frame_features, speech_frames, kept_spans, encode_spans,
+    VAD_ENABLED, VAD_FRAME_MS, VAD_MIN_REMOVED
+)
+
+try:
+    import numpy as np
+except ImportError:  # optional, recordings are sent whole without it
+    np = None
+
+load_dotenv()
+
+SEGMENT_ENABLED = os.getenv('SEGMENT_ENABLED', '1') == '1'
+SEGMENT_MAX_SEC = float(os.getenv('SEGMENT_MAX_SEC', '600'))
+SEGMENT_OVERLAP_SEC = float(os.getenv('SEGMENT_OVERLAP_SEC', '10'))
+# Cuts are placed in this last share of a segment
+SEGMENT_CUT_WINDOW = 0.25
+# Energy is averaged over this long when looking for the quietest moment
+SEGMENT_QUIET_SEC = 0.3
+# Words in both copies of an overlap match when they start this close together
+SPEAKER_MATCH_SEC = 0.5
+
+WORD_CHARS = re.compile(r'\w+')
+
+
+class Segment:
+    """
+    One piece of a recording to transcribe: trimmed times `start` to `end`,
+    made of the original's `spans`. `offsets` maps the piece's own times
+    back onto the original.
+    """
+
+    def __init__(self, index: int, start: float, end: float, spans: list):
+        self.index = index
+        self.start = start
+        self.end = end
+        self.spans = spans
+        self.offsets = OffsetMap(spans)
+
+    @property
+    def duration(self) -> float:
+        return self.offsets.duration
+
+
+class SegmentPlan:
+    """
+    How a recording is sent for transcription: the segments, how much of it
+    was trimmed as non-speech, and the ffmpeg source to encode them from.
+    """
+
+    def __init__(self, source: tuple, segments: list, offsets: OffsetMap, original_seconds: float):
+        self.source = source
+        self.segments = segments
+        self.offsets = offsets
+        self.original_seconds = original_seconds
+
+    @property
+    def removed_pct(self) -> float:
+        if not self.original_seconds:
+            return 0.0
+        return 100 * (1 - self.offsets.duration / self.original_seconds)
+
+    def encode(self, segment: Segment):
+        """Returns a temporary file with the segment as Ogg Opus. The caller closes it."""
+        return encode_spans(self.source, segment.spans)
+
+
+def find_cuts(offsets: OffsetMap, energy, frame_sec: float, max_sec: float = SEGMENT_MAX_SEC,
+              overlap: float = SEGMENT_OVERLAP_SEC) -> list:
+    """
+    Splits the trimmed timeline into (start, end) ranges of at most
+    `max_sec`, each starting `overlap` before the previous one ends.
+    """
+    total = offsets.duration
+    if total <= max_sec:
+        return [(0.0, total)]
+
+    width = max(1, int(round(SEGMENT_QUIET_SEC / frame_sec)))
+    smoothed = np.convolve(energy, np.ones(width) / width, mode="same")
+    joins = offsets.joins
+    ranges, start = [], 0.0
+    while total - start > max_sec:
+        low, high = start + max_sec * (1 - SEGMENT_CUT_WINDOW), start + max_sec
+        i = bisect.bisect_right(joins, high)
+        if i and joins[i - 1] >= low:
+            cut = joins[i - 1]
+        else:
+            times = np.arange(low, high, frame_sec)
+            frames = np.array([int(offsets.to_original(t) / frame_sec) for t in times])
+            cut = float(times[np.argmin(smoothed[np.clip(frames, 0, len(smoothed) - 1)])])
+        ranges.append((start, cut))
+        start = cut - overlap
+    ranges.append((start, total))
+    return ranges
+
+
+def plan_transcription(fileobj):
+    """
+    Works out how to send a recording: trimmed of long non-speech when that
+    removes at least VAD_MIN_REMOVED of it, and split into segments when
+    what's left is longer than SEGMENT_MAX_SEC.
+
+    Returns a SegmentPlan, or None when the original should be sent as a
+    single file: nothing to trim or split, numpy or ffmpeg missing, or the
+    audio can't be decoded. The file object's position is left at the start.
+    """
+    if np is None or not (VAD_ENABLED or SEGMENT_ENABLED):
+        return None
+    try:
+        source = ffmpeg_source(fileobj)
+        energy, zcr, similarity = frame_features(source)
+        if not len(energy):
+            return None
+        frame_sec = VAD_FRAME_MS / 1000
+        original_seconds = len(energy) * frame_sec
+
+        offsets = OffsetMap(kept_spans(speech_frames(energy, zcr, similarity), frame_sec)) if VAD_ENABLED else None
+        trimmed = offsets is not None and offsets.spans and 1 - offsets.duration / original_seconds >= VAD_MIN_REMOVED
+        if not trimmed:
+            offsets = OffsetMap([(0.0, original_seconds)])
+
+        max_sec = SEGMENT_MAX_SEC if SEGMENT_ENABLED else float("inf")
+        cuts = find_cuts(offsets, energy, frame_sec, max_sec)
+        if not trimmed and len(cuts) == 1:
+            return None
+        segments = [Segment(i, start, end, offsets.slice(start, end)) for i, (start, end) in enumerate(cuts)]
+        return SegmentPlan(source, segments, offsets, original_seconds)
+    except (OSError, RuntimeError, subprocess.SubprocessError) as e:
+        print(f"⚠️ Silence trimming and segmenting skipped: {e}")
+        return None
+    finally:
+        fileobj.seek(0)
+
+
+def _copy_word(word, offsets: OffsetMap) -> SimpleNamespace:
+    copy = SimpleNamespace(
+        type=getattr(word, "type", None),
+        text=getattr(word, "text", ""),
+        start=getattr(word, "start", None),
+        end=getattr(word, "end", None),
+        speaker_id=getattr(word, "speaker_id", None)
+    )
+    offsets.remap_words([copy])
+    return copy
+
+
+def _normalise(text: str) -> str:
+    return "".join(WORD_CHARS.findall(text.lower()))
+
+
+def match_speakers(previous: list, current: list, known: list) -> dict:
+    """
+    Maps the speaker IDs in `current` onto those in `previous`, using words
+    both transcribed in the overlap: the same text starting within
+    SPEAKER_MATCH_SEC. Each ID gets the counterpart it shares most words
+    with. IDs with no evidence take a known speaker not yet claimed in this
+    segment, or a new ID if none is left.
+    """
+    starts = [w.start for w in previous]
+    votes = Counter()
+    for word in current:
+        text = _normalise(word.text)
+        if not text:
+            continue
+        i = bisect.bisect_left(starts, word.start - SPEAKER_MATCH_SEC)
+        while i < len(previous) and previous[i].start <= word.start + SPEAKER_MATCH_SEC:
+            if _normalise(previous[i].text) == text:
+                votes[(word.speaker_id, previous[i].speaker_id)] += 1
+                break
+            i += 1
+
+    mapping, claimed = {}, set()
+    for (local, global_id), _ in votes.most_common():
+        if local not in mapping and global_id not in claimed:
+            mapping[local] = global_id
+            claimed.add(global_id)
+    for local in sorted({w.speaker_id for w in current if w.speaker_id is not None} - set(mapping)):
+        free = [speaker for speaker in known if speaker not in claimed]
+        if free:
+            mapping[local] = free[0]
+        else:
+            mapping[local] = next(
+                f"speaker_{n}" for n in itertools.count() if f"speaker_{n}" not in known and f"speaker_{n}" not in claimed
+            )
+        claimed.add(mapping[local])
+    return mapping
+
+
+def stitch_words(plan: SegmentPlan, segment_words: list) -> list:
+    """
+    Joins the segments' word lists into one, on the original timeline.
+
+    Speaker IDs are made consistent across segments (see match_speakers),
+    and each overlap is split at its midpoint: the earlier segment's words
+    before it, the later segment's from it on.
+    """
+    stitched, known = [], []
+    for segment, words in zip(plan.segments, segment_words):
+        words = [_copy_word(word, segment.offsets) for word in words if getattr(word, "start", None) is not None]
+        if segment.index == 0:
+            mapping = {}
+        else:
+            previous = plan.segments[segment.index - 1]
+            overlap_start = plan.offsets.to_original(segment.start)
+            overlap_end = plan.offsets.to_original(previous.end)
+            mapping = match_speakers(
+                [w for w in stitched if w.type == "word" and overlap_start <= w.start < overlap_end],
+                [w for w in words if w.type == "word" and overlap_start <= w.start < overlap_end],
+                known
+            )
+            midpoint = plan.offsets.to_original((segment.start + previous.end) / 2)
+            while stitched and stitched[-1].start >= midpoint:
+                stitched.pop()
+            words = [w for w in words if w.start >= midpoint]
+
+        for word in words:
+            word.speaker_id = mapping.get(word.speaker_id, word.speaker_id)
+            if word.speaker_id is not None and word.speaker_id not in known:
+                known.append(word.speaker_id)
+            stitched.append(word)
+    return stitched
@@ -1,77 +1,107 @@
-from fastapi import FastAPI, UploadFile, File, Form, BackgroundTasks, Response
+from fastapi import FastAPI, UploadFile, File, Form, Body, BackgroundTasks, Response
 from fastapi.responses import JSONResponse
 from io import BytesIO
 import threading
+import logging
+import time
+import hmac
+import hashlib
 import uuid
 import os
+from concurrent.futures import ThreadPoolExecutor
 from openai import OpenAI, OpenAIError
 import requests
-import re
 from elevenlabs import ElevenLabs
 import json
 import os
 from dotenv import load_dotenv
 from prompts import hindi_correction_prompt, translation_prompt, sales_call_analysis_prompt
+from llm_cache import LLMCache, LLM_CACHE_ENABLED
+from job_store import get_job_store, JobNotFound
+from transcript_chunks import pack_transcript
+from metrics import timed, render_metrics, mark_process_dead
+from artifacts import (
+    CORRECTION_MODEL, TRANSLATION_MODEL, ANALYSIS_MODEL, STT_MODEL,
+    make_artifact, current_artifacts, reusable, words_to_data, words_from_data
+)
+from segmenter import plan_transcription, stitch_words
 import msgpack
 
 
 # Load environment variables
 load_dotenv()
 
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO').upper())
+logger = logging.getLogger(__name__)
+
 # Get API keys from environment variables
 openai_api_key = os.getenv('OPENAI_API_KEY')
 elevenlabs_api_key = os.getenv('ELEVENLABS_API_KEY')
 
-if not openai_api_key:
-    raise ValueError("OpenAI API key not found in environment variables.")
-if not elevenlabs_api_key:
-    raise ValueError("ElevenLabs API key not found in environment variables.")
+# Serve jobs with the local stand-ins from fake_providers instead of the real
+# APIs, for load tests. No API keys are needed then.
+FAKE_PROVIDERS = os.getenv('FAKE_PROVIDERS', '0') == '1'
+
+if not FAKE_PROVIDERS:
+    if not openai_api_key:
+        raise ValueError("OpenAI API key not found in environment variables.")
+    if not elevenlabs_api_key:
+        raise ValueError("ElevenLabs API key not found in environment variables.")
+
+# Chunk requests in flight at once across all jobs, and attempts per chunk
+OPENAI_MAX_CONCURRENCY = int(os.getenv('OPENAI_MAX_CONCURRENCY', '4'))
+OPENAI_CHUNK_ATTEMPTS = int(os.getenv('OPENAI_CHUNK_ATTEMPTS', '3'))
+# Segments of a long recording transcribed at once across all jobs, and attempts per segment
+STT_SEGMENT_CONCURRENCY = int(os.getenv('STT_SEGMENT_CONCURRENCY', '4'))
+STT_SEGMENT_ATTEMPTS = int(os.getenv('STT_SEGMENT_ATTEMPTS', '3'))
+# Shared with the backend, which checks the signature on webhook callbacks
+STT_WEBHOOK_SECRET = os.getenv('STT_WEBHOOK_SECRET')
+# Progress callbacks are best effort and shouldn't hold a job up for long
+PROGRESS_TIMEOUT_SEC = float(os.getenv('PROGRESS_TIMEOUT_SEC', '5'))
 
 app = FastAPI()
 
 # Clients
-openai_client = OpenAI(api_key=openai_api_key)
-elevenlabs_client = ElevenLabs(api_key=elevenlabs_api_key)
+if FAKE_PROVIDERS:
+    from fake_providers import FakeElevenLabs, FakeOpenAI
+    print("⚠️ FAKE_PROVIDERS is set, using stand-in STT and OpenAI clients")
+    openai_client = FakeOpenAI()
+    elevenlabs_client = FakeElevenLabs()
+else:
+    openai_client = OpenAI(api_key=openai_api_key)
+    elevenlabs_client = ElevenLabs(api_key=elevenlabs_api_key)
+openai_pool = ThreadPoolExecutor(max_workers=OPENAI_MAX_CONCURRENCY, thread_name_prefix="openai")
+stt_pool = ThreadPoolExecutor(max_workers=STT_SEGMENT_CONCURRENCY, thread_name_prefix="stt")
+llm_cache = LLMCache() if LLM_CACHE_ENABLED else None
 
 
 # ----------------------- UTILITY FUNCTIONS -----------------------
 
-def split_by_speaker_sentences(text: str) -> list[str]:
-    """Splits transcript into sentences per speaker."""
-    blocks = re.split(r'(Speaker\s+\d+:)', text)
-    chunks, current_speaker = [], ""
-    for part in blocks:
-        if re.match(r'Speaker\s+\d+:', part):
-            current_speaker = part.strip()
-        elif part.strip():
-            sentences = re.split(r'(?<=[।!?])\s+', part.strip())
-            chunks.extend(f"{current_speaker} {s.strip()}" for s in sentences if s)
-    return chunks
-
-
-def group_chunks_by_size(chunks: list[str], max_chars: int = 2500) -> list[str]:
-    """Groups sentence chunks under a character limit."""
-    grouped, buffer = [], ""
-    for chunk in chunks:
-        if len(buffer) + len(chunk) < max_chars:
-            buffer += chunk + " "
-        else:
-            grouped.append(buffer.strip())
-            buffer = chunk + " "
-    if buffer:
-        grouped.append(buffer.strip())
-    return grouped
-
-
-def request_openai(prompt: str, model: str = "gpt-4", temperature: float = 0.3) -> str:
-    """Handles OpenAI chat completion requests."""
+def request_openai(prompt: str, model: str = "gpt-4", temperature: float = 0.3, use_cache: bool = True,
+                   cache_if=None) -> str:
+    """
+    Handles OpenAI chat completion requests.
+
+    Answers are served from the LLM cache when the same prompt, model and
+    temperature were seen before; pass use_cache=False to always hit the API.
+    With `cache_if`, only answers it accepts are cached or served from the
+    cache, so a malformed answer isn't replayed on every retry.
+    """
+    cache = llm_cache if use_cache else None
+    if cache:
+        cached = cache.get(prompt, model, temperature)
+        if cached is not None and (cache_if is None or cache_if(cached)):
+            return cached
     try:
         response = openai_client.chat.completions.create(
             model=model,
             messages=[{"role": "user", "content": prompt}],
             temperature=temperature
         )
-        return response.choices[0].message.content.strip()
+        content = response.choices[0].message.content.strip()
+        if cache and (cache_if is None or cache_if(content)):
+            cache.put(prompt, model, temperature, content)
+        return content
     except OpenAIError as e:
         # Return error message as string
         return f"Error: {str(e)}"
@@ -79,26 +109,118 @@ def request_openai(prompt: str, model: str = "gpt-4", temperature: float = 0.3)
         return f"Error: {str(e)}"
 
 
+def request_openai_with_retry(prompt: str, model: str = "gpt-4", temperature: float = 0.3,
+                              attempts: int = OPENAI_CHUNK_ATTEMPTS, use_cache: bool = True, cache_if=None) -> str:
+    """Retries a request with backoff while it keeps returning an error."""
+    for attempt in range(attempts):
+        content = request_openai(prompt, model=model, temperature=temperature, use_cache=use_cache, cache_if=cache_if)
+        if not content.startswith("Error:"):
+            return content
+        print(f"⚠️ OpenAI request failed (attempt {attempt + 1}/{attempts}): {content}")
+        if attempt + 1 < attempts:
+            time.sleep(2 ** attempt)
+    return content
+
+
+def checked_response(stage: str, content: str) -> str:
+    """Raises when a chunk still failed after its retries, so the error
+    never ends up spliced into the transcript."""
+    if content.startswith("Error:"):
+        raise RuntimeError(f"{stage} failed: {content}")
+    return content
+
+
 # ----------------------- NLP PROCESSING -----------------------
 
-def correct_hindi_conversation(raw_conversation: str) -> str:
-    chunks = group_chunks_by_size(split_by_speaker_sentences(raw_conversation))
-#    return "\n\n".join(request_openai(hindi_correction_prompt(raw_conversation)) for chunk in chunks)
-    return "\n\n".join(request_openai(hindi_correction_prompt(chunk)) for chunk in chunks)
+def correct_hindi_chunk(chunk: str) -> str:
+    with timed("correction"):
+        return checked_response(
+            "correction", request_openai_with_retry(hindi_correction_prompt(chunk), model=CORRECTION_MODEL)
+        )
+
 
+def translate_hindi_chunk(chunk: str) -> str:
+    with timed("translation"):
+        return checked_response(
+            "translation", request_openai_with_retry(translation_prompt(chunk), model=TRANSLATION_MODEL)
+        )
+
+
+def correct_and_translate_chunk(chunk: str) -> tuple[str, str, float]:
+    corrected = correct_hindi_chunk(chunk)
+    corrected_at = time.perf_counter()
+    return corrected, translate_hindi_chunk(corrected), corrected_at
+
+
+def correct_and_translate(raw_conversation: str, on_chunk=None) -> tuple[str, str]:
+    """
+    Corrects and translates a transcript chunk by chunk.
+
+    The two stages are pipelined: each chunk goes to translation as soon as
+    its own correction comes back, instead of waiting for the whole
+    transcript to be corrected and then re-chunking it. Chunks run
+    concurrently on the shared OpenAI pool and are reassembled in order.
+    `on_chunk(index, count, translated)` is called for each chunk, in order,
+    as soon as it and all chunks before it are done.
+
+    Returns:
+        tuple: (corrected Hindi text, English translation)
+    """
+    # Each chunk is sent to both models, so it has to fit either's budget
+    chunks = pack_transcript(raw_conversation, models=(CORRECTION_MODEL, TRANSLATION_MODEL))
+    start = time.perf_counter()
+    results = []
+    for result in openai_pool.map(correct_and_translate_chunk, chunks):
+        results.append(result)
+        if on_chunk:
+            on_chunk(len(results) - 1, len(chunks), result[1])
+
+    if results:
+        print(f"[correction] ⏱️ {len(chunks)} chunks in {max(r[2] for r in results) - start:.2f}s")
+    print(f"[translation] ⏱️ {len(chunks)} chunks in {time.perf_counter() - start:.2f}s")
+
+    corrected = "\n\n".join(r[0] for r in results)
+    translated = "\n".join(r[1] for r in results)
+    return corrected, translated
+
+
+def translate_transcript(corrected: str, on_chunk=None) -> str:
+    """
+    Translates an already corrected transcript chunk by chunk, for
+    re-analyses that keep a stored correction. `on_chunk` is as for
+    correct_and_translate.
+    """
+    chunks = pack_transcript(corrected, models=(TRANSLATION_MODEL,))
+    start = time.perf_counter()
+    results = []
+    for result in openai_pool.map(translate_hindi_chunk, chunks):
+        results.append(result)
+        if on_chunk:
+            on_chunk(len(results) - 1, len(chunks), result)
+    print(f"[translation] ⏱️ {len(chunks)} chunks in {time.perf_counter() - start:.2f}s")
+    return "\n".join(results)
+
+
+def strip_analysis_fence(content: str) -> str:
+    return content[8:-4]  # clean unwanted prefix/suffix
 
-def translate_hindi_to_english(hindi_text: str) -> str:
-    chunks = group_chunks_by_size(split_by_speaker_sentences(hindi_text))
-#    return "\n".join(request_openai(translation_prompt(hindi_text), model="gpt-4o") for chunk in chunks)
-    return "\n".join(request_openai(translation_prompt(chunk), model="gpt-4o") for chunk in chunks)
+
+def is_valid_analysis(content: str) -> bool:
+    """True if an analysis reply parses (see parse_analysis)."""
+    analysis = parse_analysis(strip_analysis_fence(content))
+    return isinstance(analysis, dict) and "error" not in analysis
 
 
 def analyze_sales_call(transcript: str) -> str:
-    content = request_openai(sales_call_analysis_prompt(transcript), model="gpt-4o")
+    start = time.perf_counter()
+    with timed("analysis"):
+        content = request_openai_with_retry(sales_call_analysis_prompt(transcript), model=ANALYSIS_MODEL,
+                                            cache_if=is_valid_analysis)
+    print(f"[analysis] ⏱️ done in {time.perf_counter() - start:.2f}s")
     # Check if content is an error message
     if content.startswith("Error:"):
         return content
-    return content[8:-4]  # clean unwanted prefix/suffix
+    return strip_analysis_fence(content)
 
 
 def format_transcription(words: list) -> str:
@@ -106,57 +228,103 @@ def format_transcription(words: list) -> str:
     output, current_line = [], []
     speaker_map, speaker_count = {}, 1
     current_speaker = None
+    # Checked once; a per-word log call adds up on long calls even when filtered out
+    debug = logger.isEnabledFor(logging.DEBUG)
 
-    print("[DEBUG] format_transcription called with words:", words)
+    if debug:
+        logger.debug("format_transcription called with %d words", len(words))
     for idx, word in enumerate(words):
-        print(f"[DEBUG] Word {idx}: {word} (type: {type(word)})")
+        if debug:
+            logger.debug("Word %d: %s (type: %s)", idx, word, type(word))
         if getattr(word, "type", None) not in ["word", "spacing"]:
-            print(f"[DEBUG] Skipping word {idx} due to type: {getattr(word, 'type', None)}")
+            if debug:
+                logger.debug("Skipping word %d due to type: %s", idx, getattr(word, 'type', None))
             continue
 
         speaker_id = getattr(word, "speaker_id", None)
         text = getattr(word, "text", "")
-        print(f"[DEBUG] speaker_id: {speaker_id}, text: {text}")
+        if debug:
+            logger.debug("speaker_id: %s, text: %s", speaker_id, text)
 
         if speaker_id not in speaker_map:
             speaker_map[speaker_id] = f"Speaker {speaker_count}"
             speaker_count += 1
-        print(f"[DEBUG] speaker_map: {speaker_map}")
 
         if speaker_id == current_speaker:
             current_line.append(text)
         else:
             if current_line:
-                print(f"[DEBUG] Appending line: {speaker_map[current_speaker]}: {''.join(current_line).strip()}")
                 output.append(f"{speaker_map[current_speaker]}: {''.join(current_line).strip()}")
             current_line, current_speaker = [text], speaker_id
 
     if current_line:
-        print(f"[DEBUG] Appending final line: {speaker_map[current_speaker]}: {''.join(current_line).strip()}")
         output.append(f"{speaker_map[current_speaker]}: {''.join(current_line).strip()}")
 
-    print("[DEBUG] Final output list:", output)
     result = '\n'.join(output)
-    print("[DEBUG] Final result string:", result)
+    if debug:
+        logger.debug("Final result string: %s", result)
     return result
 
 
-def generate_combined_output(raw_convo: str) -> dict:
-    """Runs correction, translation, and analysis on raw transcript."""
-    corrected = correct_hindi_conversation(raw_convo)
-    translated = translate_hindi_to_english(corrected)
-    analysis_str = analyze_sales_call(translated)
-
+def parse_analysis(analysis_str: str) -> dict:
     # Check if analysis_str is an error message
     if analysis_str.startswith("Error:"):
-        analysis = {"error": analysis_str}
+        return {"error": analysis_str}
+    # Parse the analysis JSON string into a proper Python dictionary
+    try:
+        return json.loads(analysis_str)
+    except json.JSONDecodeError:
+        # If parsing fails, return the raw string
+        return {"error": "Failed to parse analysis JSON", "raw_analysis": analysis_str}
+
+
+def generate_combined_output(raw_convo: str, progress=None, artifacts: dict = None) -> tuple[dict, list]:
+    """
+    Runs correction, translation, and analysis on raw transcript.
+
+    `artifacts` are stored outputs of earlier runs by stage (see
+    artifacts.current_artifacts); a stage whose artifact is still valid for
+    its input is skipped. `progress(stage, **fields)`, if given, is told as
+    each stage starts.
+
+    Returns:
+        tuple: (flat result, artifacts for the stages that ran)
+    """
+    progress = progress or (lambda stage, **fields: None)
+    artifacts = artifacts or {}
+    on_chunk = lambda index, count, text: progress("translating", chunk=index, chunks=count, text=text)
+    new_artifacts = []
+
+    corrected_artifact = artifacts.get("corrected")
+    if reusable(corrected_artifact, raw_convo):
+        corrected = corrected_artifact["data"]
+        translated_artifact = artifacts.get("translated")
+        if reusable(translated_artifact, corrected):
+            translated = translated_artifact["data"]
+            print("[translation] ♻️ Reusing stored correction and translation")
+        else:
+            print("[correction] ♻️ Reusing stored correction")
+            progress("translating", transcript=corrected)
+            translated = translate_transcript(corrected, on_chunk)
+            new_artifacts.append(make_artifact("translated", translated, corrected))
+    else:
+        progress("correcting", transcript=raw_convo)
+        corrected, translated = correct_and_translate(raw_convo, on_chunk)
+        new_artifacts += [
+            make_artifact("corrected", corrected, raw_convo),
+            make_artifact("translated", translated, corrected)
+        ]
+
+    analysis_artifact = artifacts.get("analysis")
+    if reusable(analysis_artifact, translated):
+        print("[analysis] ♻️ Reusing stored analysis")
+        analysis = analysis_artifact["data"]
     else:
-        # Parse the analysis JSON string into a proper Python dictionary
-        try:
-            analysis = json.loads(analysis_str)
-        except json.JSONDecodeError:
-            # If parsing fails, return the raw string
-            analysis = {"error": "Failed to parse analysis JSON", "raw_analysis": analysis_str}
+        progress("analysing")
+        analysis = parse_analysis(analyze_sales_call(translated))
+        # Failed analyses are returned but never reused
+        if "error" not in analysis:
+            new_artifacts.append(make_artifact("analysis", analysis, translated))
 
     # Create a flat dictionary with all fields
     return_val = {
@@ -164,84 +332,279 @@ def generate_combined_output(raw_convo: str) -> dict:
         **analysis  # This spreads all the analysis fields into the top level
     }
     
-    return return_val
+    return return_val, new_artifacts
 
 # ----------------------- FLASK ROUTES -----------------------
 
-# In-memory job store (use a database or Redis in production)
-JOBS = {}
+# Job state and results, see job_store for the backends
+job_store = get_job_store()
+
+class CountingReader:
+    """Read-only file wrapper that counts the bytes read through it."""
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.bytes_read = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.fileobj.read(size)
+        self.bytes_read += len(data)
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self.fileobj, name)
+
+
+def detach_upload(upload: UploadFile) -> tuple:
+    """
+    Returns a file object holding the upload that outlives the request,
+    plus its size, without staging it in /tmp.
+
+    Uploads large enough to have rolled over to disk already sit in an
+    unlinked temporary file, so its descriptor is duplicated and the job
+    reads straight from it. Small uploads still in memory are copied into
+    a BytesIO.
+    """
+    spooled = upload.file
+    if getattr(spooled, "_rolled", True):
+        audio_file = os.fdopen(os.dup(spooled.fileno()), 'rb')
+    else:
+        spooled.seek(0)
+        audio_file = BytesIO(spooled.read())
+    audio_file.seek(0, os.SEEK_END)
+    size = audio_file.tell()
+    audio_file.seek(0)
+    return audio_file, size
+
 
 @app.post('/transcribe')
 async def transcribe_audio(background_tasks: BackgroundTasks, audio: UploadFile = File(...), webhook_url: str = Form(None)):
     """Receives audio file and starts background transcription job."""
     job_id = str(uuid.uuid4())
-    audio_path = f'/tmp/{job_id}.wav'
-    with open(audio_path, 'wb') as f:
-        f.write(await audio.read())
+    audio_file, bytes_received = detach_upload(audio)
 
-    JOBS[job_id] = {
+    job_store.set(job_id, {
         'status': 'queued',
-        'webhook_url': webhook_url
-    }
-    background_tasks.add_task(process_audio_job, job_id, audio_path)
+        'webhook_url': webhook_url,
+        'bytes_received': bytes_received
+    })
+    background_tasks.add_task(process_audio_job, job_id, audio_file, audio.filename or f"{job_id}.wav")
     return JSONResponse({'job_id': job_id, 'status': 'queued'}, status_code=202)
 
 
-def process_audio_job(job_id, audio_path):
-    """Performs transcription and processing in the background."""
+@app.post('/reanalyze')
+async def reanalyze(background_tasks: BackgroundTasks, payload: dict = Body(...)):
+    """
+    Starts a re-analysis from a call's stored artifacts (see artifacts):
+    {"artifacts": [...newest first], "webhook_url": ...}. Only the stages
+    whose prompt, model or input changed are run. Answers 409 when there is
+    no word list from the current STT model, meaning the audio has to be
+    transcribed again.
+    """
+    artifacts = current_artifacts(payload.get('artifacts'))
+    if 'words' not in artifacts:
+        return JSONResponse({'error': 'No current word list, transcribe the audio instead'}, status_code=409)
+    job_id = str(uuid.uuid4())
+    job_store.set(job_id, {'status': 'queued', 'webhook_url': payload.get('webhook_url'), 'reanalysis': True})
+    background_tasks.add_task(reanalyze_job, job_id, artifacts)
+    return JSONResponse({'job_id': job_id, 'status': 'queued'}, status_code=202)
+
+
+def post_webhook(job_id: str, payload: dict, timeout: float = 30):
+    """
+    Posts a payload to the job's webhook, signed with the shared secret.
+
+    Returns:
+        requests.Response, or None if the job has no webhook or the secret isn't set
+    """
+    webhook_url = (job_store.get(job_id) or {}).get('webhook_url')
+    if not webhook_url:
+        return None
+    if not STT_WEBHOOK_SECRET:
+        print(f"[{job_id}] ⚠️ STT_WEBHOOK_SECRET is not set, skipping webhook")
+        return None
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    signature = hmac.new(bytes(STT_WEBHOOK_SECRET, 'utf-8'), msg=body, digestmod=hashlib.sha256).hexdigest()
+    return requests.post(webhook_url, data=body, timeout=timeout, headers={
+        'Content-Type': 'application/json',
+        'X-Signature': signature
+    })
+
+
+def send_webhook(job_id: str, payload: dict):
+    """Posts a job's outcome to its webhook."""
     try:
-        print(f"[{job_id}] 🎙️ Starting transcription...")
+        print(f"[{job_id}] 📡 Sending callback to webhook...")
+        response = post_webhook(job_id, payload)
+        if response is None:
+            return
+        if response.status_code >= 300:
+            print(f"[{job_id}] ❌ Webhook returned {response.status_code}")
+        else:
+            # Delivered; keep it only briefly in case the backend also polls
+            job_store.expire_soon(job_id)
+    except Exception as e:
+        print(f"[{job_id}] ❌ Webhook failed: {e}")
 
-        with open(audio_path, 'rb') as audio_data:
-            transcription = elevenlabs_client.speech_to_text.convert(
-                file=audio_data,
-                model_id="scribe_v1",
-                tag_audio_events=True,
-                num_speakers=2,
-                timestamps_granularity="word",
-                diarize=True
-            )
 
-        print(f"[{job_id}] 📝 Formatting transcription...")
-        formatted = format_transcription(transcription.words)
-        result = generate_combined_output(formatted)
+def send_progress(job_id: str, stage: str, **fields):
+    """
+    Tells the webhook a job has reached a stage, for live progress on the
+    dashboard. Best effort: a failed post is logged and the job carries on.
+    """
+    job_store.update(job_id, stage=stage)
+    try:
+        response = post_webhook(job_id, {'job_id': job_id, 'status': 'progress', 'stage': stage, **fields},
+                                timeout=PROGRESS_TIMEOUT_SEC)
+        if response is not None and response.status_code >= 300:
+            logger.debug("Progress webhook for job %s returned %s", job_id, response.status_code)
+    except Exception as e:
+        print(f"[{job_id}] ⚠️ Progress webhook failed: {e}")
+
+
+def transcribe(filename, audio_data):
+    with timed("stt"):
+        return elevenlabs_client.speech_to_text.convert(
+            file=(filename, audio_data),
+            model_id=STT_MODEL,
+            tag_audio_events=True,
+            num_speakers=2,
+            timestamps_granularity="word",
+            diarize=True
+        )
 
-        JOBS[job_id]['status'] = 'complete'
-        JOBS[job_id]['result'] = result
 
-        print(f"[{job_id}] ✅ Job completed successfully.")
+def transcribe_segment(job_id, plan, segment, filename, attempts: int = STT_SEGMENT_ATTEMPTS) -> tuple:
+    """
+    Encodes one segment and transcribes it, retrying only this segment with
+    backoff when the STT call fails.
 
-        # Webhook callback if provided
-        webhook_url = JOBS[job_id].get('webhook_url')
-        if webhook_url:
+    Returns:
+        tuple: (word list on the segment's own timeline, bytes sent)
+    """
+    name = f"{os.path.splitext(filename)[0]}.part{segment.index}.ogg"
+    with plan.encode(segment) as encoded:
+        for attempt in range(attempts):
+            encoded.seek(0)
+            audio_data = CountingReader(encoded)
             try:
-                print(f"[{job_id}] 📡 Sending callback to webhook...")
-                requests.post(webhook_url, json={
-                    'job_id': job_id,
-                    'status': 'complete',
-                    'result': result
-                })
+                return transcribe(name, audio_data).words, audio_data.bytes_read
             except Exception as e:
-                print(f"[{job_id}] ❌ Webhook failed: {e}")
+                print(f"[{job_id}] ⚠️ Segment {segment.index} failed (attempt {attempt + 1}/{attempts}): {e}")
+                if attempt + 1 == attempts:
+                    raise
+                time.sleep(2 ** attempt)
+
+
+def process_audio_job(job_id, audio_file, filename):
+    """Performs transcription and processing in the background."""
+    try:
+        print(f"[{job_id}] 🎙️ Starting transcription...")
+        job_store.update(job_id, status='processing')
+
+        # Long silences and steady tones are cut before the audio goes out (STT is billed per
+        # minute), and long calls are split into segments sent in parallel
+        with timed("vad"):
+            plan = plan_transcription(audio_file)
+        if plan:
+            print(f"[{job_id}] ✂️ Trimmed {plan.removed_pct:.1f}% of {plan.original_seconds:.0f}s as non-speech, "
+                  f"sending {len(plan.segments)} segment(s)")
+            job_store.update(job_id, audio_seconds=plan.original_seconds, removed_pct=plan.removed_pct,
+                             segments=len(plan.segments))
+            send_progress(job_id, "transcribing", segments=len(plan.segments))
+            futures = [stt_pool.submit(transcribe_segment, job_id, plan, segment, filename)
+                       for segment in plan.segments]
+            results = [future.result() for future in futures]
+            bytes_sent = sum(sent for _, sent in results)
+            # Word timestamps back on the timeline of the uploaded recording
+            words = stitch_words(plan, [segment_words for segment_words, _ in results])
+        else:
+            print(f"[{job_id}] ✂️ Sending the original audio (0% removed)")
+            job_store.update(job_id, removed_pct=0.0, segments=1)
+            send_progress(job_id, "transcribing", segments=1)
+            audio_data = CountingReader(audio_file)
+            words = transcribe(filename, audio_data).words
+            bytes_sent = audio_data.bytes_read
+        print(f"[{job_id}] 📤 Sent {bytes_sent} bytes to transcription")
+        job_store.update(job_id, bytes_sent=bytes_sent)
+
+        words_artifact = make_artifact("words", words_to_data(words))
+        analyse_words(job_id, words, new_artifacts=[words_artifact])
 
     except Exception as e:
-        print(f"[{job_id}] ❌ Error: {str(e)}")
-        JOBS[job_id]['status'] = 'failed'
-        JOBS[job_id]['error'] = str(e)
+        fail_job(job_id, e)
 
     finally:
-        if os.path.exists(audio_path):
-            os.remove(audio_path)
+        audio_file.close()
+
+
+def analyse_words(job_id, words, artifacts: dict = None, new_artifacts: list = ()):
+    """
+    Formats the word list, runs the NLP stages (reusing valid `artifacts`)
+    and completes the job. The result carries the artifacts made in this
+    job under "artifacts", for the backend to store.
+    """
+    print(f"[{job_id}] 📝 Formatting transcription...")
+    with timed("format"):
+        formatted = format_transcription(words)
+    with timed("nlp"):
+        result, stage_artifacts = generate_combined_output(
+            formatted, lambda stage, **fields: send_progress(job_id, stage, **fields), artifacts
+        )
+    result["artifacts"] = [*new_artifacts, *stage_artifacts]
+
+    job_store.update(job_id, status='complete', result=result)
+
+    print(f"[{job_id}] ✅ Job completed successfully.")
+    send_webhook(job_id, {'job_id': job_id, 'status': 'complete', 'result': result})
+
+
+def fail_job(job_id, error: Exception):
+    print(f"[{job_id}] ❌ Error: {str(error)}")
+    try:
+        job_store.update(job_id, status='failed', error=str(error))
+    except JobNotFound:
+        # Expired while running; there's no webhook left to tell
+        return
+    send_webhook(job_id, {'job_id': job_id, 'status': 'failed', 'error': str(error)})
+
+
+def reanalyze_job(job_id, artifacts: dict):
+    """Re-runs the NLP stages of a call from its stored word list, in the background."""
+    try:
+        print(f"[{job_id}] 🔁 Starting re-analysis...")
+        job_store.update(job_id, status='processing')
+        analyse_words(job_id, words_from_data(artifacts["words"]["data"]), artifacts)
+    except Exception as e:
+        fail_job(job_id, e)
+
+@app.on_event('shutdown')
+def on_shutdown():
+    mark_process_dead()
+
+@app.get('/metrics')
+def metrics():
+    """Per-stage latency histograms in the Prometheus text format."""
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
+
+@app.get('/cache/stats')
+def cache_stats():
+    """Hit/miss counters and size of the LLM response cache."""
+    if not llm_cache:
+        return JSONResponse({'enabled': False})
+    return JSONResponse({'enabled': True, **llm_cache.stats()})
 
 @app.get('/status/{job_id}')
 def check_status(job_id: str):
     """Check the status of a transcription job."""
-    job = JOBS.get(job_id)
+    job = job_store.get(job_id)
     if not job:
         return Response(msgpack.packb({'error': 'Job not found'}), status_code=404, media_type='application/x-msgpack')
     if job['status'] == 'complete':
-        print("being returned from the server")
-        print(job['result'])
+        logger.debug("Returning result for job %s: %s", job_id, job['result'])
+        # Fetched results only linger for a retried fetch
+        job_store.expire_soon(job_id)
         return Response(msgpack.packb(job['result']), status_code=200, media_type='application/x-msgpack')
     else:
         return Response(msgpack.packb(job), status_code=202, media_type='application/x-msgpack')
@@ -0,0 +1,123 @@
+import os
+import re
+from functools import lru_cache
+from dotenv import load_dotenv
+
+try:
+    import tiktoken
+except ImportError:  # optional, falls back to estimate_tokens
+    tiktoken = None
+
+load_dotenv()
+
+# Transcript tokens per OpenAI request. The prompt and a reply of about the
+# same length as the chunk have to fit in the context window as well.
+OPENAI_CHUNK_TOKENS = int(os.getenv('OPENAI_CHUNK_TOKENS', '3000'))
+
+SPEAKER_LABEL = re.compile(r'(Speaker\s+\d+:)')
+SENTENCE_END = re.compile(r'(?<=[।!?])\s+')
+NON_ASCII = re.compile(r'[^\x00-\x7f]')
+
+
+def split_speaker_turns(text: str) -> list[tuple[str, list[str]]]:
+    """Splits a transcript into (speaker label, sentences) turns, in order."""
+    turns, current_speaker = [], ""
+    for part in SPEAKER_LABEL.split(text):
+        if SPEAKER_LABEL.fullmatch(part):
+            current_speaker = part.strip()
+        elif part.strip():
+            sentences = [s.strip() for s in SENTENCE_END.split(part.strip()) if s.strip()]
+            if sentences:
+                turns.append((current_speaker, sentences))
+    return turns
+
+
+def split_by_speaker_sentences(text: str) -> list[str]:
+    """Splits transcript into sentences per speaker."""
+    return [f"{speaker} {sentence}" for speaker, sentences in split_speaker_turns(text) for sentence in sentences]
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count for when tiktoken isn't available. English runs about
+    four characters per token; Devanagari is counted at one token per
+    character, which over-counts so chunks stay within the context window.
+    """
+    non_ascii = len(NON_ASCII.findall(text))
+    return non_ascii + (len(text) - non_ascii + 3) // 4
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except Exception:
+        # Unknown model, or the encoding files can't be downloaded
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-4") -> int:
+    encoding = _encoding(model)
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def pack_transcript(text: str, max_tokens: int = OPENAI_CHUNK_TOKENS, models: tuple = ("gpt-4",)) -> list[str]:
+    """
+    Packs a transcript into chunks of up to `max_tokens` tokens for each of
+    `models`, the models the chunks will be sent to (counted with each one's
+    own encoding, the largest count applies).
+
+    Chunks break between speaker turns where possible. A turn is only split,
+    at a sentence end, when it doesn't fit in an otherwise empty chunk, and
+    the continuation repeats its speaker label. A single sentence above the
+    budget gets a chunk of its own. Each sentence is tokenised once and
+    moved back at most once, so packing is linear in the transcript length.
+
+    Returns:
+        list[str]: Chunks of "Speaker N: ..." lines
+    """
+    def tokens_for(text: str) -> int:
+        return max(count_tokens(text, model) for model in models)
+
+    sentences = []  # (turn index, speaker, sentence, tokens)
+    for turn_index, (speaker, turn) in enumerate(split_speaker_turns(text)):
+        for sentence in turn:
+            sentences.append((turn_index, speaker, sentence, tokens_for(sentence)))
+    # Every line starts with a label and ends with a newline
+    label_tokens = tokens_for("Speaker 1: \n")
+
+    chunks, start = [], 0
+    while start < len(sentences):
+        end, used, last_turn_start = start, 0, None
+        while end < len(sentences):
+            turn_index, _, _, tokens = sentences[end]
+            new_line = end == start or turn_index != sentences[end - 1][0]
+            cost = tokens + (label_tokens if new_line else 1)
+            if used + cost > max_tokens and end > start:
+                break
+            if new_line and end > start:
+                last_turn_start = end
+            used += cost
+            end += 1
+        # Over budget mid-turn: leave the partial turn for the next chunk
+        # rather than splitting it, unless the chunk holds only that turn
+        if end < len(sentences) and last_turn_start is not None and sentences[end][0] == sentences[end - 1][0]:
+            end = last_turn_start
+        chunks.append(_render(sentences[start:end]))
+        start = end
+    return chunks
+
+
+def _render(sentences: list) -> str:
+    lines, current_turn = [], None
+    for turn_index, speaker, sentence, _ in sentences:
+        if turn_index != current_turn:
+            lines.append([f"{speaker} {sentence}" if speaker else sentence])
+            current_turn = turn_index
+        else:
+            lines[-1].append(sentence)
+    return "\n".join(" ".join(line) for line in lines)
@@ -0,0 +1,269 @@
+"""
+Voice activity detection and silence trimming before transcription.
+
+Recordings are decoded with ffmpeg to 16 kHz mono PCM and split into short
+frames. A frame counts as speech when its energy is well above the
+recording's noise floor, or moderately above it with a high zero-crossing
+rate (unvoiced consonants are quiet but noisy). Loud but steady sounds are
+not speech either: a frame whose spectrum has barely changed from the one
+90 ms earlier is steady, and a run of steady frames lasting
+VAD_STEADY_MIN_SEC or more (a ring tone, a beep, a held note of hold music)
+is dropped. Speech never holds still that long; on the recordings in data/
+the longest steady run is 0.63 s. Ringback with short bursts and hold music
+that changes note faster than that are still kept.
+
+Non-speech spans longer than VAD_MIN_SILENCE_SEC are cut down to
+VAD_KEEP_SILENCE_SEC, and the rest is re-encoded as Opus (see segmenter).
+An OffsetMap records which parts of the original were kept, so timestamps
+on the trimmed audio can be mapped back.
+"""
+import bisect
+import os
+import subprocess
+import tempfile
+from dotenv import load_dotenv
+
+try:
+    import numpy as np
+except ImportError:  # optional, trimming is skipped without it
+    np = None
+
+load_dotenv()
+
+VAD_ENABLED = os.getenv('VAD_ENABLED', '1') == '1'
+VAD_SAMPLE_RATE = 16000
+VAD_FRAME_MS = int(os.getenv('VAD_FRAME_MS', '30'))
+# Speech is this far above the noise floor (the quietest 10% of frames),
+# or half as far with a zero-crossing rate above VAD_ZCR_THRESHOLD
+VAD_ENERGY_MARGIN_DB = float(os.getenv('VAD_ENERGY_MARGIN_DB', '12'))
+VAD_ZCR_THRESHOLD = float(os.getenv('VAD_ZCR_THRESHOLD', '0.15'))
+# Frames quieter than this are never speech, however quiet the recording
+VAD_MIN_ENERGY_DB = float(os.getenv('VAD_MIN_ENERGY_DB', '-55'))
+# A frame is steady when the cosine similarity of its magnitude spectrum
+# (100 Hz to 4 kHz) with the one VAD_STEADY_LAG frames back is above
+# VAD_STEADY_SIMILARITY; steady runs at least VAD_STEADY_MIN_SEC long aren't speech
+VAD_STEADY_SIMILARITY = float(os.getenv('VAD_STEADY_SIMILARITY', '0.9'))
+VAD_STEADY_LAG = 3
+VAD_STEADY_MIN_SEC = float(os.getenv('VAD_STEADY_MIN_SEC', '1.5'))
+VAD_STEADY_BAND_HZ = (100, 4000)
+# Speech is padded by this much on each side so word edges aren't clipped
+VAD_PAD_SEC = float(os.getenv('VAD_PAD_SEC', '0.2'))
+# Gaps at least this long are shortened to VAD_KEEP_SILENCE_SEC
+VAD_MIN_SILENCE_SEC = float(os.getenv('VAD_MIN_SILENCE_SEC', '1.0'))
+VAD_KEEP_SILENCE_SEC = float(os.getenv('VAD_KEEP_SILENCE_SEC', '0.4'))
+# Below this share removed, the original is sent rather than re-encoded
+VAD_MIN_REMOVED = float(os.getenv('VAD_MIN_REMOVED', '0.05'))
+VAD_BITRATE = os.getenv('VAD_BITRATE', '24k')
+VAD_TIMEOUT_SEC = int(os.getenv('VAD_TIMEOUT_SEC', '600'))
+
+# Frames decoded and analysed per read from ffmpeg
+FRAMES_PER_BLOCK = 2000
+
+
+class OffsetMap:
+    """
+    Maps times on the trimmed audio back to the original recording.
+
+    `spans` are the (start, end) ranges of the original that were kept, in
+    order; the trimmed audio is those ranges played back to back.
+    """
+
+    def __init__(self, spans: list):
+        self.spans = spans
+        self._trimmed_starts = []
+        position = 0.0
+        for start, end in spans:
+            self._trimmed_starts.append(position)
+            position += end - start
+        self.duration = position
+
+    def to_original(self, t: float) -> float:
+        if not self.spans:
+            return t
+        i = max(0, bisect.bisect_right(self._trimmed_starts, t) - 1)
+        start, end = self.spans[i]
+        original = start + (t - self._trimmed_starts[i])
+        # Only the last span runs on, for timestamps a little past the end
+        return original if i + 1 == len(self.spans) else min(original, end)
+
+    @property
+    def joins(self) -> list:
+        """Times on the trimmed audio where one kept span ends and the next begins."""
+        return self._trimmed_starts[1:]
+
+    def slice(self, start: float, end: float) -> list:
+        """The ranges of the original that make up trimmed times `start` to `end`."""
+        spans = []
+        for (span_start, span_end), trimmed_start in zip(self.spans, self._trimmed_starts):
+            low = max(start, trimmed_start)
+            high = min(end, trimmed_start + span_end - span_start)
+            if high > low:
+                spans.append((span_start + low - trimmed_start, span_start + high - trimmed_start))
+        return spans
+
+    def remap_words(self, words: list):
+        """Moves each word's start and end onto the original timeline, in place."""
+        for word in words:
+            for field in ("start", "end"):
+                value = getattr(word, field, None)
+                if value is not None:
+                    setattr(word, field, self.to_original(value))
+
+
+def ffmpeg_source(fileobj) -> tuple:
+    """
+    Returns (input argument, fds to pass, bytes for stdin) to give ffmpeg
+    the recording in `fileobj`.
+
+    Real files are opened through /dev/fd so ffmpeg can seek, which
+    containers like MP4 need, and several ffmpeg processes can read at once.
+    In-memory uploads are read once here and piped in.
+    """
+    try:
+        fd = fileobj.fileno()
+    except (AttributeError, OSError):
+        fileobj.seek(0)
+        return "pipe:0", (), fileobj.read()
+    return f"/dev/fd/{fd}", (fd,), None
+
+
+def frame_features(source: tuple) -> tuple:
+    """
+    Decodes the recording (see ffmpeg_source) to 16 kHz mono and returns
+    per-frame energy (dBFS), zero-crossing rate and spectral similarity
+    (see VAD_STEADY_SIMILARITY) arrays. Decoding is streamed, so only one
+    block of samples is held at a time.
+    """
+    source, pass_fds, data = source
+    frame_samples = VAD_SAMPLE_RATE * VAD_FRAME_MS // 1000
+    block_bytes = frame_samples * 2 * FRAMES_PER_BLOCK
+    window = np.hanning(frame_samples).astype(np.float32)
+    bin_hz = VAD_SAMPLE_RATE / frame_samples
+    band = slice(int(round(VAD_STEADY_BAND_HZ[0] / bin_hz)), int(round(VAD_STEADY_BAND_HZ[1] / bin_hz)) + 1)
+    energies, zcrs, similarities = [], [], []
+    # Spectra of the previous block's last frames, compared with this block's first
+    previous = np.zeros((VAD_STEADY_LAG, band.stop - band.start), dtype=np.float32)
+    # In-memory uploads go to ffmpeg through a file rather than a pipe, so
+    # writing its input can't block on reading its output
+    with tempfile.TemporaryFile() as stdin:
+        if data is not None:
+            stdin.write(data)
+            stdin.seek(0)
+        process = subprocess.Popen(
+            ["ffmpeg", "-hide_banner", "-loglevel", "error", "-i", source,
+             "-vn", "-ac", "1", "-ar", str(VAD_SAMPLE_RATE), "-f", "s16le", "pipe:1"],
+            stdin=stdin, stdout=subprocess.PIPE, stderr=subprocess.PIPE, pass_fds=pass_fds
+        )
+        try:
+            while True:
+                block = process.stdout.read(block_bytes)
+                if not block:
+                    break
+                samples = np.frombuffer(block[:len(block) // 2 * 2], dtype="<i2")
+                frames = samples[:len(samples) // frame_samples * frame_samples].reshape(-1, frame_samples)
+                if not len(frames):
+                    continue
+                x = frames.astype(np.float32) / 32768.0
+                energies.append(10 * np.log10(np.mean(x * x, axis=1) + 1e-10))
+                signs = np.signbit(frames)
+                zcrs.append(np.mean(signs[:, 1:] != signs[:, :-1], axis=1))
+                spectra = np.abs(np.fft.rfft(x * window, axis=1))[:, band]
+                spectra /= np.linalg.norm(spectra, axis=1, keepdims=True) + 1e-10
+                spectra = np.concatenate((previous, spectra))
+                similarities.append(np.sum(spectra[VAD_STEADY_LAG:] * spectra[:-VAD_STEADY_LAG], axis=1))
+                previous = spectra[-VAD_STEADY_LAG:]
+            stderr = process.stderr.read()
+        finally:
+            process.stdout.close()
+            process.wait(timeout=VAD_TIMEOUT_SEC)
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg could not decode the audio: {stderr.decode(errors='replace').strip()}")
+    if not energies:
+        empty = np.zeros(0, dtype=np.float32)
+        return empty, empty, empty
+    return np.concatenate(energies), np.concatenate(zcrs), np.concatenate(similarities)
+
+
+def runs(mask) -> tuple:
+    """Start and end (exclusive) frame indices of each run of True in a boolean mask."""
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], mask.astype(np.int8), [0]))))
+    return edges[::2], edges[1::2]
+
+
+def speech_frames(energy, zcr, similarity=None):
+    """
+    Boolean speech mask over frames, padded by VAD_PAD_SEC on each side.
+    Without `similarity`, steady sounds aren't told apart from speech.
+    """
+    floor = np.percentile(energy, 10)
+    high = max(floor + VAD_ENERGY_MARGIN_DB, VAD_MIN_ENERGY_DB)
+    low = max(floor + VAD_ENERGY_MARGIN_DB / 2, VAD_MIN_ENERGY_DB)
+    speech = (energy > high) | ((energy > low) & (zcr > VAD_ZCR_THRESHOLD))
+
+    if similarity is not None:
+        min_frames = int(round(VAD_STEADY_MIN_SEC * 1000 / VAD_FRAME_MS))
+        for start, end in zip(*runs(speech & (similarity > VAD_STEADY_SIMILARITY))):
+            if end - start >= min_frames:
+                speech[start:end] = False
+
+    pad = int(round(VAD_PAD_SEC * 1000 / VAD_FRAME_MS))
+    if pad and speech.any():
+        # Dilate: a frame is kept if any speech frame is within `pad` frames
+        counts = np.convolve(speech.astype(np.int32), np.ones(2 * pad + 1, dtype=np.int32), mode="same")
+        speech = counts > 0
+    return speech
+
+
+def kept_spans(speech, frame_sec: float) -> list:
+    """
+    Ranges of the original to keep, in seconds: all speech, gaps shorter
+    than VAD_MIN_SILENCE_SEC, and VAD_KEEP_SILENCE_SEC of each longer gap,
+    split between its two ends.
+    """
+    total = len(speech) * frame_sec
+    # Speech runs as (start, end) in seconds
+    speech_runs = [(float(start * frame_sec), float(end * frame_sec)) for start, end in zip(*runs(speech))]
+    if not speech_runs:
+        return []
+
+    half = VAD_KEEP_SILENCE_SEC / 2
+    spans = [(max(0.0, speech_runs[0][0] - half), speech_runs[0][1])]
+    for start, end in speech_runs[1:]:
+        if start - spans[-1][1] < VAD_MIN_SILENCE_SEC:
+            spans[-1] = (spans[-1][0], end)
+        else:
+            spans[-1] = (spans[-1][0], spans[-1][1] + half)
+            spans.append((start - half, end))
+    spans[-1] = (spans[-1][0], min(total, spans[-1][1] + half))
+    return spans
+
+
+def encode_spans(source: tuple, spans: list):
+    """
+    Re-encodes only the given spans of the recording (see ffmpeg_source),
+    back to back, as mono Ogg Opus in a temporary file.
+    """
+    source, pass_fds, data = source
+    seek = []
+    if data is None:
+        # Decode from the first span rather than the start of the file
+        offset = spans[0][0]
+        seek = ["-ss", f"{offset:.3f}", "-to", f"{spans[-1][1]:.3f}"]
+        spans = [(start - offset, end - offset) for start, end in spans]
+    selection = "+".join(f"between(t,{start:.3f},{end:.3f})" for start, end in spans)
+    # 10 ms frames after resampling, so aselect cuts within 10 ms of each span edge
+    audio_filter = (f"aresample={VAD_SAMPLE_RATE},asetnsamples=n={VAD_SAMPLE_RATE // 100},"
+                    f"aselect='{selection}',asetpts=N/SR/TB")
+    output = tempfile.TemporaryFile()
+    try:
+        subprocess.run(
+            ["ffmpeg", "-hide_banner", "-loglevel", "error", *seek, "-i", source, "-vn", "-ac", "1", "-af", audio_filter,
+             "-c:a", "libopus", "-b:a", VAD_BITRATE, "-application", "voip", "-f", "ogg", "pipe:1"],
+            input=data, stdout=output, stderr=subprocess.PIPE, pass_fds=pass_fds,
+            check=True, timeout=VAD_TIMEOUT_SEC
+        )
+    except BaseException:
+        output.close()
+        raise
+    output.seek(0)
+    return output